@@ -0,0 +1,293 @@
+# 2026/10/18
+# zhangzhong
+# 用 Server-Sent Events 通过 HTTP 流式输出 ReAct agent 的决策过程和 token
+
+"""
+接口:
+    POST /chat    请求体 {"message": "...", "thread_id": "..."}，返回 text/event-stream
+    GET  /health  {"status": "ok", "active_sessions": n}
+    GET  /metrics 延迟统计（Prometheus 文本格式，见 stream_metrics）
+
+thread_id 对应 checkpointer 配置中的 configurable.thread_id，同一个 thread_id 的多次请求
+共享对话历史；不传时生成一个新的，通过响应头 X-Thread-Id 返回。同一个 thread_id
+正在运行时返回 409。
+
+SSE 事件:
+    event: token        {"text": "...", "node": "agent"}
+    event: tool_call    {"name": "...", "args": {...}, "id": "..."}
+    event: tool_result  {"name": "...", "tool_call_id": "...", "content": "..."}
+    event: message      {"content": "..."}              不再调用工具的完整回复
+    event: end          {"error": null}                 最后一个事件
+
+这是一个不依赖 Web 框架的 ASGI 应用，运行方式:
+    uvicorn agent_sse_server:create_default_app --factory
+    gunicorn 'agent_sse_server:create_default_app()' -k uvicorn.workers.UvicornWorker -w 1
+MemorySaver 只在进程内有效，重启后丢失，多个 worker 时对话历史不共享；
+换成 sqlite_checkpointer.SQLiteSaver 可以持久化（--db，WAL 模式下多个进程可以共用一个文件）。
+本地无网络调试: python agent_sse_server.py --fake --db checkpoints.sqlite
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import uuid
+
+from async_streaming_agent import AsyncStreamingAgent
+from stream_broadcaster import DecisionEvent, EndEvent, StreamEvent, TokenEvent
+from stream_metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1 << 20
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def encode_event(event: StreamEvent) -> bytes:
+    """把事件编码为一条 SSE 消息"""
+    if isinstance(event, TokenEvent):
+        name, data = "token", {"text": event.text, "node": event.node}
+    elif isinstance(event, DecisionEvent):
+        if event.kind == "tool_call":
+            name = "tool_call"
+            data = {
+                "name": event.tool_call["name"],
+                "args": event.tool_call["args"],
+                "id": event.tool_call["id"],
+            }
+        elif event.kind == "tool_result":
+            name = "tool_result"
+            data = {
+                "name": event.message.name,
+                "tool_call_id": event.message.tool_call_id,
+                "content": str(event.message.content),
+            }
+        else:
+            name, data = "message", {"content": str(event.message.content)}
+    else:
+        error = None if event.error is None else str(event.error) or repr(event.error)
+        name, data = "end", {"error": error}
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+class AgentSSEApp:
+    """把 agent 包装成 SSE 接口的 ASGI 应用"""
+
+    def __init__(
+        self,
+        agent_executor: Any,
+        buffer_size: int = 64,
+        max_sessions: Optional[int] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.agent = AsyncStreamingAgent(
+            agent_executor, buffer_size, max_sessions, metrics
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = (scope["method"], scope["path"])
+        if route == ("GET", "/health"):
+            await self._send_json(
+                send,
+                200,
+                {"status": "ok", "active_sessions": self.agent.active_sessions},
+            )
+        elif route == ("POST", "/chat"):
+            await self._chat(receive, send)
+        elif route == ("GET", "/metrics") and self.metrics is not None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"text/plain; version=0.0.4")],
+                }
+            )
+            body = self.metrics.prometheus_text().encode()
+            await send({"type": "http.response.body", "body": body})
+        else:
+            await self._send_json(send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _send_json(
+        self,
+        send: Send,
+        status: int,
+        data: Dict[str, Any],
+        headers: Optional[List[Tuple[bytes, bytes]]] = None,
+    ) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")] + (headers or []),
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_json(self, receive: Receive) -> Optional[Dict[str, Any]]:
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_SIZE:
+                raise ValueError("请求体过大")
+            if not message.get("more_body", False):
+                break
+        data = json.loads(body)
+        if not isinstance(data, dict) or not isinstance(data.get("message"), str):
+            raise ValueError('请求体应为 {"message": "...", "thread_id": "..."}')
+        return data
+
+    async def _chat(self, receive: Receive, send: Send) -> None:
+        try:
+            request = await self._read_json(receive)
+        except ValueError as e:
+            await self._send_json(send, 400, {"error": str(e)})
+            return
+        if request is None:
+            return
+
+        thread_id = str(request.get("thread_id") or uuid.uuid4().hex)
+        events = self.agent.stream(
+            {"role": "user", "content": request["message"]}, thread_id
+        )
+        try:
+            # 先拿到第一个事件，会话冲突时还能返回 409
+            first = await events.__anext__()
+        except ValueError as e:
+            await self._send_json(send, 409, {"error": str(e)})
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                    (b"x-thread-id", thread_id.encode()),
+                ],
+            }
+        )
+
+        async def pump() -> None:
+            event = first
+            while True:
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": encode_event(event),
+                        "more_body": True,
+                    }
+                )
+                if isinstance(event, EndEvent):
+                    return
+                event = await events.__anext__()
+
+        streaming = asyncio.create_task(pump())
+        disconnected = asyncio.create_task(self._wait_disconnect(receive))
+        try:
+            await asyncio.wait(
+                [streaming, disconnected], return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected.done():
+                logger.info("客户端断开，取消会话 %s", thread_id)
+            elif streaming.exception() is None:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            for task in (streaming, disconnected):
+                task.cancel()
+            await asyncio.gather(streaming, disconnected, return_exceptions=True)
+            # 取消 agent 运行（已经结束时什么也不做）
+            await events.aclose()
+
+    async def _wait_disconnect(self, receive: Receive) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+
+def create_app(
+    agent_executor: Any,
+    buffer_size: int = 64,
+    max_sessions: Optional[int] = None,
+    metrics: Optional[MetricsRegistry] = None,
+) -> AgentSSEApp:
+    """
+    创建 SSE 应用
+
+    Args:
+        agent_executor: 带 checkpointer 的 agent（如 create_react_agent(..., checkpointer=MemorySaver())）
+        buffer_size: 每个会话缓冲的事件数
+        max_sessions: 同时运行的会话数上限
+        metrics: 延迟统计，提供时启用 /metrics
+
+    Returns:
+        AgentSSEApp: ASGI 应用
+    """
+    return AgentSSEApp(agent_executor, buffer_size, max_sessions, metrics)
+
+
+def create_default_app() -> AgentSSEApp:
+    """使用 agent_streaming_demo 中的 DeepSeek + Tavily agent"""
+    from agent_streaming_demo import agent_executor
+
+    return create_app(agent_executor, metrics=MetricsRegistry())
+
+
+def create_fake_app(delay: float = 0.0, checkpointer: Any = None) -> AgentSSEApp:
+    """使用本地假模型的 agent，不需要网络和 API key；checkpointer 默认为 MemorySaver()"""
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from fake_chat_model import create_fake_agent
+
+    return create_app(
+        create_fake_agent(delay=delay, checkpointer=checkpointer or MemorySaver()),
+        metrics=MetricsRegistry(),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="agent SSE 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fake", action="store_true", help="使用本地假模型")
+    parser.add_argument("--delay", type=float, default=0.02, help="假模型的 token 间隔")
+    parser.add_argument("--db", help="假模型 agent 的对话历史存到这个 SQLite 文件")
+    args = parser.parse_args()
+
+    if args.fake:
+        checkpointer = None
+        if args.db:
+            from sqlite_checkpointer import SQLiteSaver
+
+            checkpointer = SQLiteSaver(args.db)
+        app = create_fake_app(args.delay, checkpointer)
+    else:
+        app = create_default_app()
+    uvicorn.run(app, host=args.host, port=args.port)
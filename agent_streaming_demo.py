@@ -10,10 +10,12 @@ from langchain_deepseek import ChatDeepSeek
 from langchain_tavily import TavilySearch
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
+from stream_broadcaster import AgentStreamBroadcaster, DecisionEvent, TokenEvent
+from stream_metrics import MetricsRegistry
+from token_sink import AsyncTokenSink, TokenSink
 import asyncio
-import threading
+import sys
 import time
-from queue import Queue
 
 # 初始化模型和工具
 model = ChatDeepSeek(
@@ -35,82 +37,50 @@ agent_executor = create_react_agent(model, tools, checkpointer=memory)
 class StreamingAgent:
     """结合决策过程展示和token流式输出的Agent类"""
 
-    def __init__(self, agent_executor):
+    def __init__(self, agent_executor, thread_id="streaming-demo", metrics=None):
         self.agent_executor = agent_executor
-        self.decision_queue = Queue()
-        self.token_queue = Queue()
+        self.config = {"configurable": {"thread_id": thread_id}}
+        # stream_metrics.MetricsRegistry，记录首 token 时间、节点耗时等
+        self.metrics = metrics
 
     def stream_with_decision_and_tokens(self, input_message):
-        """同时展示决策过程和流式token输出"""
+        """同时展示决策过程和流式token输出，agent 只运行一次"""
 
         print("🤖 开始处理请求...\n")
 
-        # 启动决策过程监控线程
-        decision_thread = threading.Thread(
-            target=self._monitor_decisions, args=(input_message,)
-        )
-        decision_thread.start()
-
-        # 启动token流式输出线程
-        token_thread = threading.Thread(
-            target=self._stream_tokens, args=(input_message,)
-        )
-        token_thread.start()
-
-        # 等待两个线程完成
-        decision_thread.join()
-        token_thread.join()
-
+        broadcaster = AgentStreamBroadcaster(self.agent_executor, metrics=self.metrics)
+        subscription = broadcaster.subscribe()
+        producer = broadcaster.start({"messages": [input_message]}, self.config)
+
+        print("\n📝 实时响应:")
+        # token 合并后再输出，决策前先把已经生成的文本写出去
+        with TokenSink() as sink:
+            for event in subscription:
+                if isinstance(event, TokenEvent):
+                    sink.write(event.text)
+                else:
+                    sink.boundary()
+                    self._show_decision(event)
+        producer.join()
+
+        if subscription.error is not None:
+            print(f"❌ agent 运行错误: {subscription.error}")
         print("\n✅ 处理完成！")
 
-    def _monitor_decisions(self, input_message):
-        """监控agent的决策过程"""
-        try:
-            for step in self.agent_executor.stream(
-                {"messages": [input_message]}, stream_mode="values"
-            ):
-                latest_message = step["messages"][-1]
-
-                # 分析消息类型并展示决策过程
-                if hasattr(latest_message, "tool_calls") and latest_message.tool_calls:
-                    print(f"\n🔧 决策: 调用工具 {latest_message.tool_calls[0]['name']}")
-                    print(f"   参数: {latest_message.tool_calls[0]['args']}")
-                    print(f"   调用ID: {latest_message.tool_calls[0]['id']}")
-
-                elif (
-                    hasattr(latest_message, "tool_call_id")
-                    and latest_message.tool_call_id
-                ):
-                    print(f"\n📊 工具执行结果:")
-                    print(f"   工具: {latest_message.tool_name}")
-                    print(f"   结果: {str(latest_message.content)[:100]}...")
-
-                elif hasattr(latest_message, "content") and latest_message.content:
-                    if "AI Message" in str(latest_message):
-                        print(f"\n💭 AI思考过程: {str(latest_message.content)[:50]}...")
-
-                time.sleep(0.1)  # 避免输出过快
-
-        except Exception as e:
-            print(f"❌ 决策监控错误: {e}")
-
-    def _stream_tokens(self, input_message):
-        """流式输出token"""
-        try:
-            print("\n📝 实时响应:")
-            for step, metadata in self.agent_executor.stream(
-                {"messages": [input_message]}, stream_mode="messages"
-            ):
-                if metadata["langgraph_node"] == "agent":
-                    # 流式输出AI的token
-                    print(step.text(), end="", flush=True)
+    def _show_decision(self, event: DecisionEvent):
+        """展示agent的决策过程"""
+        if event.kind == "tool_call":
+            print(f"\n🔧 决策: 调用工具 {event.tool_call['name']}")
+            print(f"   参数: {event.tool_call['args']}")
+            print(f"   调用ID: {event.tool_call['id']}")
 
-                elif metadata["langgraph_node"] == "tool":
-                    # 工具执行时的提示
-                    print(f"\n⚡ 正在执行工具: {step.tool_name}")
+        elif event.kind == "tool_result":
+            print(f"\n📊 工具执行结果:")
+            print(f"   工具: {event.message.name}")
+            print(f"   结果: {str(event.message.content)[:100]}...")
 
-        except Exception as e:
-            print(f"❌ Token流式输出错误: {e}")
+        elif event.kind == "ai_message":
+            print(f"\n💭 AI思考过程: {str(event.message.content)[:50]}...")
 
 
 # 使用示例
@@ -139,7 +109,8 @@ def demo_combined_streaming():
     """结合决策过程和token流式输出"""
     print("\n=== 结合决策过程和token流式输出 ===")
 
-    streaming_agent = StreamingAgent(agent_executor)
+    metrics = MetricsRegistry(jsonl="stream_metrics.jsonl")
+    streaming_agent = StreamingAgent(agent_executor, metrics=metrics)
 
     # 测试不同的问题
     test_questions = [
@@ -155,6 +126,10 @@ def demo_combined_streaming():
         streaming_agent.stream_with_decision_and_tokens(question)
         time.sleep(2)  # 间隔
 
+    print("\n📈 延迟统计:")
+    print(metrics.prometheus_text())
+    metrics.close()
+
 
 def demo_async_streaming():
     """异步流式输出演示"""
@@ -166,11 +141,16 @@ def demo_async_streaming():
             "content": "Search for Python programming tutorials",
         }
 
-        async for step in agent_executor.astream(
-            {"messages": [input_message]}, stream_mode="messages"
-        ):
-            if step[1]["langgraph_node"] == "agent":
-                print(step[0].text(), end="", flush=True)
+        async def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        async with AsyncTokenSink(write) as sink:
+            async for step in agent_executor.astream(
+                {"messages": [input_message]}, stream_mode="messages"
+            ):
+                if step[1]["langgraph_node"] == "agent":
+                    await sink.write(step[0].text)
 
     asyncio.run(async_stream())
 
@@ -0,0 +1,230 @@
+# 2026/10/18
+# zhangzhong
+# 基于 asyncio 的 StreamingAgent，一个事件循环同时服务大量会话
+
+"""
+StreamingAgent 每个请求占用两个系统线程，每个决策步骤还要 time.sleep(0.1)，
+一个进程只能同时处理很少的对话。这里改用 agent_executor.astream
+（与 demo_async_streaming 相同），每个会话只是事件循环里的一个任务:
+    - 每个会话有自己的有界缓冲区，客户端读得慢时 agent 会在 put 处等待（背压）
+    - 客户端断开（停止迭代或任务被取消）时取消该会话的 agent 运行
+    - 热路径上没有 sleep
+
+事件类型与 stream_broadcaster 相同。
+"""
+
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import logging
+import sys
+
+from stream_broadcaster import (
+    STREAM_MODES,
+    DecisionEvent,
+    EndEvent,
+    StreamEvent,
+    StreamEventConverter,
+    TokenEvent,
+)
+from token_sink import AsyncTokenSink
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStreamingAgent:
+    """
+    异步的流式 agent
+
+    用法:
+        agent = AsyncStreamingAgent(agent_executor)
+        async for event in agent.stream(input_message, thread_id="user-1"):
+            ...
+    """
+
+    def __init__(
+        self,
+        agent_executor: Any,
+        buffer_size: int = 64,
+        max_sessions: Optional[int] = None,
+        metrics: Any = None,
+    ) -> None:
+        """
+        Args:
+            agent_executor: 支持 astream 的 agent（如 create_react_agent 的返回值）
+            buffer_size: 每个会话缓冲的事件数
+            max_sessions: 同时运行的会话数上限，超出的会话排队等待；None 表示不限制
+            metrics: stream_metrics.MetricsRegistry，记录每次运行的延迟统计
+        """
+        self.agent_executor = agent_executor
+        self.metrics = metrics
+        self.buffer_size = buffer_size
+        self._limit = asyncio.Semaphore(max_sessions) if max_sessions else None
+        # thread_id -> agent 运行的任务，排队等名额的会话为 None
+        self._sessions: Dict[str, Optional[asyncio.Task]] = {}
+
+    @property
+    def active_sessions(self) -> int:
+        return sum(task is not None for task in self._sessions.values())
+
+    def cancel(self, thread_id: str) -> bool:
+        """取消正在运行的会话，返回会话是否在运行（排队中的会话不算）"""
+        task = self._sessions.get(thread_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def stream(
+        self,
+        input_message: Any,
+        thread_id: str,
+        config: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        运行一次 agent，按执行顺序产出 DecisionEvent 和 TokenEvent，最后是 EndEvent
+
+        Args:
+            input_message: 用户消息
+            thread_id: 会话 id，同一会话同时只能有一次运行
+            config: 额外的运行配置，thread_id 会合并到 configurable 中
+
+        Yields:
+            StreamEvent: 事件；运行出错时 EndEvent.error 为异常
+        """
+        config = dict(config or {})
+        config["configurable"] = {
+            **config.get("configurable", {}),
+            "thread_id": thread_id,
+        }
+        inputs = {"messages": [input_message]}
+        buffer: "asyncio.Queue[StreamEvent]" = asyncio.Queue(self.buffer_size)
+
+        # 先检查并占住会话再排队等名额，满载时同一会话的第二个请求也立即被拒绝
+        if thread_id in self._sessions:
+            raise ValueError(f"会话 {thread_id} 正在运行")
+        self._sessions[thread_id] = None
+        if self._limit is not None:
+            try:
+                await self._limit.acquire()
+            except BaseException:
+                # 排队时被取消，释放占住的会话
+                del self._sessions[thread_id]
+                raise
+        producer = asyncio.create_task(self._produce(inputs, config, buffer))
+        self._sessions[thread_id] = producer
+        try:
+            while True:
+                event = await buffer.get()
+                yield event
+                if isinstance(event, EndEvent):
+                    return
+        finally:
+            # 正常结束、客户端断开（aclose）或任务被取消都会到这里
+            if not producer.done():
+                producer.cancel()
+                logger.debug("会话 %s 已断开，取消 agent 运行", thread_id)
+            await asyncio.gather(producer, return_exceptions=True)
+            del self._sessions[thread_id]
+            if self._limit is not None:
+                self._limit.release()
+
+    async def _produce(
+        self,
+        inputs: Dict[str, Any],
+        config: Dict[str, Any],
+        buffer: "asyncio.Queue[StreamEvent]",
+    ) -> None:
+        request = None
+        if self.metrics is not None:
+            request = self.metrics.start(config["configurable"]["thread_id"])
+        converter = StreamEventConverter(request)
+        error = None
+        try:
+            async for mode, chunk in self.agent_executor.astream(
+                inputs, config, stream_mode=STREAM_MODES
+            ):
+                for event in converter.convert(mode, chunk):
+                    await buffer.put(event)
+        except asyncio.CancelledError as e:
+            self._record(request, e)
+            # 被 cancel() 取消时通知读取方；丢掉还没读的事件，保证放得下
+            while buffer.full():
+                buffer.get_nowait()
+            buffer.put_nowait(EndEvent(e))
+            raise
+        except Exception as e:
+            logger.error("agent 运行出错: %s", e)
+            error = e
+        self._record(request, error)
+        await buffer.put(EndEvent(error))
+
+    def _record(self, request: Any, error: Optional[BaseException]) -> None:
+        if request is None:
+            return
+        # 统计出错时只记日志，之后照常发送 EndEvent
+        try:
+            request.finish(error)
+            self.metrics.record(request)
+        except Exception:
+            logger.exception("记录延迟统计出错")
+
+    async def stream_with_decision_and_tokens(
+        self, input_message: Any, thread_id: str
+    ) -> None:
+        """StreamingAgent.stream_with_decision_and_tokens 的异步版本"""
+        print("🤖 开始处理请求...\n")
+        print("\n📝 实时响应:")
+
+        async def write(text: str) -> None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        sink = AsyncTokenSink(write)
+        async for event in self.stream(input_message, thread_id):
+            if isinstance(event, TokenEvent):
+                await sink.write(event.text)
+                continue
+            await sink.boundary()
+            if isinstance(event, DecisionEvent):
+                if event.kind == "tool_call":
+                    print(f"\n🔧 决策: 调用工具 {event.tool_call['name']}")
+                    print(f"   参数: {event.tool_call['args']}")
+                elif event.kind == "tool_result":
+                    print(f"\n📊 工具执行结果: {str(event.message.content)[:100]}...")
+            elif event.error is not None:
+                print(f"❌ agent 运行错误: {event.error}")
+        print("\n✅ 处理完成！")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from langchain_deepseek import ChatDeepSeek
+    from langchain_tavily import TavilySearch
+    from langgraph.prebuilt import create_react_agent
+    from langgraph.checkpoint.memory import MemorySaver
+
+    model = ChatDeepSeek(model="deepseek-chat", temperature=0)
+    agent_executor = create_react_agent(
+        model, [TavilySearch(max_results=2)], checkpointer=MemorySaver()
+    )
+    agent = AsyncStreamingAgent(agent_executor)
+
+    async def main():
+        questions = [
+            "What's the weather in Beijing?",
+            "Tell me about the latest AI developments",
+        ]
+        # 多个会话在同一个事件循环中并发运行
+        await asyncio.gather(
+            *(
+                agent.stream_with_decision_and_tokens(
+                    {"role": "user", "content": question}, thread_id=f"demo-{i}"
+                )
+                for i, question in enumerate(questions)
+            )
+        )
+
+    asyncio.run(main())
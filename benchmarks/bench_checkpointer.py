@@ -0,0 +1,158 @@
+"""
+对比 MemorySaver 与 SQLiteSaver 的 checkpoint 写入和读取延迟
+
+每个 thread 模拟一次运行到 human_review 暂停:
+    超步 1: put(初始 checkpoint)
+    超步 2: put_writes(节点的输出) + put(新 checkpoint)
+    暂停:   put_writes(interrupt)
+写入延迟按上面每一项统计；全部写完后随机读取 thread 的最新 checkpoint（即恢复暂停的 thread），
+统计 get_tuple 的延迟。checkpoint 的内容取自假模型 agent 一次真实运行的状态。
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_checkpointer --threads 10000 100000 1000000
+"""
+
+from typing import Any, Callable, Dict, Tuple
+from array import array
+import argparse
+import gc
+import os
+import random
+import resource
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import INTERRUPT
+from langgraph.types import Interrupt
+
+from fake_chat_model import create_fake_agent
+from sqlite_checkpointer import SQLiteSaver
+
+
+def sample_checkpoint() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """运行一次假模型 agent，取最后的 checkpoint 和 metadata"""
+    saver = MemorySaver()
+    agent = create_fake_agent(checkpointer=saver)
+    config = {"configurable": {"thread_id": "sample"}}
+    agent.invoke({"messages": [{"role": "user", "content": "hi"}]}, config)
+    saved = saver.get_tuple(config)
+    return saved.checkpoint, saved.metadata
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples: array, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(saver: Any, threads: int, reads: int) -> Dict[str, float]:
+    checkpoint, metadata = sample_checkpoint()
+    versions = checkpoint["channel_versions"]
+    output = [("messages", [AIMessage(content="drafted reply")])]
+    pause = [(INTERRUPT, [Interrupt(value={"action": "review"})])]
+    writes = array("d")
+    clock = time.perf_counter
+
+    start = clock()
+    for i in range(threads):
+        thread_id = f"thread-{i}"
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+        t0 = clock()
+        config = saver.put(
+            config,
+            {**checkpoint, "id": str(uuid6())},
+            {**metadata, "step": 0},
+            versions,
+        )
+        t1 = clock()
+        saver.put_writes(config, output, "task-1")
+        config = saver.put(
+            config,
+            {**checkpoint, "id": str(uuid6())},
+            {**metadata, "step": 1},
+            versions,
+        )
+        t2 = clock()
+        saver.put_writes(config, pause, "task-2")
+        t3 = clock()
+        writes.extend((t1 - t0, t2 - t1, t3 - t2))
+    write_seconds = clock() - start
+
+    read = array("d")
+    for i in random.sample(range(threads), min(reads, threads)):
+        t0 = clock()
+        saved = saver.get_tuple({"configurable": {"thread_id": f"thread-{i}"}})
+        read.append(clock() - t0)
+        assert saved.pending_writes[0][1] == INTERRUPT
+
+    return {
+        "write_p50": percentile(writes, 0.5),
+        "write_p99": percentile(writes, 0.99),
+        "supersteps_per_second": threads * 2 / write_seconds,
+        "read_p50": percentile(read, 0.5),
+        "read_p99": percentile(read, 0.99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--reads", type=int, default=10000)
+    parser.add_argument(
+        "--savers",
+        nargs="+",
+        choices=["memory", "sqlite"],
+        default=["memory", "sqlite"],
+        help="100 万个 thread 时 MemorySaver 需要约 6GB 内存",
+    )
+    args = parser.parse_args()
+
+    factories: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+        "memory": ("MemorySaver", lambda path: MemorySaver()),
+        "sqlite": ("SQLiteSaver", lambda path: SQLiteSaver(path)),
+    }
+    savers = [factories[name] for name in args.savers]
+    print(
+        f"{'threads':>8} {'checkpointer':<12} {'写p50(µs)':>10} {'写p99(µs)':>10} "
+        f"{'超步/秒':>9} {'读p50(µs)':>10} {'读p99(µs)':>10} {'内存(MB)':>9} {'文件(MB)':>9}"
+    )
+    for threads in args.threads:
+        for name, factory in savers:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "checkpoints.sqlite")
+                gc.collect()
+                before = rss_mb()
+                saver = factory(path)
+                result = run(saver, threads, args.reads)
+                memory = rss_mb() - before
+                size = sum(
+                    os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)
+                )
+                if isinstance(saver, SQLiteSaver):
+                    saver.close()
+                del saver
+                gc.collect()
+            print(
+                f"{threads:>8} {name:<12} {result['write_p50'] * 1e6:>10.1f} "
+                f"{result['write_p99'] * 1e6:>10.1f} "
+                f"{result['supersteps_per_second']:>9.0f} "
+                f"{result['read_p50'] * 1e6:>10.1f} {result['read_p99'] * 1e6:>10.1f} "
+                f"{memory:>9.1f} {size / 2**20:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
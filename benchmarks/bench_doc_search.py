@@ -0,0 +1,99 @@
+"""
+本地帮助文档搜索（learn_langgraph.doc_search）的建索引、增量更新和查询延迟
+
+生成 N 篇合成文章（每篇若干段落，词从一个 Zipf 分布的词表中抽取），统计:
+    - 第一次建立索引的时间
+    - 修改一篇文章后 refresh() 的时间（只重新读这一篇）
+    - 随机 2~4 个词的查询的 p50/p99 延迟
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_doc_search --articles 100 1000 5000
+"""
+
+from typing import Dict, List
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from learn_langgraph.doc_search import DocSearch
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def write_corpus(directory: str, articles: int, paragraphs: int, rng: random.Random):
+    for i in range(articles):
+        blocks = [f"# Article {i}"]
+        for _ in range(paragraphs):
+            words = rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(20, 80))
+            blocks.append(" ".join(words))
+        with open(os.path.join(directory, f"article-{i}.md"), "w") as f:
+            f.write("\n\n".join(blocks))
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(articles: int, paragraphs: int, queries: int) -> Dict[str, float]:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp, articles, paragraphs, rng)
+        search = DocSearch(tmp)
+
+        start = time.perf_counter()
+        search.refresh()
+        build = time.perf_counter() - start
+
+        # 保证 mtime 不同
+        time.sleep(0.01)
+        changed = os.path.join(tmp, "article-0.md")
+        with open(changed, "a") as f:
+            f.write("\n\nupdated paragraph")
+        start = time.perf_counter()
+        result = search.refresh()
+        update = time.perf_counter() - start
+        assert result["read"] == 1
+
+        latencies = []
+        for _ in range(queries):
+            query = " ".join(rng.choices(VOCABULARY[:5000], k=rng.randint(2, 4)))
+            start = time.perf_counter()
+            search.search(query)
+            latencies.append(time.perf_counter() - start)
+        size = os.path.getsize(search.index_path)
+
+    return {
+        "build": build,
+        "update": update,
+        "query_p50": percentile(latencies, 0.5),
+        "query_p99": percentile(latencies, 0.99),
+        "size": size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--paragraphs", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'文章数':>6} {'建索引(s)':>10} {'增量更新(s)':>12} "
+        f"{'查询p50(ms)':>12} {'查询p99(ms)':>12} {'索引(MB)':>9}"
+    )
+    for articles in args.articles:
+        result = run(articles, args.paragraphs, args.queries)
+        print(
+            f"{articles:>6} {result['build']:>10.3f} {result['update']:>12.3f} "
+            f"{result['query_p50'] * 1000:>12.3f} {result['query_p99'] * 1000:>12.3f} "
+            f"{result['size'] / 2**20:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+对比 messages 用 operator.add 的列表与 MessageLog 在长的 agent 循环里的耗时和内存
+
+agent 节点每一步发出一个 tool call，tool 节点返回结果，直到 messages 达到 --steps 条:
+    - reducer:    只调用 reducer --steps 次（不经过 LangGraph），看合并本身的开销
+    - graph:      不带 checkpointer 运行整个图
+    - checkpoint: 带 MemorySaver 运行 --checkpoint-steps 步，list 用默认的 serde，
+                  MessageLog 用 DeltaSerializer，统计所有 checkpoint 的字节数
+内存是 tracemalloc 统计的峰值，耗时也包括 tracemalloc 的开销，只看相对值。
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_message_log --steps 10000 --checkpoint-steps 1000
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import operator
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import Annotated, TypedDict
+
+from learn_langgraph.message_log import DeltaSerializer, MessageLog, append_messages
+
+
+class ListState(TypedDict):
+    messages: Annotated[list, operator.add]
+
+
+class LogState(TypedDict):
+    messages: Annotated[MessageLog, append_messages]
+
+
+def ai_message(i: int) -> AIMessage:
+    call = {"name": "add", "args": {"a": i, "b": 1}, "id": f"call-{i}"}
+    return AIMessage(content=f"step {i}", tool_calls=[call])
+
+
+def build(state: type, steps: int) -> StateGraph:
+    def agent(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {"messages": [ai_message(len(state["messages"]))]}
+
+    def tool(state: Dict[str, Any]) -> Dict[str, Any]:
+        call = state["messages"][-1].tool_calls[0]
+        result = call["args"]["a"] + call["args"]["b"]
+        return {"messages": [ToolMessage(content=str(result), tool_call_id=call["id"])]}
+
+    def should_continue(state: Dict[str, Any]) -> str:
+        return "tool" if len(state["messages"]) < steps else END
+
+    builder = StateGraph(state)
+    builder.add_node("agent", agent)
+    builder.add_node("tool", tool)
+    builder.add_edge(START, "agent")
+    builder.add_conditional_edges("agent", should_continue, ["tool", END])
+    builder.add_edge("tool", "agent")
+    return builder
+
+
+def measure(func: Callable[[], Any]) -> Tuple[float, float, Any]:
+    """(耗时秒, 内存峰值 MB, 返回值)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+
+def reducer_loop(reducer: Callable, initial: Any, messages: List[AIMessage]) -> Any:
+    value = initial
+    for message in messages:
+        value = reducer(value, [message])
+    return value
+
+
+def graph_run(state: type, steps: int, saver: Any = None) -> int:
+    app = build(state, steps).compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": steps * 2}
+    app.invoke({"messages": [HumanMessage(content="go")]}, config)
+    if saver is None:
+        return 0
+    # 所有 checkpoint 序列化后的字节数
+    return sum(len(data) for _, data in saver.blobs.values()) + sum(
+        len(data)
+        for checkpoints in saver.storage.values()
+        for namespace in checkpoints.values()
+        for (_, data), *_ in namespace.values()
+    )
+
+
+def row(name: str, base: Tuple[float, float], new: Tuple[float, float]) -> None:
+    print(
+        f"{name:<12}{base[0]:>10.2f}{new[0]:>10.2f}{base[1]:>11.1f}{new[1]:>11.1f}"
+        f"{base[0] / new[0]:>9.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=10_000)
+    parser.add_argument("--checkpoint-steps", type=int, default=1_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'':<12}{'list(s)':>10}{'log(s)':>10}{'list(MB)':>11}{'log(MB)':>11}{'加速':>8}"
+    )
+    messages = [ai_message(i) for i in range(args.steps)]
+    base = measure(lambda: reducer_loop(operator.add, [], messages))
+    new = measure(lambda: reducer_loop(append_messages, MessageLog(), messages))
+    row("reducer", base[:2], new[:2])
+
+    base = measure(lambda: graph_run(ListState, args.steps))
+    new = measure(lambda: graph_run(LogState, args.steps))
+    row("graph", base[:2], new[:2])
+
+    steps = args.checkpoint_steps
+    base = measure(lambda: graph_run(ListState, steps, MemorySaver()))
+    serde = DeltaSerializer()
+    new = measure(lambda: graph_run(LogState, steps, MemorySaver(serde=serde)))
+    row("checkpoint", base[:2], new[:2])
+    chunk_bytes = sum(len(data) for data in serde.chunks.values())
+    print(
+        f"checkpoint 字节数（{steps} 步）: list {base[2] / 2**20:.1f} MB, "
+        f"MessageLog {(new[2] + chunk_bytes) / 2**20:.1f} MB（其中块 {chunk_bytes / 2**20:.1f} MB）"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+mindmap_converter 基准测试
+
+对每种合成树测量 simple_to_frontend、frontend_to_simple、
+validate_simple_format 和 extract_text_content 的耗时、峰值内存和每秒节点数，
+并与基线文件比较，方便在提交之间发现性能回归。
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_mindmap                    # 运行并与基线比较
+    python -m benchmarks.bench_mindmap --update-baseline  # 运行并写入基线
+    python -m benchmarks.bench_mindmap --quick --check    # 小规模运行，有回归时返回非零
+
+基线与机器相关，换机器后请先 --update-baseline。
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks import mindmap_generator
+from mindmap_converter import MindMapConverter
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "mindmap_baseline.json")
+
+# (名称, 生成函数, 完整规模参数, --quick 规模参数)
+CASES: List[Tuple[str, Callable[..., Dict[str, Any]], Dict, Dict]] = [
+    ("chain", mindmap_generator.chain, {"depth": 5000}, {"depth": 1000}),
+    ("fan", mindmap_generator.fan, {"width": 100000}, {"width": 10000}),
+    (
+        "balanced",
+        mindmap_generator.balanced,
+        {"nodes": 200000, "branching": 8},
+        {"nodes": 20000, "branching": 8},
+    ),
+    (
+        "realistic",
+        mindmap_generator.realistic,
+        {"nodes": 200000},
+        {"nodes": 20000},
+    ),
+    (
+        "realistic-html",
+        mindmap_generator.realistic,
+        {"nodes": 100000, "html": True},
+        {"nodes": 10000, "html": True},
+    ),
+]
+
+
+def operations(
+    simple: Dict[str, Any], frontend: Dict[str, Any]
+) -> List[Tuple[str, Callable[[], Any]]]:
+    return [
+        ("simple_to_frontend", lambda: MindMapConverter.simple_to_frontend(simple)),
+        ("frontend_to_simple", lambda: MindMapConverter.frontend_to_simple(frontend)),
+        (
+            "validate_simple_format",
+            lambda: MindMapConverter.validate_simple_format(simple),
+        ),
+        (
+            "extract_text_content[simple]",
+            lambda: MindMapConverter.extract_text_content(simple),
+        ),
+        (
+            "extract_text_content[frontend]",
+            lambda: MindMapConverter.extract_text_content(frontend),
+        ),
+    ]
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    """返回 (最短耗时秒, 峰值内存字节)；峰值内存单独跑一次，避免 tracemalloc 影响计时"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def run(quick: bool, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for case, generate, full_params, quick_params in CASES:
+        params = quick_params if quick else full_params
+        simple = generate(seed=seed, **params)
+        nodes = mindmap_generator.count_nodes(simple)
+        frontend = MindMapConverter.simple_to_frontend(simple)
+
+        for name, fn in operations(simple, frontend):
+            seconds, peak = measure(fn, repeat)
+            key = f"{case}/{name}"
+            results[key] = {
+                "nodes": nodes,
+                "seconds": seconds,
+                "peak_bytes": peak,
+                "nodes_per_sec": nodes / seconds if seconds else float("inf"),
+            }
+            print(
+                f"{key:<48} {nodes:>8} 节点 {seconds * 1000:>10.1f} ms "
+                f"{peak / 2**20:>9.1f} MiB {results[key]['nodes_per_sec']:>12.0f} 节点/s",
+                flush=True,
+            )
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    """返回回归项的描述"""
+    regressions = []
+    print(f"\n与基线比较（阈值 {threshold:.0%}）:")
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or base["nodes"] != result["nodes"]:
+            print(f"{key:<48} 无可比基线")
+            continue
+        time_change = result["seconds"] / base["seconds"] - 1
+        memory_change = result["peak_bytes"] / max(base["peak_bytes"], 1) - 1
+        marks = []
+        if time_change > threshold:
+            marks.append("耗时回归")
+        if memory_change > threshold:
+            marks.append("内存回归")
+        print(
+            f"{key:<48} 耗时 {time_change:>+7.1%} 内存 {memory_change:>+7.1%} "
+            f"{' '.join(marks)}"
+        )
+        if marks:
+            regressions.append(f"{key}: {' '.join(marks)}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="mindmap_converter 基准测试")
+    parser.add_argument("--quick", action="store_true", help="使用小规模的树")
+    parser.add_argument("--repeat", type=int, default=3, help="计时重复次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--update-baseline", action="store_true", help="写入基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="回归阈值")
+    parser.add_argument("--check", action="store_true", help="有回归时返回非零")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    results = run(args.quick, args.repeat, args.seed)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        print(f"\n基线已写入 {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n基线文件不存在: {args.baseline}，可用 --update-baseline 生成")
+        return
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+对比字典形式与 CompactMindMap 的内存占用和遍历速度
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_mindmap_compact --nodes 1000000
+"""
+
+from typing import Any, Callable, Tuple
+import argparse
+import gc
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmarks.mindmap_generator import balanced
+from mindmap_compact import CompactMindMap
+from mindmap_converter import MindMapConverter
+
+
+def retained(factory: Callable[[], Any]) -> Tuple[Any, int]:
+    """返回 (对象, 对象保留的内存字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    obj = factory()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=1000000)
+    parser.add_argument("--branching", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    simple_text = json.dumps(balanced(args.nodes, args.branching))
+    frontend_text = json.dumps(
+        MindMapConverter.simple_to_frontend(json.loads(simple_text))
+    )
+
+    simple, simple_bytes = retained(lambda: json.loads(simple_text))
+    frontend, frontend_bytes = retained(lambda: json.loads(frontend_text))
+    # 从新解析的字典加载，字典释放后标题字符串只由紧凑结构持有
+    compact, compact_bytes = retained(
+        lambda: CompactMindMap.from_simple(json.loads(simple_text))
+    )
+
+    print(f"节点数: {len(compact)}, 不同标题数: {len(compact.titles)}")
+    print(f"简单格式字典: {simple_bytes / args.nodes:.0f} B/节点")
+    print(f"前端格式字典: {frontend_bytes / args.nodes:.0f} B/节点")
+    print(f"紧凑结构:     {compact_bytes / args.nodes:.0f} B/节点")
+
+    rows = [
+        (
+            "validate_simple_format",
+            lambda: MindMapConverter.validate_simple_format(simple),
+            compact.validate_simple_format,
+        ),
+        (
+            "extract_text_content",
+            lambda: MindMapConverter.extract_text_content(simple),
+            compact.extract_text_content,
+        ),
+        (
+            "to_frontend",
+            lambda: MindMapConverter.simple_to_frontend(simple),
+            compact.to_frontend,
+        ),
+        (
+            "from_simple",
+            lambda: None,
+            lambda: CompactMindMap.from_simple(simple),
+        ),
+        (
+            "from_frontend",
+            lambda: None,
+            lambda: CompactMindMap.from_frontend(frontend),
+        ),
+    ]
+    for name, dict_fn, compact_fn in rows:
+        print(f"{name}: 字典 {timed(dict_fn):.3f}s, 紧凑 {timed(compact_fn):.3f}s")
+
+    assert compact.to_frontend() == MindMapConverter.simple_to_frontend(simple)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+对比思维导图整体转换与流式转换的峰值内存
+
+整体转换: json.load -> MindMapConverter.simple_to_frontend -> json.dump(indent=4)
+流式转换: mindmap_streaming.convert_file
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_mindmap_streaming --nodes 200000
+"""
+
+from typing import Callable, Tuple
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mindmap_generator import balanced
+from mindmap_converter import MindMapConverter
+from mindmap_streaming import convert_file
+
+
+def load_and_convert(input_path: str, output_path: str) -> None:
+    """当前的整体转换路径"""
+    with open(input_path, "r") as f:
+        mindmap_data = json.load(f)
+    frontend_data = MindMapConverter.simple_to_frontend(mindmap_data)
+    with open(output_path, "w") as f:
+        json.dump(frontend_data, f, indent=4)
+
+
+def stream_convert(input_path: str, output_path: str) -> None:
+    convert_file("to-frontend", input_path, output_path)
+
+
+def measure(fn: Callable[[str, str], None], *args: str) -> Tuple[float, int]:
+    """返回 (耗时秒, 峰值内存字节)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--branching", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "mindmap.json")
+        with open(input_path, "w") as f:
+            json.dump(balanced(args.nodes, args.branching), f, indent=4)
+        input_size = os.path.getsize(input_path)
+        print(f"节点数: {args.nodes}, 输入大小: {input_size / 2**20:.1f} MiB")
+
+        outputs = {}
+        for name, fn in [("整体转换", load_and_convert), ("流式转换", stream_convert)]:
+            output_path = os.path.join(tmp, f"{name}.json")
+            elapsed, peak = measure(fn, input_path, output_path)
+            outputs[name] = output_path
+            print(
+                f"{name}: 耗时 {elapsed:.2f}s, 峰值内存 {peak / 2**20:.1f} MiB "
+                f"({peak / input_size:.2f}x 输入大小)"
+            )
+
+        with open(outputs["整体转换"]) as a, open(outputs["流式转换"]) as b:
+            print(f"输出一致: {a.read() == b.read()}")
+
+
+if __name__ == "__main__":
+    main()
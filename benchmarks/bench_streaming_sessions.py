@@ -0,0 +1,114 @@
+"""
+AsyncStreamingAgent 在一个事件循环上能同时服务多少会话
+
+每个会话模拟一次 LLM 回复：每隔 --interval 秒输出一个 token，共 --tokens 个，
+理想耗时为 tokens * interval。用进程 CPU 时间算出每个会话的 CPU 开销，
+折算为单核能持续承载的并发会话数: 理想耗时 / 每会话 CPU 时间。
+耗时明显超过理想耗时说明这一档已经把 CPU 跑满了。
+
+--graph 使用真实的 create_react_agent（假模型），包含 LangGraph 自身的开销；
+--replay 回放 stream_recorder 录制的真实运行（--speed 为回放倍速）。
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_streaming_sessions --sessions 100,1000,5000
+"""
+
+from typing import Any, List
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from async_streaming_agent import AsyncStreamingAgent
+
+
+class SimulatedAgent:
+    """按固定间隔输出 token 的假 agent，代替真实模型的网络延迟"""
+
+    def __init__(self, tokens: int, interval: float) -> None:
+        self.tokens = tokens
+        self.interval = interval
+
+    async def astream(self, inputs, config, stream_mode):
+        messages = [HumanMessage(inputs["messages"][0]["content"])]
+        yield "values", {"messages": messages}
+        for i in range(self.tokens):
+            await asyncio.sleep(self.interval)
+            yield "messages", (AIMessageChunk(content=f"token{i} "), {})
+        answer = AIMessage(content="done")
+        yield "values", {"messages": messages + [answer]}
+
+
+def graph_agent(tokens: int, interval: float) -> Any:
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langgraph.prebuilt import create_react_agent
+
+    class SlowModel(GenericFakeChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        async def _astream(self, *args, **kwargs):
+            async for chunk in super()._astream(*args, **kwargs):
+                await asyncio.sleep(interval)
+                yield chunk
+
+    reply = AIMessage(content=" ".join(f"token{i}" for i in range(tokens)))
+    model = SlowModel(messages=itertools.repeat(reply))
+    return create_react_agent(model, [])
+
+
+async def run_sessions(agent: AsyncStreamingAgent, sessions: int) -> List[int]:
+    async def session(i: int) -> int:
+        count = 0
+        async for _ in agent.stream({"role": "user", "content": "hi"}, f"s{i}"):
+            count += 1
+        return count
+
+    return await asyncio.gather(*(session(i) for i in range(sessions)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", default="100,1000,5000")
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--buffer", type=int, default=16)
+    parser.add_argument("--graph", action="store_true")
+    parser.add_argument("--replay", help="stream_recorder 录制文件")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.replay:
+        from stream_recorder import ReplayAgent
+
+        executor = ReplayAgent(args.replay, args.speed)
+        ideal = executor.duration / args.speed if args.speed else 0.0
+        print(f"回放 {args.replay}，理想耗时 {ideal:.2f}s")
+    else:
+        if args.graph:
+            executor = graph_agent(args.tokens, args.interval)
+        else:
+            executor = SimulatedAgent(args.tokens, args.interval)
+        ideal = args.tokens * args.interval
+        print(f"每个会话 {args.tokens} 个 token，理想耗时 {ideal:.2f}s")
+    print(f"{'会话数':>8} {'耗时(s)':>8} {'CPU(s)':>8} {'事件/s':>10} {'会话/核':>10}")
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        agent = AsyncStreamingAgent(executor, buffer_size=args.buffer)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        counts = asyncio.run(run_sessions(agent, sessions))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        per_core = sessions * ideal / cpu if cpu else float("inf")
+        print(
+            f"{sessions:>8} {wall:>8.2f} {cpu:>8.2f} "
+            f"{sum(counts) / wall:>10.0f} {per_core:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+对比逐 token flush 与 TokenSink 的系统调用次数和 CPU 时间
+
+输出目标是管道（另一个线程读走数据，模拟日志收集器）或 /dev/null。
+系统调用次数为底层 FileIO.write 的调用次数；Linux 上同时给出 /proc/self/io 的 syscw。
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_token_sink --tokens 100000
+"""
+
+from typing import Callable, Dict, List, Optional
+import argparse
+import io
+import os
+import random
+import threading
+import time
+
+from token_sink import TokenSink
+
+
+class CountingFileIO(io.FileIO):
+    """记录 write 系统调用次数的 FileIO"""
+
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def syscw() -> Optional[int]:
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("syscw:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def make_tokens(count: int) -> List[str]:
+    words = "the agent decided to call the search tool and then summarized it".split()
+    rng = random.Random(0)
+    return [rng.choice(words) + " " for _ in range(count)]
+
+
+def open_target(target: str):
+    """返回 (文本流, 原始 FileIO, 清理函数)，文本流与管道模式下的 sys.stdout 相同"""
+    if target == "null":
+        raw = CountingFileIO("/dev/null", "w")
+        return io.TextIOWrapper(io.BufferedWriter(raw)), raw, lambda: None
+
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        while os.read(read_fd, 1 << 16):
+            pass
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    raw = CountingFileIO(write_fd, "w")
+
+    def cleanup():
+        reader.join()
+        os.close(read_fd)
+
+    return io.TextIOWrapper(io.BufferedWriter(raw)), raw, cleanup
+
+
+def per_token(stream, tokens: List[str]) -> None:
+    for token in tokens:
+        print(token, end="", flush=True, file=stream)
+
+
+def coalesced(stream, tokens: List[str]) -> None:
+    with TokenSink(stream) as sink:
+        for token in tokens:
+            sink.write(token)
+
+
+def measure(fn: Callable, target: str, tokens: List[str]) -> Dict[str, float]:
+    stream, raw, cleanup = open_target(target)
+    before = syscw()
+    wall, cpu = time.perf_counter(), time.process_time()
+    fn(stream, tokens)
+    stream.flush()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    after = syscw()
+    writes = raw.writes
+    stream.close()
+    cleanup()
+    return {
+        "writes": writes,
+        "syscw": None if before is None else after - before,
+        "cpu": cpu,
+        "wall": wall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=100000)
+    parser.add_argument("--target", choices=["pipe", "null"], default="pipe")
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    scale = 100000 / args.tokens
+    print(f"{args.tokens} 个 token 写入 {args.target}，数值折算为每 10 万 token")
+    print(
+        f"{'方式':<12} {'write调用':>10} {'syscw':>10} {'CPU(ms)':>10} {'耗时(ms)':>10}"
+    )
+    for name, fn in (("逐token flush", per_token), ("TokenSink", coalesced)):
+        result = measure(fn, args.target, tokens)
+        syscalls = "-" if result["syscw"] is None else f"{result['syscw'] * scale:.0f}"
+        print(
+            f"{name:<12} {result['writes'] * scale:>10.0f} {syscalls:>10} "
+            f"{result['cpu'] * 1000 * scale:>10.1f} {result['wall'] * 1000 * scale:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+对比逐个调用工具（原来的 tool_node）与 ToolExecutor 并发调用的耗时
+
+模拟模型一轮发出 N 个互不依赖的 tool call，每个工具固定耗时 --latency 秒，
+同步工具用 time.sleep，异步工具用 asyncio.sleep，分别统计:
+    - sequential: 逐个 tool.invoke
+    - run:        ToolExecutor.run（同步节点）
+    - arun:       ToolExecutor.arun（异步节点）
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_tool_executor --calls 1 5 10 --latency 0.1
+"""
+
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import time
+
+from langchain_core.tools import tool
+
+from learn_langgraph.tool_executor import ToolExecutor
+
+
+def make_tools(latency: float) -> List[Any]:
+    @tool
+    def slow_add(a: int, b: int) -> int:
+        """Adds `a` and `b`, taking `latency` seconds."""
+        time.sleep(latency)
+        return a + b
+
+    @tool
+    async def slow_multiply(a: int, b: int) -> int:
+        """Multiplies `a` and `b`, taking `latency` seconds."""
+        await asyncio.sleep(latency)
+        return a * b
+
+    return [slow_add, slow_multiply]
+
+
+def make_calls(count: int, name: str) -> List[Dict[str, Any]]:
+    return [
+        {"name": name, "args": {"a": i, "b": i + 1}, "id": f"call-{i}"}
+        for i in range(count)
+    ]
+
+
+def sequential(tools_by_name: Dict[str, Any], calls: List[Dict[str, Any]]) -> None:
+    for tool_call in calls:
+        tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tools = make_tools(args.latency)
+    tools_by_name = {tool.name: tool for tool in tools}
+    executor = ToolExecutor(tools, max_workers=max(args.calls))
+    print(
+        f"{'工具':<14}{'调用数':>6}{'逐个(s)':>10}{'run(s)':>10}{'arun(s)':>10}{'加速':>8}"
+    )
+    for name in tools_by_name:
+        for count in args.calls:
+            calls = make_calls(count, name)
+            if name == "slow_multiply":
+                # 异步工具逐个调用时也要在事件循环里 await
+                async def serial() -> None:
+                    for tool_call in calls:
+                        await tools_by_name[name].ainvoke(tool_call["args"])
+
+                baseline = timed(lambda: asyncio.run(serial()), args.repeat)
+            else:
+                baseline = timed(lambda: sequential(tools_by_name, calls), args.repeat)
+            threaded = timed(lambda: executor.run(calls), args.repeat)
+            concurrent = timed(lambda: asyncio.run(executor.arun(calls)), args.repeat)
+            print(
+                f"{name:<16}{count:>6}{baseline:>10.3f}{threaded:>10.3f}"
+                f"{concurrent:>10.3f}{baseline / min(threaded, concurrent):>9.1f}x"
+            )
+    executor.close()
+
+
+if __name__ == "__main__":
+    main()
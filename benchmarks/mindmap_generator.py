@@ -0,0 +1,129 @@
+"""
+可复现的思维导图生成器，用于基准测试
+
+所有生成器都用显式栈/队列构建，深链也不会触发递归限制；
+相同的参数和 seed 总是生成相同的树。
+"""
+
+from typing import Any, Dict, List
+import random
+
+# 富文本标题用到的标签，覆盖 frontend_to_simple 的正则替换路径
+_RICH_TEXT_TEMPLATES = [
+    "<strong>{}</strong>",
+    '<span style="color: rgb(231, 76, 60);">{}</span>',
+    "<em>{}</em> <u>{}</u>",
+    '<a href="https://example.com/{}" target="_blank">{}</a>',
+    "{}<br>{}",
+]
+
+_WORDS = [
+    "人工智能",
+    "教育",
+    "数据",
+    "模型",
+    "评估",
+    "课程",
+    "学习路径",
+    "知识图谱",
+    "推荐",
+    "反馈",
+    "learning",
+    "analytics",
+    "pipeline",
+    "agent",
+]
+
+
+def _title(rng: random.Random, index: int, html: bool) -> str:
+    words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 4)))
+    title = f"{words} {index}"
+    if html:
+        template = rng.choice(_RICH_TEXT_TEMPLATES)
+        title = template.format(*([title] * template.count("{}")))
+    return title
+
+
+def _node(rng: random.Random, index: int, html: bool) -> Dict[str, Any]:
+    return {"title": _title(rng, index, html), "children": []}
+
+
+def chain(depth: int, seed: int = 0, html: bool = False) -> Dict[str, Any]:
+    """深度为 depth 的单链（大纲导入时常见的深树）"""
+    rng = random.Random(seed)
+    root = node = _node(rng, 0, html)
+    for index in range(1, depth):
+        child = _node(rng, index, html)
+        node["children"].append(child)
+        node = child
+    return root
+
+
+def fan(width: int, seed: int = 0, html: bool = False) -> Dict[str, Any]:
+    """根节点下直接挂 width 个叶子"""
+    rng = random.Random(seed)
+    root = _node(rng, 0, html)
+    root["children"] = [_node(rng, index, html) for index in range(1, width + 1)]
+    return root
+
+
+def balanced(
+    nodes: int, branching: int = 8, seed: int = 0, html: bool = False
+) -> Dict[str, Any]:
+    """按层生成约 nodes 个节点、每个节点 branching 个子节点的平衡树"""
+    rng = random.Random(seed)
+    root = _node(rng, 0, html)
+    frontier = [root]
+    count = 1
+    while count < nodes:
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(branching):
+                if count >= nodes:
+                    break
+                child = _node(rng, count, html)
+                parent["children"].append(child)
+                next_frontier.append(child)
+                count += 1
+        frontier = next_frontier
+    return root
+
+
+def realistic(nodes: int, seed: int = 0, html: bool = False) -> Dict[str, Any]:
+    """
+    接近真实知识导图的树：上层分支多、越往下越稀疏，
+    深度一般不超过 8，部分节点是叶子
+    """
+    rng = random.Random(seed)
+    root = _node(rng, 0, html)
+    queue: List[Any] = [(root, 0)]
+    count = 1
+    head = 0
+    while count < nodes:
+        if head == len(queue):
+            # 所有节点都成了叶子，从头再扩展一轮
+            head = 0
+            queue = [(root, 0)]
+        parent, depth = queue[head]
+        head += 1
+        if depth >= 8:
+            continue
+        fanout = max(0, int(rng.gauss(6 - depth * 0.6, 2)))
+        for _ in range(fanout):
+            if count >= nodes:
+                break
+            child = _node(rng, count, html)
+            parent["children"].append(child)
+            queue.append((child, depth + 1))
+            count += 1
+    return root
+
+
+def count_nodes(tree: Dict[str, Any]) -> int:
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.get("children", []))
+    return count
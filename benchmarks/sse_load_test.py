@@ -0,0 +1,196 @@
+"""
+agent SSE 服务的压测客户端
+
+同时打开 N 个 SSE 流，统计:
+    - 首字节时间（收到响应头）和首个 token 时间
+    - 每个流的 tokens/s 和总吞吐
+    - 断开的连接：出错、超时或没有收到 end 事件的流
+
+不传 --url 时在本进程内启动使用假模型的服务（agent_sse_server.create_fake_app），
+不需要网络和 API key。
+
+用法（在仓库根目录）:
+    python -m benchmarks.sse_load_test --concurrency 200
+    python -m benchmarks.sse_load_test --url http://127.0.0.1:8000 --concurrency 20
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+from httpx_sse import aconnect_sse
+
+
+class StreamResult:
+    """一个 SSE 流的统计"""
+
+    def __init__(self) -> None:
+        self.ttfb: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.tokens = 0
+        self.duration = 0.0
+        self.completed = False
+        self.error: Optional[str] = None
+
+
+async def run_stream(
+    client: httpx.AsyncClient, url: str, message: str, thread_id: str
+) -> StreamResult:
+    result = StreamResult()
+    start = time.perf_counter()
+    try:
+        async with aconnect_sse(
+            client,
+            "POST",
+            f"{url}/chat",
+            json={"message": message, "thread_id": thread_id},
+        ) as source:
+            source.response.raise_for_status()
+            result.ttfb = time.perf_counter() - start
+            async for sse in source.aiter_sse():
+                if sse.event == "token":
+                    if result.first_token is None:
+                        result.first_token = time.perf_counter() - start
+                    result.tokens += 1
+                elif sse.event == "end":
+                    error = json.loads(sse.data)["error"]
+                    result.completed = error is None
+                    result.error = error
+                    break
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.duration = time.perf_counter() - start
+    return result
+
+
+async def run_load_test(
+    url: str,
+    concurrency: int,
+    message: str = "What's the weather in Beijing?",
+    timeout: float = 60.0,
+) -> Dict[str, Any]:
+    """
+    同时打开 concurrency 个流，返回统计结果
+
+    Returns:
+        Dict: streams, dropped, errors, ttfb/first_token 的 p50/p95（秒），
+              tokens_per_second（每个流的平均值）, total_tokens_per_second
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout), limits=limits
+    ) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_stream(client, url, message, f"load-{i}") for i in range(concurrency))
+        )
+        elapsed = time.perf_counter() - start
+    return summarize(results, elapsed)
+
+
+def _percentiles(values: List[float]) -> Tuple[float, float]:
+    if not values:
+        return float("nan"), float("nan")
+    if len(values) == 1:
+        return values[0], values[0]
+    cuts = statistics.quantiles(values, n=20, method="inclusive")
+    return statistics.median(values), cuts[18]
+
+
+def summarize(results: List[StreamResult], elapsed: float) -> Dict[str, Any]:
+    completed = [r for r in results if r.completed]
+    ttfb = _percentiles([r.ttfb for r in results if r.ttfb is not None])
+    first_token = _percentiles(
+        [r.first_token for r in results if r.first_token is not None]
+    )
+    rates = [r.tokens / r.duration for r in completed if r.duration > 0]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.completed:
+            key = r.error or "no end event"
+            errors[key] = errors.get(key, 0) + 1
+    return {
+        "streams": len(results),
+        "dropped": len(results) - len(completed),
+        "errors": errors,
+        "ttfb_p50": ttfb[0],
+        "ttfb_p95": ttfb[1],
+        "first_token_p50": first_token[0],
+        "first_token_p95": first_token[1],
+        "tokens_per_second": statistics.mean(rates) if rates else 0.0,
+        "total_tokens_per_second": sum(r.tokens for r in results) / elapsed,
+        "elapsed": elapsed,
+    }
+
+
+def serve_in_thread(app: Any) -> Tuple[str, Any, threading.Thread]:
+    """在后台线程中用 uvicorn 运行 app，返回 (url, server, thread)"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", backlog=4096
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("服务启动失败")
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="服务地址，不传时在本进程内启动假模型服务")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.02, help="假模型的 token 间隔")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--message", default="What's the weather in Beijing?")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    server = None
+    url = args.url
+    if url is None:
+        from agent_sse_server import create_fake_app
+
+        url, server, thread = serve_in_thread(create_fake_app(args.delay))
+
+    try:
+        stats = asyncio.run(
+            run_load_test(url, args.concurrency, args.message, args.timeout)
+        )
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+
+    print(
+        f"流: {stats['streams']}, 断开: {stats['dropped']}, 总耗时: {stats['elapsed']:.2f}s"
+    )
+    for error, count in stats["errors"].items():
+        print(f"  {count} x {error}")
+    print(
+        f"首字节 p50/p95: {stats['ttfb_p50']*1000:.0f}/{stats['ttfb_p95']*1000:.0f} ms"
+    )
+    print(
+        f"首 token p50/p95: {stats['first_token_p50']*1000:.0f}/"
+        f"{stats['first_token_p95']*1000:.0f} ms"
+    )
+    print(f"每个流 tokens/s: {stats['tokens_per_second']:.1f}")
+    print(f"总吞吐 tokens/s: {stats['total_tokens_per_second']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
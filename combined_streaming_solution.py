@@ -10,6 +10,9 @@ from langchain_deepseek import ChatDeepSeek
 from langchain_tavily import TavilySearch
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
+from stream_broadcaster import AgentStreamBroadcaster, DecisionEvent, TokenEvent
+from stream_metrics import MetricsRegistry
+from token_sink import TokenSink
 import threading
 import time
 
@@ -21,74 +24,52 @@ memory = MemorySaver()
 agent_executor = create_react_agent(model, tools, checkpointer=memory)
 
 
-def stream_with_decisions_and_tokens(input_message):
+def stream_with_decisions_and_tokens(input_message, config=None, metrics=None):
     """
     同时展示agent决策过程和流式token输出
+
+    agent 只运行一次（stream_mode=["values", "messages"]），
+    决策和 token 由两个订阅者分别处理；
+    metrics 为 stream_metrics.MetricsRegistry 时记录延迟统计
     """
     print("🤖 开始处理...\n")
 
-    # 用于同步两个流
-    decision_complete = threading.Event()
-    token_complete = threading.Event()
+    config = config or {"configurable": {"thread_id": "combined-streaming"}}
+    broadcaster = AgentStreamBroadcaster(agent_executor, metrics=metrics)
+    decisions = broadcaster.subscribe(kinds=[DecisionEvent])
+    tokens = broadcaster.subscribe(kinds=[TokenEvent])
+    sink = TokenSink()
 
     def show_decisions():
         """展示决策过程"""
-        try:
-            for step in agent_executor.stream(
-                {"messages": [input_message]}, stream_mode="values"
-            ):
-                latest_message = step["messages"][-1]
-
-                # 检测工具调用
-                if hasattr(latest_message, "tool_calls") and latest_message.tool_calls:
-                    print(f"\n🔧 决策: 调用工具 {latest_message.tool_calls[0]['name']}")
-                    print(f"   参数: {latest_message.tool_calls[0]['args']}")
-
-                # 检测工具结果
-                elif (
-                    hasattr(latest_message, "tool_call_id")
-                    and latest_message.tool_call_id
-                ):
-                    print(f"\n📊 工具执行完成: {latest_message.tool_name}")
-
-                # 检测AI思考
-                elif hasattr(latest_message, "content") and latest_message.content:
-                    if "AI Message" in str(latest_message):
-                        print(f"\n💭 AI正在思考...")
-
-        except Exception as e:
-            print(f"❌ 决策监控错误: {e}")
-        finally:
-            decision_complete.set()
+        for event in decisions:
+            sink.boundary()
+            if event.kind == "tool_call":
+                print(f"\n🔧 决策: 调用工具 {event.tool_call['name']}")
+                print(f"   参数: {event.tool_call['args']}")
+            elif event.kind == "tool_result":
+                print(f"\n📊 工具执行完成: {event.message.name}")
+            elif event.kind == "ai_message":
+                print(f"\n💭 AI正在思考...")
+        if decisions.error is not None:
+            print(f"❌ 决策监控错误: {decisions.error}")
 
     def stream_tokens():
         """流式输出token"""
-        try:
-            print("\n📝 实时响应:")
-            for step, metadata in agent_executor.stream(
-                {"messages": [input_message]}, stream_mode="messages"
-            ):
-                if metadata["langgraph_node"] == "agent":
-                    # 流式输出AI的token
-                    print(step.text(), end="", flush=True)
-
-                elif metadata["langgraph_node"] == "tool":
-                    # 工具执行提示
-                    print(f"\n⚡ 执行工具: {step.tool_name}")
-
-        except Exception as e:
-            print(f"❌ Token流式输出错误: {e}")
-        finally:
-            token_complete.set()
-
-    # 启动两个线程
+        print("\n📝 实时响应:")
+        for event in tokens:
+            sink.write(event.text)
+        sink.close()
+        if tokens.error is not None:
+            print(f"❌ Token流式输出错误: {tokens.error}")
+
     decision_thread = threading.Thread(target=show_decisions)
     token_thread = threading.Thread(target=stream_tokens)
-
     decision_thread.start()
     token_thread.start()
 
-    # 等待两个线程完成
+    broadcaster.run({"messages": [input_message]}, config)
+
     decision_thread.join()
     token_thread.join()
 
@@ -97,6 +78,9 @@ def stream_with_decisions_and_tokens(input_message):
 
 # 使用示例
 if __name__ == "__main__":
+    # 每个请求的统计写入 stream_metrics.jsonl
+    metrics = MetricsRegistry(jsonl="stream_metrics.jsonl")
+
     # 测试问题
     test_questions = [
         {"role": "user", "content": "What's the weather in Beijing?"},
@@ -108,5 +92,8 @@ if __name__ == "__main__":
         print(f"测试 {i}: {question['content']}")
         print(f"{'='*60}")
 
-        stream_with_decisions_and_tokens(question)
+        stream_with_decisions_and_tokens(question, metrics=metrics)
         time.sleep(2)
+
+    print(metrics.prometheus_text())
+    metrics.close()
@@ -0,0 +1,191 @@
+# 2026/10/18
+# zhangzhong
+# 不需要网络的假聊天模型，用于测试和压测 agent
+
+"""
+ScriptedChatModel 的行为只取决于最后一条消息:
+    - 最后一条是用户消息且设置了 tool_name：先说一句话，再调用该工具
+    - 否则：逐词流式输出 answer
+因此多个会话并发使用同一个模型实例时，每个会话仍然是“调用工具 -> 回答”的完整 ReAct 流程。
+
+FakeEmailModel 代替 learn_langgraph/email_agent.py 中的 DeepSeek：
+with_structured_output(..., method="json_mode") 按关键词给出邮件分类，普通调用返回一封固定的回复。
+"""
+
+from typing import Any, AsyncIterator, Iterator, List, Optional
+import asyncio
+import json
+import time
+
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+)
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.tools import tool
+
+
+class ScriptedChatModel(BaseChatModel):
+    """按固定脚本回复的流式聊天模型"""
+
+    answer: str = "This is a fake answer from the local model."
+    tool_name: Optional[str] = None
+    tool_args: dict = {"query": "fake"}
+    delay: float = 0.0  # 每个 token 之间的间隔（秒），模拟模型生成速度
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[ChatGenerationChunk]:
+        call_tool = self.tool_name and isinstance(messages[-1], HumanMessage)
+        text = f"Let me call {self.tool_name}." if call_tool else self.answer
+        words = text.split(" ")
+        chunks = []
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            tool_call_chunks = []
+            if call_tool and last:
+                tool_call_chunks = [
+                    {
+                        "name": self.tool_name,
+                        "args": json.dumps(self.tool_args),
+                        "id": f"call_{len(messages)}",
+                        "index": 0,
+                    }
+                ]
+            message = AIMessageChunk(
+                content=word if last else word + " ",
+                tool_call_chunks=tool_call_chunks,
+            )
+            chunks.append(ChatGenerationChunk(message=message))
+        return chunks
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._chunks(messages):
+            if self.delay:
+                time.sleep(self.delay)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks(messages):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager))
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager))
+
+
+# (关键词, intent, urgency)，按顺序匹配第一个
+EMAIL_RULES = [
+    (("charged", "refund", "invoice", "billing"), "billing", "high"),
+    (("504", "intermittent", "integration"), "complex", "high"),
+    (("crash", "error", "bug", "broken"), "bug", "medium"),
+    (("add ", "feature", "dark mode", "would be nice"), "feature", "low"),
+]
+
+
+def classify_email_text(text: str) -> dict:
+    """按关键词分类，结构与 email_agent.EmailClassification 相同"""
+    lowered = text.lower()
+    intent, urgency = "question", "low"
+    for keywords, rule_intent, rule_urgency in EMAIL_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            intent, urgency = rule_intent, rule_urgency
+            break
+    if "urgent" in lowered:
+        urgency = "critical" if urgency == "high" else "high"
+    return {
+        "intent": intent,
+        "urgency": urgency,
+        "topic": intent,
+        "summary": " ".join(text.split())[:80],
+    }
+
+
+class FakeEmailModel(BaseChatModel):
+    """邮件分类和回复的假模型，每次调用等待 delay 秒模拟网络往返"""
+
+    reply: str = "Thank you for reaching out. We are looking into your request."
+    delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-email"
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        # 与 json_mode 一样：模型输出 JSON 文本，再解析为 dict
+        return self.bind(json_mode=True) | JsonOutputParser()
+
+    def _content(self, messages: List[BaseMessage], json_mode: bool) -> str:
+        if json_mode:
+            # 只看 classify_intent 提示词中的邮件正文
+            prompt = str(messages[-1].content)
+            body = prompt.split("Email:", 1)[-1].split("From:", 1)[0]
+            return json.dumps(classify_email_text(body))
+        return self.reply
+
+    def _generate(
+        self, messages, stop=None, run_manager=None, json_mode=False, **kwargs
+    ) -> ChatResult:
+        if self.delay:
+            time.sleep(self.delay)
+        message = AIMessage(content=self._content(messages, json_mode))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, json_mode=False, **kwargs
+    ) -> ChatResult:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message = AIMessage(content=self._content(messages, json_mode))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@tool
+def fake_search(query: str) -> str:
+    """本地的假搜索工具"""
+    return f"Search results for {query}: it is sunny."
+
+
+def create_fake_agent(delay: float = 0.0, checkpointer: Any = None) -> Any:
+    """
+    创建使用假模型和假搜索工具的 ReAct agent
+
+    Args:
+        delay: 每个 token 之间的间隔（秒）
+        checkpointer: 检查点存储，如 MemorySaver()
+
+    Returns:
+        CompiledStateGraph: 与 agent_streaming_demo 中结构相同的 agent
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    model = ScriptedChatModel(tool_name=fake_search.name, delay=delay)
+    return create_react_agent(model, [fake_search], checkpointer=checkpointer)
@@ -0,0 +1,264 @@
+# 2026/10/18
+# zhangzhong
+# classify_intent 的分类缓存：相同或几乎相同的邮件不再调用 LLM
+
+"""
+很多邮件是同一个问题换个说法（"charged twice"），或者是之前邮件的转发、回复。
+ClassificationCache 先规范化邮件正文:
+    - 去掉引用的内容（"> " 开头的行、"On ... wrote:" 和 "-----Original Message-----" 之后的部分）
+    - 转发邮件只保留被转发的正文（去掉 "Forwarded message" 和 From:/Date:/Subject:/To: 头）
+    - 去掉签名（"-- " 之后、"Best regards" 等落款之后、"Sent from my iPhone"）
+    - 转小写，合并空白
+然后按两级查找:
+    1. 规范化文本的 sha1，完全相同
+    2. 64 位 SimHash，海明距离不超过 max_distance 即为近似重复；
+       把签名分成 max_distance + 1 段分别建索引，近似重复的邮件至少有一段完全相同（抽屉原理），
+       查找时只比较这些候选
+
+命中时返回当时的 EmailClassification；路由（goto）不缓存，由 classify_intent 按当前的规则重新计算，
+路由规则改变后旧的缓存仍然正确。
+条目按 LRU 淘汰，超过 ttl 秒过期；save() 把缓存写入 JSON lines 文件，下次启动时读回。
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+from collections import Counter, OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+SIGNATURE_BITS = 64
+
+_QUOTE_HEADERS = re.compile(
+    r"^(on .+ wrote:|-+ ?original message ?-+|_{5,})\s*$", re.IGNORECASE
+)
+_FORWARD_MARKER = re.compile(r"^-+ ?forwarded message ?-+\s*$", re.IGNORECASE)
+_HEADER_LINE = re.compile(r"^(from|date|sent|subject|to|cc):", re.IGNORECASE)
+_SIGN_OFF = re.compile(
+    r"^(--|(best|kind|warm)? ?regards,?|thanks,|thank you,|cheers,|sincerely,"
+    r"|sent from my \w+.*)\s*$",
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[^\x00-\x7f\s]")
+# 客套话不影响分类，不作为特征
+_COURTESY = frozenset(
+    ["hi", "hello", "hey", "dear", "please", "thanks", "thank", "you"]
+)
+
+
+def tokens(normalized: str) -> List[str]:
+    return [word for word in _TOKEN.findall(normalized) if word not in _COURTESY]
+
+
+def normalize_email(text: str) -> str:
+    """去掉引用、转发头和签名，转小写并合并空白"""
+    lines = text.splitlines()
+
+    # 转发: 只保留转发标记之后的正文
+    for i, line in enumerate(lines):
+        if _FORWARD_MARKER.match(line.strip()):
+            lines = lines[i + 1 :]
+            while lines and (
+                _HEADER_LINE.match(lines[0].strip()) or not lines[0].strip()
+            ):
+                lines = lines[1:]
+            break
+
+    body: List[str] = []
+    for line in lines:
+        stripped = line.strip()
+        if _QUOTE_HEADERS.match(stripped) or _SIGN_OFF.match(stripped):
+            break
+        if stripped.startswith(">"):
+            continue
+        body.append(stripped)
+
+    normalized = " ".join(" ".join(body).lower().split())
+    # 整封邮件都是引用时退回到原文
+    return normalized or " ".join(text.lower().split())
+
+
+def simhash(text: str) -> int:
+    """规范化文本的 64 位 SimHash，特征为单词和相邻两个词"""
+    words = tokens(text)
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    weights = [0] * SIGNATURE_BITS
+    for feature, weight in features.items():
+        h = int.from_bytes(
+            hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big"
+        )
+        for i in range(SIGNATURE_BITS):
+            if h >> i & 1:
+                weights[i] += weight
+            else:
+                weights[i] -= weight
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+
+class CachedClassification(NamedTuple):
+    classification: Dict[str, Any]
+    created: float
+    signature: int
+
+
+class CacheHit(NamedTuple):
+    classification: Dict[str, Any]
+    exact: bool
+
+
+class ClassificationCache:
+    """
+    邮件分类缓存，线程安全（批量分诊时多个线程同时调用 classify_intent）
+
+    Args:
+        path: 持久化文件，存在时读入；None 表示只在内存中
+        max_entries: 最多缓存的邮件数，超过时淘汰最久未用的
+        ttl: 条目的有效期（秒），None 表示不过期
+        max_distance: SimHash 海明距离不超过它视为近似重复，0 表示只做精确匹配
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 10000,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_distance: int = 3,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.clock = clock
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedClassification]" = OrderedDict()
+        self._bands = max_distance + 1
+        self._band_bits = SIGNATURE_BITS // self._bands
+        self._index: List[Dict[int, Set[str]]] = [{} for _ in range(self._bands)]
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(normalized: str) -> str:
+        # 只看单词，标点和客套话不同的邮件也算完全相同
+        return hashlib.sha1(" ".join(tokens(normalized)).encode()).hexdigest()
+
+    def _band_values(self, signature: int) -> List[int]:
+        mask = (1 << self._band_bits) - 1
+        return [signature >> (i * self._band_bits) & mask for i in range(self._bands)]
+
+    def _expired(self, entry: CachedClassification) -> bool:
+        return self.ttl is not None and self.clock() - entry.created > self.ttl
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for band, value in zip(self._index, self._band_values(entry.signature)):
+            keys = band.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del band[value]
+
+    def _insert(self, key: str, entry: CachedClassification) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        for band, value in zip(self._index, self._band_values(entry.signature)):
+            band.setdefault(value, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _near(self, signature: int) -> Optional[str]:
+        """距离最近且不超过 max_distance 的条目"""
+        best, best_distance = None, self.max_distance + 1
+        for band, value in zip(self._index, self._band_values(signature)):
+            for key in band.get(value, ()):
+                distance = (self._entries[key].signature ^ signature).bit_count()
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return best
+
+    def get(self, email_content: str) -> Optional[CacheHit]:
+        """查找邮件的分类，未命中时返回 None"""
+        normalized = normalize_email(email_content)
+        key = self.key(normalized)
+        signature = simhash(normalized) if self.max_distance else 0
+        with self._lock:
+            exact = key in self._entries
+            if not exact and self.max_distance:
+                key = self._near(signature)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if exact:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            # 返回拷贝，调用方修改 state 里的分类不影响缓存
+            return CacheHit(dict(entry.classification), exact)
+
+    def put(self, email_content: str, classification: Dict[str, Any]) -> None:
+        normalized = normalize_email(email_content)
+        signature = simhash(normalized) if self.max_distance else 0
+        entry = CachedClassification(dict(classification), self.clock(), signature)
+        with self._lock:
+            self._insert(self.key(normalized), entry)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """写入 JSON lines 文件（先写临时文件再替换，中途退出不会损坏原文件）"""
+        path = path or self.path
+        if path is None:
+            raise ValueError("没有指定缓存文件")
+        with self._lock:
+            lines = [
+                json.dumps({"key": key, **entry._asdict()}, ensure_ascii=False)
+                for key, entry in self._entries.items()
+                if not self._expired(entry)
+            ]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        """读入 save() 写的文件，按最近使用的顺序恢复"""
+        with open(path, encoding="utf-8") as f, self._lock:
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                key = obj.pop("key")
+                entry = CachedClassification(**obj)
+                if not self._expired(entry):
+                    self._insert(key, entry)
+
+    def close(self) -> None:
+        if self.path is not None:
+            self.save()
@@ -0,0 +1,375 @@
+# 2026/10/18
+# zhangzhong
+# search_documentation 用的本地帮助文档搜索：BM25 倒排索引，存为可以 mmap 的文件
+
+"""
+帮助文档目录下的每篇文章（.md/.txt）按空行切成段落，每个段落是一个搜索结果（search_results 中的一项），
+段落的词加上文章标题的词参与打分。
+
+索引文件的格式（小端，各段按 8 字节对齐）:
+    header            MAGIC, 段落数, 词数, 各段的偏移
+    term_offsets      uint32[词数 + 1]，排好序的词在 term_blob 中的位置
+    term_blob         所有词的 UTF-8
+    posting_offsets   uint32[词数 + 1]，每个词的倒排表在 posting_docs/posting_tfs 中的范围
+    posting_docs      uint32[]，段落编号
+    posting_tfs       uint32[]，词频
+    norms             float32[段落数]，k1 * (1 - b + b * 段落长度 / 平均长度)
+    text_offsets      uint64[段落数 + 1]
+    text_blob         段落原文
+    manifest          JSON：每篇文章的 mtime、大小、标题和段落范围
+打开索引只是 mmap 这个文件，各段直接作为 memoryview 使用，不需要反序列化；
+查询时对每个查询词二分查找词典，再遍历它的倒排表，几千篇文章的查询在 0.1ms 量级。
+
+增量更新: refresh() 对比 manifest 中的 mtime 和大小，只读取新增或修改的文章，
+没有变化的文章直接从旧索引中取段落，然后写一个新文件并原子替换（os.replace）。
+正在使用旧索引的线程不受影响，旧文件在没有引用后才释放。
+
+用法:
+    python -m learn_langgraph.doc_search learn_langgraph/help_articles "reset password"
+"""
+
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from array import array
+from collections import Counter, defaultdict
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+MAGIC = b"BM25IDX\x01"
+# magic, 段落数, 词数, 10 个段的偏移
+HEADER = struct.Struct("<8sII10Q")
+ARTICLE_SUFFIXES = (".md", ".txt")
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from how i if in is it my of on or our the "
+    "this to was we what when with you your".split()
+)
+
+
+class SearchAPIError(Exception):
+    """文档搜索不可用（例如帮助文档目录不存在），search_documentation 会记录错误并继续"""
+
+
+class SearchHit(NamedTuple):
+    score: float
+    text: str
+    article: str
+
+
+def tokenize(text: str) -> List[str]:
+    """小写，去掉停用词，简单地去掉复数的 s"""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def split_article(text: str) -> Tuple[str, List[str]]:
+    """把文章切成标题和段落"""
+    title = ""
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", text):
+        block = " ".join(block.split())
+        if not block:
+            continue
+        if block.startswith("#"):
+            title = title or block.lstrip("#").strip()
+            continue
+        paragraphs.append(block)
+    return title, paragraphs
+
+
+class DocIndex:
+    """只读的索引文件，可以被多个线程同时查询"""
+
+    def __init__(self, path: str, k1: float = 1.2) -> None:
+        self.path = path
+        self.k1 = k1
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_chunks, self.num_terms, *offsets = HEADER.unpack_from(
+            self._mm, 0
+        )
+        if magic != MAGIC:
+            raise ValueError(f"不是 BM25 索引文件: {path}")
+        view = memoryview(self._mm)
+        sections = [view[start:end] for start, end in zip(offsets, offsets[1:])]
+        self._term_offsets = sections[0].cast("I")
+        self._terms = sections[1]
+        self._posting_offsets = sections[2].cast("I")
+        self._docs = sections[3].cast("I")
+        self._tfs = sections[4].cast("I")
+        self._norms = sections[5].cast("f")
+        self._text_offsets = sections[6].cast("Q")
+        self._texts = sections[7]
+        self.manifest: Dict[str, Any] = json.loads(sections[8].tobytes().rstrip(b"\0"))
+        self._chunk_articles: List[str] = [""] * self.num_chunks
+        for article, entry in self.manifest["articles"].items():
+            for i in range(*entry["chunks"]):
+                self._chunk_articles[i] = article
+
+    def _find(self, term: bytes) -> int:
+        """二分查找词的编号，不存在时返回 -1"""
+        offsets, terms = self._term_offsets, self._terms
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = terms[offsets[mid] : offsets[mid + 1]].tobytes()
+            if current < term:
+                lo = mid + 1
+            elif current > term:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def chunk_text(self, chunk: int) -> str:
+        start, end = self._text_offsets[chunk], self._text_offsets[chunk + 1]
+        return self._texts[start:end].tobytes().decode()
+
+    def search(self, query: str, k: int = 3) -> List[SearchHit]:
+        """BM25 打分最高的 k 个段落"""
+        scores: Dict[int, float] = defaultdict(float)
+        n, k1 = self.num_chunks, self.k1
+        for term, count in Counter(tokenize(query)).items():
+            term_id = self._find(term.encode())
+            if term_id < 0:
+                continue
+            start = self._posting_offsets[term_id]
+            end = self._posting_offsets[term_id + 1]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5)) * count
+            docs, tfs, norms = self._docs, self._tfs, self._norms
+            for i in range(start, end):
+                doc, tf = docs[i], tfs[i]
+                scores[doc] += idf * tf * (k1 + 1) / (tf + norms[doc])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            SearchHit(score, self.chunk_text(doc), self._chunk_articles[doc])
+            for doc, score in best
+        ]
+
+    def chunks(self, article: str) -> Iterator[str]:
+        for i in range(*self.manifest["articles"][article]["chunks"]):
+            yield self.chunk_text(i)
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def write_index(
+    path: str,
+    articles: Dict[str, Tuple[Dict[str, Any], str, List[str]]],
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> None:
+    """
+    写索引文件（先写临时文件再替换）
+
+    Args:
+        articles: 文章相对路径 -> (文件信息 {"mtime_ns", "size"}, 标题, 段落列表)
+    """
+    # 每个词的 (段落编号, 词频) 直接存成两个 array，写文件时拼接
+    postings: Dict[str, Tuple[array, array]] = defaultdict(
+        lambda: (array("I"), array("I"))
+    )
+    lengths: List[int] = []
+    texts: List[bytes] = []
+    manifest: Dict[str, Any] = {"k1": k1, "b": b, "articles": {}}
+    for article in sorted(articles):
+        info, title, paragraphs = articles[article]
+        start = len(texts)
+        title_words = tokenize(title)
+        for paragraph in paragraphs:
+            words = title_words + tokenize(paragraph)
+            doc = len(texts)
+            for term, tf in Counter(words).items():
+                term_docs, term_tfs = postings[term]
+                term_docs.append(doc)
+                term_tfs.append(tf)
+            lengths.append(len(words))
+            texts.append(paragraph.encode())
+        manifest["articles"][article] = {
+            **info,
+            "title": title,
+            "chunks": [start, len(texts)],
+        }
+
+    terms = sorted(postings)
+    encoded = [term.encode() for term in terms]
+    term_offsets = array("I", [0])
+    posting_offsets = array("I", [0])
+    for term, raw in zip(terms, encoded):
+        term_offsets.append(term_offsets[-1] + len(raw))
+        posting_offsets.append(posting_offsets[-1] + len(postings[term][0]))
+    average = sum(lengths) / len(lengths) if lengths else 1.0
+    norms = array("f", [k1 * (1 - b + b * length / average) for length in lengths])
+    text_offsets = array("Q", [0])
+    for text in texts:
+        text_offsets.append(text_offsets[-1] + len(text))
+
+    sections = [
+        term_offsets.tobytes(),
+        b"".join(encoded),
+        posting_offsets.tobytes(),
+        b"".join(postings[term][0].tobytes() for term in terms),
+        b"".join(postings[term][1].tobytes() for term in terms),
+        norms.tobytes(),
+        text_offsets.tobytes(),
+        b"".join(texts),
+        json.dumps(manifest, ensure_ascii=False).encode(),
+    ]
+    offsets = [HEADER.size]
+    for section in sections:
+        offsets.append(offsets[-1] + len(_pad(section)))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(texts), len(terms), *offsets))
+        for section in sections:
+            f.write(_pad(section))
+    os.replace(tmp, path)
+
+
+class DocSearch:
+    """
+    帮助文档目录的搜索，第一次搜索时建立索引
+
+    Args:
+        articles_dir: 帮助文档目录，包含 .md/.txt 文件（可以有子目录）
+        index_path: 索引文件，默认为目录下的 .bm25.idx
+        refresh_interval: 每隔这么多秒在搜索时检查一次文章是否有变化，None 表示只在调用 refresh() 时检查
+    """
+
+    def __init__(
+        self,
+        articles_dir: str,
+        index_path: Optional[str] = None,
+        refresh_interval: Optional[float] = None,
+    ) -> None:
+        self.articles_dir = articles_dir
+        self.index_path = index_path or os.path.join(articles_dir, ".bm25.idx")
+        self.refresh_interval = refresh_interval
+        self._index: Optional[DocIndex] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _scan(self) -> Dict[str, Dict[str, int]]:
+        found = {}
+        for root, dirs, files in os.walk(self.articles_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.startswith(".") or not name.endswith(ARTICLE_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                article = os.path.relpath(path, self.articles_dir)
+                found[article] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        return found
+
+    def _open_existing(self) -> Optional[DocIndex]:
+        try:
+            return DocIndex(self.index_path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        只重新读取新增或修改的文章，没有变化时不写文件
+
+        Returns:
+            Dict: {"articles": 文章数, "read": 读取的, "reused": 沿用的, "removed": 删除的}
+        """
+        if not os.path.isdir(self.articles_dir):
+            raise SearchAPIError(f"帮助文档目录不存在: {self.articles_dir}")
+        with self._lock:
+            current = self._index or self._open_existing()
+            previous = current.manifest["articles"] if current else {}
+            found = self._scan()
+            articles: Dict[str, Tuple[Dict[str, Any], str, List[str]]] = {}
+            read = 0
+            for article, info in found.items():
+                entry = previous.get(article)
+                if (
+                    entry is not None
+                    and entry["mtime_ns"] == info["mtime_ns"]
+                    and entry["size"] == info["size"]
+                ):
+                    articles[article] = (
+                        info,
+                        entry["title"],
+                        list(current.chunks(article)),
+                    )
+                    continue
+                path = os.path.join(self.articles_dir, article)
+                with open(path, encoding="utf-8") as f:
+                    title, paragraphs = split_article(f.read())
+                articles[article] = (info, title, paragraphs)
+                read += 1
+            removed = len(set(previous) - set(found))
+            if current is None or read or removed:
+                write_index(self.index_path, articles)
+                current = DocIndex(self.index_path)
+            # 不关闭旧索引：其他线程可能还在查询，没有引用后自动释放
+            self._index = current
+            return {
+                "articles": len(found),
+                "read": read,
+                "reused": len(found) - read,
+                "removed": removed,
+            }
+
+    def _current(self) -> DocIndex:
+        index = self._index
+        if index is None:
+            self.refresh()
+            self._checked = time.monotonic()
+            index = self._index
+        elif (
+            self.refresh_interval is not None
+            and time.monotonic() - self._checked > self.refresh_interval
+        ):
+            self._checked = time.monotonic()
+            self.refresh()
+            index = self._index
+        return index
+
+    def hits(self, query: str, k: int = 3) -> List[SearchHit]:
+        return self._current().search(query, k)
+
+    def search(self, query: str, k: int = 3) -> List[str]:
+        """与 search_documentation 的 search_results 相同：最相关的 k 个段落原文"""
+        return [hit.text for hit in self.hits(query, k)]
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="搜索帮助文档")
+    parser.add_argument("articles_dir")
+    parser.add_argument("query")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    search = DocSearch(args.articles_dir)
+    print(f"索引: {search.refresh()}")
+    start = time.perf_counter()
+    hits = search.hits(args.query, args.k)
+    print(f"查询用时 {(time.perf_counter() - start) * 1000:.3f}ms")
+    for hit in hits:
+        print(f"{hit.score:6.2f}  [{hit.article}] {hit.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,7 +32,9 @@ Returns a predefined response. Replace logic and configuration as needed.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, Literal
+import logging
+import os
+from typing import Any, Callable, Dict, List, Literal
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.runtime import Runtime
@@ -41,6 +43,10 @@ from langgraph.types import interrupt, Command, RetryPolicy
 from langchain_deepseek import ChatDeepSeek
 from langchain.messages import HumanMessage
 
+from learn_langgraph.doc_search import DocSearch, SearchAPIError
+
+logger = logging.getLogger(__name__)
+
 
 # need a llm, we just use deepseek
 def get_deepseek_chat_model() -> ChatDeepSeek:
@@ -56,6 +62,17 @@ def get_deepseek_chat_model() -> ChatDeepSeek:
 
 llm = get_deepseek_chat_model()
 
+# Caching: classify_intent 的结果缓存，如 classification_cache.ClassificationCache()
+# 相同或几乎相同的邮件直接用缓存的分类，不调用 LLM，路由按当前的规则重新计算；None 表示不缓存
+classification_cache = None
+
+# search_documentation 搜索的帮助文档，第一次搜索时在目录下建立 BM25 索引（.bm25.idx），
+# 之后每分钟检查一次文章是否有修改，只重新索引修改过的文章
+doc_search = DocSearch(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "help_articles"),
+    refresh_interval=60,
+)
+
 
 class Context(TypedDict):
     """Context parameters for the agent.
@@ -92,6 +109,7 @@ class EmailAgentState(TypedDict):
     # Raw search/API results
     search_results: list[str] | None  # List of raw document chunks
     customer_history: dict | None  # Raw customer data from CRM
+    bug_ticket: str | None  # Ticket ID created by bug_tracking
 
     # Generated content
     draft_response: str | None
@@ -104,14 +122,27 @@ class EmailAgentState(TypedDict):
 # A node in LangGraph is just a Python function that takes the current state and returns updates to it.
 
 
+# 每封邮件重新计算的 key
+PER_EMAIL_KEYS = (
+    "classification",
+    "search_results",
+    "customer_history",
+    "bug_ticket",
+    "draft_response",
+)
+
+
 # 这里应该是一个Data step，要从邮箱里面获取邮件
 def read_email(state: EmailAgentState) -> dict:
     """Extract and parse email content"""
     # In production, this would connect to your email service
+    # 同一个 thread 可以处理多封邮件，清掉上一封邮件的结果：
+    # 否则 lookup_customer_history 会沿用上一个发件人的客户信息，也会把上一封的分类当成已经分类
     return {
+        **{key: None for key in PER_EMAIL_KEYS},
         "messages": [
             HumanMessage(content=f"Processing email: {state['email_content']}")
-        ]
+        ],
     }
 
 
@@ -122,10 +153,25 @@ def read_email(state: EmailAgentState) -> dict:
 def classify_intent(
     state: EmailAgentState,
 ) -> Command[
-    Literal["search_documentation", "human_review", "draft_response", "bug_tracking"]
+    Literal[
+        "search_documentation",
+        "human_review",
+        "bug_tracking",
+        "lookup_customer_history",
+    ]
 ]:  # 要在返回类型里面写清楚可能的下一个节点
     """Use LLM to classify email intent and urgency, then route accordingly"""
 
+    cache = classification_cache
+    if cache is not None:
+        hit = cache.get(state["email_content"])
+        if hit is not None:
+            # 只缓存分类，路由按当前的规则重新计算
+            return Command(
+                update={"classification": hit.classification},
+                goto=route_email(hit.classification),
+            )
+
     # Create structured LLM that returns EmailClassification dict
     structured_llm = llm.with_structured_output(EmailClassification, method="json_mode")
 
@@ -143,15 +189,10 @@ def classify_intent(
     classification = structured_llm.invoke(classification_prompt)
 
     # Determine next node based on classification
-    if classification["intent"] == "billing" or classification["urgency"] == "critical":
-        goto = "human_review"
-    elif classification["intent"] in ["question", "feature"]:
-        goto = "search_documentation"
-    elif classification["intent"] == "bug":
-        goto = "bug_tracking"
-    else:
-        # TODO: 讲道理，如果大模型遇到不能分辨intent的邮件，应该转另一个流程吧，而不是直接到下一步，都没有人工控制
-        goto = "draft_response"
+    goto = route_email(classification)
+
+    if cache is not None:
+        cache.put(state["email_content"], classification)
 
     # Store classification as a single dict in state
     # 原来如此！是这样在节点内部做分支选择的
@@ -159,12 +200,31 @@ def classify_intent(
     return Command(update={"classification": classification}, goto=goto)
 
 
+# Fan-out: 需要上下文的邮件，分类之后同时启动收集上下文的节点（一个列表的 goto），
+# 它们在同一个超步里并发执行，都完成后由 gather_context 合并，再进入 draft_response，
+# 这样每封邮件等待的是最慢的那个分支，而不是所有分支的时间之和
+CONTEXT_BRANCHES: Dict[str, List[str]] = {
+    "question": ["search_documentation", "lookup_customer_history"],
+    "feature": ["search_documentation", "lookup_customer_history"],
+    # 已知问题的说明也在帮助文档里（例如 PDF 导出崩溃）
+    "bug": ["bug_tracking", "search_documentation", "lookup_customer_history"],
+}
+
+
+def route_email(classification: EmailClassification) -> str | List[str]:
+    """classify_intent 之后的节点：human_review，或者要并发执行的上下文分支"""
+    if classification["intent"] == "billing" or classification["urgency"] == "critical":
+        return "human_review"
+    # TODO: 讲道理，如果大模型遇到不能分辨intent的邮件，应该转另一个流程吧，而不是直接到下一步，都没有人工控制
+    return CONTEXT_BRANCHES.get(classification["intent"], ["lookup_customer_history"])
+
+
 # Data step: Document search
 # 可以看到，所有的node的输入参数都是state，输出都是command with next nodes
 # - Parameters: Query built from intent and topic
 # - Retry strategy: Yes, with exponential backoff for transient failures
 # - Caching: Could cache common queries to reduce API calls ?
-def search_documentation(state: EmailAgentState) -> Command[Literal["draft_response"]]:
+def search_documentation(state: EmailAgentState) -> Command[Literal["gather_context"]]:
     """Search knowledge base for relevant information"""
 
     # Build search query from classification
@@ -172,20 +232,15 @@ def search_documentation(state: EmailAgentState) -> Command[Literal["draft_respo
     query = f"{classification.get('intent', '')} {classification.get('topic', '')}"
 
     try:
-        # Implement your search logic here
         # Store raw search results, not formatted text
-        search_results = [
-            "Reset password via Settings > Security > Change Password",
-            "Password must be at least 12 characters",
-            "Include uppercase, lowercase, numbers, and symbols",
-        ]
+        search_results = doc_search.search(query, k=3)
     except SearchAPIError as e:
         # For recoverable search errors, store error and continue
         search_results = [f"Search temporarily unavailable: {str(e)}"]
 
     return Command(
         update={"search_results": search_results},  # Store raw results or error
-        goto="draft_response",
+        goto="gather_context",
     )
 
 
@@ -193,24 +248,37 @@ def search_documentation(state: EmailAgentState) -> Command[Literal["draft_respo
 # - When to execute node: Always when intent is “bug”
 # - Retry strategy: Yes, critical to not lose bug reports
 # - Returns: Ticket ID to include in response
-def bug_tracking(state: EmailAgentState) -> Command[Literal["draft_response"]]:
+def bug_tracking(state: EmailAgentState) -> Command[Literal["gather_context"]]:
     """Create or update bug tracking ticket"""
 
     # Create ticket in your bug tracking system
     # 我明白了，这里应该是调用issue服务的api，创建一个新的issue，所以是action step
     ticket_id = "BUG-12345"  # Would be created via API
 
+    # 与 search_documentation 并发执行，不能同时写 search_results，
+    # 由 gather_context 把工单号合并进去
     return Command(
         update={
-            "search_results": [f"Bug ticket {ticket_id} created"],
+            "bug_ticket": ticket_id,
             # 还可以指定当前的step，为什么呢？是不是没有必要？
             # 而且state里面也没有这个filed呀
             "current_step": "bug_tracked",
         },
-        goto="draft_response",
+        goto="gather_context",
     )
 
 
+# Merge step: 所有上下文分支完成后执行一次
+# 分支都是从 classify_intent 一起出发的，属于同一个超步，LangGraph 等这个超步的所有节点完成后
+# 才执行下一个超步，多个分支 goto 同一个节点也只会执行一次
+def gather_context(state: EmailAgentState) -> Command[Literal["draft_response"]]:
+    """Merge the results of the context branches for draft_response"""
+    search_results = list(state.get("search_results") or [])
+    if state.get("bug_ticket"):
+        search_results.append(f"Bug ticket {state['bug_ticket']} created")
+    return Command(update={"search_results": search_results}, goto="draft_response")
+
+
 # LLM step: Draft reply
 # - Static context (prompt): Tone guidelines, company policies, response templates
 # - Dynamic context (from state): Classification results, search results, customer history
@@ -306,6 +374,16 @@ def human_review(state: EmailAgentState) -> Command[Literal["send_reply", END]]:
         return Command(update={}, goto=END)
 
 
+# Integrate with email service
+# 这里只是记一下日志，实际应该调用邮件服务的api
+class EmailService:
+    def send(self, content: str) -> None:
+        logger.info("Sending reply: %s...", content[:100])
+
+
+email_service = EmailService()
+
+
 # Action step
 def send_reply(state: EmailAgentState) -> dict:
     """Send the email response"""
@@ -335,26 +413,58 @@ def execute_tool(state: State) -> Command[Literal["agent", "execute_tool"]]:
 
 ## handle errors
 # User-fixable errors (missing information, unclear instructions)
+# 教程里的例子：缺少 customer_id 时用 interrupt 向人要，然后回到自己形成一个 loop
+# def lookup_customer_history(state: State) -> Command[Literal["draft_response"]]:
+#     if not state.get("customer_id"):
+#         user_input = interrupt(
+#             {
+#                 "message": "Customer ID needed",
+#                 "request": "Please provide the customer's account ID to look up their subscription history",
+#             }
+#         )
+#         # !!!这里创建了一个loop
+#         return Command(
+#             update={"customer_id": user_input["customer_id"]},
+#             goto="lookup_customer_history",
+#         )
+#     # Now proceed with the lookup
+#     customer_data = fetch_customer_history(state["customer_id"])
+#     return Command(update={"customer_history": customer_data}, goto="draft_response")
+
+
+# Integrate with CRM
+# 这里只返回基本信息，实际应该按发件人查询 CRM
+class CustomerService:
+    def history(self, sender_email: str) -> dict:
+        return {"email": sender_email, "tier": "standard", "open_tickets": 0}
+
+
+customer_service = CustomerService()
+
+
 ## Data steps:
-# - Parameters: Customer email or ID from state
-# - Retry strategy: Yes, but with fallback to basic info if unavailable
+# - Parameters: Customer email from state
+# - Retry strategy: Fallback to basic info if unavailable
 # - Caching: Yes, with time-to-live to balance freshness and performance
-def lookup_customer_history(state: State) -> Command[Literal["draft_response"]]:
-    if not state.get("customer_id"):
-        user_input = interrupt(
-            {
-                "message": "Customer ID needed",
-                "request": "Please provide the customer's account ID to look up their subscription history",
-            }
-        )
-        # !!!这里创建了一个loop
-        return Command(
-            update={"customer_id": user_input["customer_id"]},
-            goto="lookup_customer_history",
-        )
-    # Now proceed with the lookup
-    customer_data = fetch_customer_history(state["customer_id"])
-    return Command(update={"customer_history": customer_data}, goto="draft_response")
+# 只依赖发件人，不依赖分类结果，所以可以和 classify_intent 同时开始（speculative）:
+# 这时 state 里还没有 classification（read_email 清掉了上一封邮件的），查到的结果先存下来，不跳转；
+# 分类之后作为上下文分支再次执行时直接沿用。如果路由不需要客户信息（human_review），结果就被丢弃
+def lookup_customer_history(
+    state: EmailAgentState,
+) -> Command[Literal["gather_context"]] | dict:
+    """Fetch the sender's history from the CRM"""
+    customer_history = state.get("customer_history")
+    update = {}
+    if customer_history is None:
+        try:
+            customer_history = customer_service.history(state.get("sender_email", ""))
+        except Exception as e:
+            logger.warning("Customer history unavailable: %s", e)
+            customer_history = {"email": state.get("sender_email", "")}
+        update = {"customer_history": customer_history}
+    if state.get("classification") is None:
+        return update
+    return Command(update=update, goto="gather_context")
 
 
 ## Write it together
@@ -363,72 +473,93 @@ def lookup_customer_history(state: State) -> Command[Literal["draft_response"]]:
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import RetryPolicy
 
+
 # Create the graph
-workflow = StateGraph(EmailAgentState)
-
-# 要添加的node一个不少
-# Add nodes with appropriate error handling
-workflow.add_node("read_email", read_email)
-workflow.add_node("classify_intent", classify_intent)
-
-# Add retry policy for nodes that might have transient failures
-workflow.add_node(
-    "search_documentation",
-    search_documentation,
-    ## handle errors
-    # Transient errors (network issues, rate limits)
-    # Add a retry policy to automatically retry network issues and rate limits:
-    retry_policy=RetryPolicy(max_attempts=3),
-)
-workflow.add_node("bug_tracking", bug_tracking)
-workflow.add_node("draft_response", draft_response)
-workflow.add_node("human_review", human_review)
-workflow.add_node("send_reply", send_reply)
+def build_workflow(
+    wrap_node: Callable[[str, Callable], Callable] | None = None,
+    speculative: bool = True,
+) -> StateGraph:
+    """Build the email agent graph.
+
+    wrap_node(name, func) can replace each node function, e.g. to limit
+    concurrency or time the node (see email_batch.py).
+    speculative starts lookup_customer_history together with classify_intent.
+    """
+    wrap = wrap_node or (lambda name, func: func)
+    workflow = StateGraph(EmailAgentState)
+
+    # 要添加的node一个不少
+    # Add nodes with appropriate error handling
+    workflow.add_node("read_email", wrap("read_email", read_email))
+    workflow.add_node("classify_intent", wrap("classify_intent", classify_intent))
+
+    # Add retry policy for nodes that might have transient failures
+    workflow.add_node(
+        "search_documentation",
+        wrap("search_documentation", search_documentation),
+        ## handle errors
+        # Transient errors (network issues, rate limits)
+        # Add a retry policy to automatically retry network issues and rate limits:
+        retry_policy=RetryPolicy(max_attempts=3),
+    )
+    workflow.add_node("bug_tracking", wrap("bug_tracking", bug_tracking))
+    workflow.add_node(
+        "lookup_customer_history",
+        wrap("lookup_customer_history", lookup_customer_history),
+    )
+    workflow.add_node("gather_context", wrap("gather_context", gather_context))
+    workflow.add_node("draft_response", wrap("draft_response", draft_response))
+    workflow.add_node("human_review", wrap("human_review", human_review))
+    workflow.add_node("send_reply", wrap("send_reply", send_reply))
 
-# 就是edge不用在额外添加了，因为node自己都写好了
-# Add only the essential edges
-workflow.add_edge(START, "read_email")
-workflow.add_edge("read_email", "classify_intent")
-workflow.add_edge("send_reply", END)
+    # 就是edge不用在额外添加了，因为node自己都写好了
+    # Add only the essential edges
+    workflow.add_edge(START, "read_email")
+    workflow.add_edge("read_email", "classify_intent")
+    if speculative:
+        workflow.add_edge("read_email", "lookup_customer_history")
+    workflow.add_edge("send_reply", END)
+    return workflow
+
+
+workflow = build_workflow()
 
 # Compile with checkpointer for persistence, in case run graph with Local_Server --> Please compile without checkpointer
 memory = MemorySaver()
 app = workflow.compile(checkpointer=memory)
 
 
-## initial calling example
-# Test with an urgent billing issue
-initial_state = {
-    "email_content": "I was charged twice for my subscription! This is urgent!",
-    "sender_email": "customer@example.com",
-    "email_id": "email_123",
-    "messages": [],
-}
-
-# Run with a thread_id for persistence
-config = {"configurable": {"thread_id": "customer_123"}}
-result = app.invoke(initial_state, config)
-# The graph will pause at human_review
-print(f"human review interrupt:{result['__interrupt__']}")
-
-# When ready, provide human input to resume
-from langgraph.types import Command
-
-
-# TODO: 关于human in the loop这块还需要额外的研究
-# The graph pauses when it hits interrupt(), saves everything to the checkpointer, and waits.
-# It can resume days later, picking up exactly where it left off.
-# The thread_id ensures all state for this conversation is preserved together.
-human_response = Command(
-    resume={
-        "approved": True,
-        "edited_response": "We sincerely apologize for the double charge. I've initiated an immediate refund...",
+if __name__ == "__main__":
+    ## initial calling example
+    # Test with an urgent billing issue
+    initial_state = {
+        "email_content": "I was charged twice for my subscription! This is urgent!",
+        "sender_email": "customer@example.com",
+        "email_id": "email_123",
+        "messages": [],
     }
-)
 
-# Resume execution
-final_result = app.invoke(human_response, config)
-print(f"Email sent successfully!")
+    # Run with a thread_id for persistence
+    config = {"configurable": {"thread_id": "customer_123"}}
+    result = app.invoke(initial_state, config)
+    # The graph will pause at human_review
+    print(f"human review interrupt:{result['__interrupt__']}")
+
+    # When ready, provide human input to resume
+    # TODO: 关于human in the loop这块还需要额外的研究
+    # The graph pauses when it hits interrupt(), saves everything to the checkpointer, and waits.
+    # It can resume days later, picking up exactly where it left off.
+    # The thread_id ensures all state for this conversation is preserved together.
+    human_response = Command(
+        resume={
+            "approved": True,
+            "edited_response": "We sincerely apologize for the double charge. I've initiated an immediate refund...",
+        }
+    )
+
+    # Resume execution
+    final_result = app.invoke(human_response, config)
+    print(f"Email sent successfully!")
 
 
 ## template code
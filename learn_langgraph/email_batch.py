@@ -0,0 +1,423 @@
+# 2026/10/18
+# zhangzhong
+# 批量分诊邮件：并发运行 email_agent 的 workflow，按节点限制并发的 LLM 调用
+
+"""
+email_agent.py 一次 app.invoke 处理一封邮件，客服邮箱每天有上万封邮件，逐封处理太慢。
+
+BatchTriageRunner 从邮件迭代器中取邮件，用 ainvoke 同时运行最多 max_in_flight 个图，
+每封邮件一个 thread_id（即 email_id）:
+    - 每个节点可以单独限制并发数，例如 classify_intent 和 draft_response 各 16 个，
+      限制的是对 LLM 的并发请求数，不需要限制的节点（read_email 等）不受影响
+    - 节点函数是同步的，在线程池中运行（与 LangGraph 对同步节点的做法相同），不阻塞事件循环
+    - 走到 human_review 的邮件在 interrupt 处暂停，记录在 parked 中，之后用 resume 继续
+    - 每封邮件处理完就产出一个 TriageResult，不等整批结束
+    - 结束后 stats()/report() 给出吞吐量和每个节点的调用次数、耗时、排队等待时间
+
+用法:
+    python -m learn_langgraph.email_batch emails.jsonl --limit classify_intent=8
+    python -m learn_langgraph.email_batch --fake 10000 --delay 0.05 --output results.jsonl
+    python -m learn_langgraph.email_batch --fake 2000 --priority --slo critical=1
+    python -m learn_langgraph.email_batch --fake 200 --profile trace.json
+emails.jsonl 每行一个 {"email_id": "...", "email_content": "...", "sender_email": "..."}
+"""
+
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Set,
+)
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+import asyncio
+import contextlib
+import contextvars
+import functools
+import itertools
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from learn_langgraph.email_agent import build_workflow
+
+# 默认只限制调用 LLM 的两个节点
+DEFAULT_LIMITS = {"classify_intent": 16, "draft_response": 16}
+
+
+@dataclass
+class NodeTiming:
+    """一个节点的耗时统计"""
+
+    calls: int = 0
+    seconds: float = 0.0  # 节点函数运行的总时间
+    wait_seconds: float = 0.0  # 等待并发名额的总时间
+    max_seconds: float = 0.0
+
+    def record(self, wait: float, seconds: float) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.wait_seconds += wait
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["mean_seconds"] = self.seconds / self.calls if self.calls else 0.0
+        return data
+
+
+@dataclass
+class TriageResult:
+    """一封邮件的处理结果"""
+
+    email_id: str
+    status: str  # "completed" | "parked" | "failed"
+    classification: Optional[Dict[str, Any]] = None
+    draft_response: Optional[str] = None
+    interrupt: Any = None  # 暂停时 human_review 的 interrupt 内容
+    error: Optional[str] = None
+    seconds: float = 0.0
+    queue_seconds: float = 0.0  # 排队等待的总时间（等待并发名额）
+    priority: Optional[str] = None  # 用 PriorityTriageRunner 时的优先级
+
+
+class BatchTriageRunner:
+    """
+    并发处理一批邮件，同一个 runner 只在一个事件循环中使用（并发上限用的是 asyncio.Semaphore）
+
+    Args:
+        limits: 节点名 -> 最大并发数，不在其中的节点不限制；None 使用 DEFAULT_LIMITS
+        max_in_flight: 同时处理的邮件数，也是运行节点函数的线程数
+        checkpointer: 保存暂停的邮件，默认 MemorySaver()；
+            用 sqlite_checkpointer.SQLiteSaver 时重启后仍可 resume
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        max_in_flight: int = 64,
+        checkpointer: Any = None,
+    ) -> None:
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_in_flight = max_in_flight
+        self.nodes: Dict[str, NodeTiming] = {}
+        self.parked: Dict[str, Any] = {}  # email_id -> interrupt 内容
+        self.counts = {"completed": 0, "parked": 0, "failed": 0}
+        self.elapsed = 0.0
+        self._window = max_in_flight  # run() 同时创建的任务数
+        self._queue_waits: Dict[str, float] = {}  # email_id -> 等待并发名额的时间
+        self._semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in self.limits.items()
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="email-triage"
+        )
+        self.app = build_workflow(self._wrap).compile(
+            checkpointer=checkpointer or MemorySaver()
+        )
+
+    def _slot(self, name: str, state: Any) -> Any:
+        """运行节点前要进入的异步上下文，用来限制并发"""
+        return self._semaphores.get(name) or contextlib.nullcontext()
+
+    def _wrap(self, name: str, func: Any) -> Any:
+        """把同步节点包装成限制并发、统计耗时的异步节点"""
+        timing = self.nodes.setdefault(name, NodeTiming())
+        executor = self._executor
+
+        # wraps 保留原函数的返回类型注解，LangGraph 靠它画出 Command 的跳转
+        @functools.wraps(func)
+        async def node(state: Any) -> Any:
+            queued = time.perf_counter()
+            async with self._slot(name, state):
+                start = time.perf_counter()
+                email_id = state.get("email_id", "")
+                self._queue_waits[email_id] = (
+                    self._queue_waits.get(email_id, 0.0) + start - queued
+                )
+                try:
+                    # 复制 contextvars，节点里的 interrupt() 才能拿到当前运行的配置
+                    context = contextvars.copy_context()
+                    return await asyncio.get_running_loop().run_in_executor(
+                        executor, context.run, func, state
+                    )
+                finally:
+                    timing.record(start - queued, time.perf_counter() - start)
+
+        return node
+
+    async def _invoke(self, email_id: str, inputs: Any) -> TriageResult:
+        config = {"configurable": {"thread_id": email_id}}
+        start = time.perf_counter()
+        try:
+            output = await self.app.ainvoke(inputs, config)
+        except Exception as e:
+            result = TriageResult(email_id, "failed", error=str(e) or repr(e))
+        else:
+            interrupts = output.get("__interrupt__")
+            result = TriageResult(
+                email_id,
+                "parked" if interrupts else "completed",
+                classification=output.get("classification"),
+                draft_response=output.get("draft_response"),
+                interrupt=interrupts[0].value if interrupts else None,
+            )
+            if interrupts:
+                self.parked[email_id] = result.interrupt
+        result.seconds = time.perf_counter() - start
+        result.queue_seconds = self._queue_waits.pop(email_id, 0.0)
+        self.counts[result.status] += 1
+        return result
+
+    async def triage(self, email: Dict[str, Any]) -> TriageResult:
+        """处理一封邮件"""
+        email_id = str(email.get("email_id", ""))
+        if not email_id or not isinstance(email.get("email_content"), str):
+            self.counts["failed"] += 1
+            return TriageResult(
+                email_id, "failed", error="邮件需要 email_id 和 email_content"
+            )
+        state = {
+            "email_content": email["email_content"],
+            "sender_email": email.get("sender_email", ""),
+            "email_id": email_id,
+            "messages": [],
+        }
+        return await self._invoke(email_id, state)
+
+    async def resume(self, email_id: str, decision: Dict[str, Any]) -> TriageResult:
+        """
+        用人工审核的结果继续一封暂停的邮件
+
+        Args:
+            email_id: parked 中的邮件，或者 checkpointer 中暂停的邮件（如重启前的批次）
+            decision: 与 email_agent 中相同，如 {"approved": True, "edited_response": "..."}
+        """
+        if email_id in self.parked:
+            del self.parked[email_id]
+            self.counts["parked"] -= 1
+        else:
+            config = {"configurable": {"thread_id": email_id}}
+            if not (await self.app.aget_state(config)).interrupts:
+                raise KeyError(f"邮件 {email_id} 没有在等待人工审核")
+        return await self._invoke(email_id, Command(resume=decision))
+
+    def _schedule(self, email: Dict[str, Any]) -> Awaitable[TriageResult]:
+        """run() 为每封邮件创建的任务"""
+        return self.triage(email)
+
+    async def run(
+        self, emails: Iterable[Dict[str, Any]]
+    ) -> AsyncIterator[TriageResult]:
+        """
+        处理一批邮件，按完成顺序产出结果
+
+        邮件是按需从迭代器中取的，同时最多 max_in_flight 封，迭代器可以很长甚至是无限的。
+        """
+        iterator = iter(emails)
+        pending: Set[asyncio.Task] = set()
+        start = time.perf_counter()
+        try:
+            while True:
+                for email in itertools.islice(iterator, self._window - len(pending)):
+                    pending.add(asyncio.create_task(self._schedule(email)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.elapsed += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        """吞吐量和每个节点的耗时"""
+        emails = sum(self.counts.values())
+        return {
+            "emails": emails,
+            **self.counts,
+            "elapsed_seconds": self.elapsed,
+            "emails_per_second": emails / self.elapsed if self.elapsed else 0.0,
+            "nodes": {
+                name: timing.to_dict()
+                for name, timing in self.nodes.items()
+                if timing.calls
+            },
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        lines = [
+            f"邮件: {stats['emails']}  完成: {stats['completed']}  "
+            f"待审核: {stats['parked']}  失败: {stats['failed']}",
+            f"用时: {stats['elapsed_seconds']:.2f}s  "
+            f"吞吐量: {stats['emails_per_second']:.1f} 封/秒",
+            f"{'节点':<22}{'并发上限':>8}{'调用':>8}{'平均':>10}{'最长':>10}{'平均等待':>10}",
+        ]
+        for name, node in stats["nodes"].items():
+            limit = self.limits.get(name, "-")
+            lines.append(
+                f"{name:<24}{limit:>10}{node['calls']:>10}"
+                f"{node['mean_seconds'] * 1000:>10.1f}ms"
+                f"{node['max_seconds'] * 1000:>10.1f}ms"
+                f"{node['wait_seconds'] / node['calls'] * 1000:>10.1f}ms"
+            )
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# email_agent 开头列出的几种邮件，用于 --fake
+SAMPLE_EMAILS = [
+    "How do I reset my password?",
+    "The export feature crashes when I select PDF format",
+    "I was charged twice for my subscription!",
+    "I was charged twice for my subscription! This is urgent!",
+    "Can you add dark mode to the mobile app?",
+    "Our API integration fails intermittently with 504 errors",
+]
+
+
+def fake_emails(count: int) -> Iterator[Dict[str, Any]]:
+    for i in range(count):
+        yield {
+            "email_id": f"fake-{i}",
+            "email_content": SAMPLE_EMAILS[i % len(SAMPLE_EMAILS)],
+            "sender_email": f"customer{i}@example.com",
+        }
+
+
+def read_emails(path: str) -> Iterator[Dict[str, Any]]:
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def main() -> None:
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="批量分诊邮件")
+    parser.add_argument("emails", nargs="?", help="JSON lines 格式的邮件文件")
+    parser.add_argument("--fake", type=int, metavar="N", help="用假模型处理 N 封邮件")
+    parser.add_argument(
+        "--delay", type=float, default=0.05, help="假模型每次调用的耗时"
+    )
+    parser.add_argument(
+        "--limit",
+        action="append",
+        default=[],
+        metavar="NODE=N",
+        help="节点的并发上限，可以重复",
+    )
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--output", help="结果写入的文件，默认输出到标准输出")
+    parser.add_argument(
+        "--cache", metavar="PATH", help="分类缓存文件，见 classification_cache"
+    )
+    parser.add_argument(
+        "--db", metavar="PATH", help="暂停的邮件存到这个 SQLite 文件，重启后仍可继续"
+    )
+    parser.add_argument(
+        "--priority",
+        action="store_true",
+        help="按紧急程度调度，见 priority_triage",
+    )
+    parser.add_argument(
+        "--aging", type=float, default=30.0, help="每等待这么多秒优先级提高一级"
+    )
+    parser.add_argument(
+        "--slo",
+        action="append",
+        default=[],
+        metavar="URGENCY=SECONDS",
+        help="排队等待时间的目标，如 critical=1，可以重复",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="记录每个节点的耗时和 token，trace 写到这个文件，见 graph_profiler",
+    )
+    args = parser.parse_args()
+    if (args.emails is None) == (args.fake is None):
+        parser.error("需要邮件文件或 --fake N 之一")
+
+    limits = dict(DEFAULT_LIMITS)
+    for item in args.limit:
+        name, _, value = item.partition("=")
+        limits[name] = int(value)
+
+    if args.fake is not None:
+        from fake_chat_model import FakeEmailModel
+        from learn_langgraph import email_agent
+
+        # 节点直接使用 email_agent 模块里的 llm
+        email_agent.llm = FakeEmailModel(delay=args.delay)
+        emails = fake_emails(args.fake)
+    else:
+        emails = read_emails(args.emails)
+
+    if args.cache:
+        from learn_langgraph import email_agent
+        from learn_langgraph.classification_cache import ClassificationCache
+
+        email_agent.classification_cache = ClassificationCache(args.cache)
+
+    checkpointer = None
+    if args.db:
+        from sqlite_checkpointer import SQLiteSaver
+
+        checkpointer = SQLiteSaver(args.db)
+
+    if args.priority:
+        from learn_langgraph.priority_triage import PriorityTriageRunner
+
+        slo = {}
+        for item in args.slo:
+            urgency, _, seconds = item.partition("=")
+            slo[urgency] = float(seconds)
+        runner = PriorityTriageRunner(
+            limits, args.max_in_flight, checkpointer, aging=args.aging, slo=slo
+        )
+    else:
+        runner = BatchTriageRunner(limits, args.max_in_flight, checkpointer)
+    if args.profile:
+        from learn_langgraph.graph_profiler import GraphProfiler
+
+        profiler = GraphProfiler()
+        runner.app = profiler.attach(runner.app)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        async for result in runner.run(emails):
+            output.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        runner.close()
+        if checkpointer is not None:
+            checkpointer.close()
+    print(runner.report(), file=sys.stderr)
+    if args.profile:
+        print(profiler.report(), file=sys.stderr)
+        profiler.write_trace(args.profile)
+    if args.cache:
+        email_agent.classification_cache.close()
+        print(f"分类缓存: {email_agent.classification_cache.stats()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
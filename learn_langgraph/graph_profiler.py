@@ -0,0 +1,531 @@
+# 2026/10/18
+# zhangzhong
+# 编译后的图的逐节点性能分析：耗时、CPU、token、重试、checkpoint 写入、superstep 等待
+
+"""
+email 的 workflow、quick start 的 agent_builder、hello world 的 graph 以及 notebook 里的图
+都只能看到最终结果，不知道时间和 token 花在哪里（只有手写的 llm_calls 计数）。
+
+GraphProfiler 可以挂到任何编译后的图上，不需要改节点:
+
+    profiler = GraphProfiler()
+    app = profiler.attach(workflow.compile(checkpointer=memory))
+    app.invoke(...)
+    print(profiler.report(sort_by="wall"))
+    profiler.write_trace("trace.json")  # chrome://tracing 或 https://ui.perfetto.dev 打开
+
+记录的内容:
+    - 每次节点调用的墙钟时间和 CPU 时间（调用节点的线程的 thread_time）；
+      异步节点与同一个事件循环里的其他协程共用线程，CPU 时间只是近似值
+    - 每个节点里模型调用的次数和 token（usage_metadata，没有时用 llm_output 的 token_usage）
+    - RetryPolicy 的重试：同一个任务出错后再次运行算一次重试
+    - checkpoint 写入（put/put_writes）的次数和耗时，LangGraph 通常在后台线程写入
+    - 每个 superstep 的耗时，先结束的任务等最慢的任务的时间（wait），
+      以及与上一个 superstep 之间的间隔（gap，框架调度和同步写 checkpoint 的时间）
+
+实现上是一个回调处理器（节点、模型的开始和结束事件）加上包装 checkpointer 的写入方法，
+attach() 返回带着这两样的图的副本，原来的图不受影响。
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from uuid import UUID
+import copy
+import functools
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.errors import GraphBubbleUp
+
+REPORT_COLUMNS = (
+    "calls",
+    "errors",
+    "retries",
+    "wall",
+    "mean",
+    "p95",
+    "max",
+    "cpu",
+    "llm_calls",
+    "input_tokens",
+    "output_tokens",
+)
+
+
+@dataclass
+class NodeRun:
+    """一次节点调用"""
+
+    node: str
+    namespace: str  # 所在的图，子图里的节点为父节点的 checkpoint_ns
+    task: str  # langgraph_checkpoint_ns，同一个任务的重试相同
+    step: int
+    root: UUID  # 这次 invoke 的根 run
+    thread: int
+    start: float
+    cpu_start: float
+    end: Optional[float] = None
+    cpu: Optional[float] = None
+    status: str = "running"  # ok / error / interrupted
+    attempt: int = 1
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def wall(self) -> float:
+        return (self.end or self.start) - self.start
+
+
+@dataclass
+class Span:
+    """checkpoint 写入等不属于节点的时间段"""
+
+    name: str
+    thread: int
+    start: float
+    end: float
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Superstep:
+    root: UUID
+    namespace: str
+    step: int
+    start: float
+    end: float
+    tasks: int
+    wait: float  # 先结束的任务等最后一个任务的时间之和
+    gap: Optional[float]  # 与同一个图的上一个 superstep 之间的间隔
+
+
+def token_usage(response: Any) -> Tuple[int, int]:
+    """LLMResult 中的 (输入 token, 输出 token)"""
+    input_tokens = output_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                found = True
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not found:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class GraphProfiler(BaseCallbackHandler):
+    """
+    记录节点调用和 checkpoint 写入，线程安全，可以同时分析多个 invoke
+
+    Args:
+        clock: 墙钟时间
+        cpu_clock: 当前线程的 CPU 时间
+    """
+
+    # 在触发事件的线程里直接调用，异步图中不放到线程池，时间和线程才准确
+    run_inline = True
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.perf_counter,
+        cpu_clock: Callable[[], float] = time.thread_time,
+    ) -> None:
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+        self.origin = clock()
+        self.runs: List[NodeRun] = []
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, NodeRun] = {}  # 还没结束的节点调用
+        self._owner: Dict[UUID, Optional[NodeRun]] = {}  # run_id -> 所在的节点调用
+        self._roots: Dict[UUID, UUID] = {}  # run_id -> 根 run
+        self._failed: Dict[str, int] = {}  # 出错的任务 -> 已经运行的次数
+
+    # 挂到图上
+
+    def attach(self, app: Any) -> Any:
+        """返回挂上 profiler 的图（副本），checkpointer 的写入也会计时"""
+        profiled = app.with_config(callbacks=[self])
+        checkpointer = getattr(app, "checkpointer", None)
+        if checkpointer not in (None, True, False):
+            profiled = profiled.copy(update={"checkpointer": self.wrap(checkpointer)})
+        return profiled
+
+    def wrap(self, checkpointer: Any) -> Any:
+        """计时 put/put_writes 的 checkpointer 副本，与原来的共用存储"""
+        timed = copy.copy(checkpointer)
+        for name in ("put", "put_writes"):
+            setattr(timed, name, self._timed(name, getattr(checkpointer, name)))
+            async_name = "a" + name
+            setattr(
+                timed, async_name, self._atimed(name, getattr(checkpointer, async_name))
+            )
+        return timed
+
+    def _record_span(self, name: str, start: float, args: Tuple[Any, ...]) -> None:
+        span_args: Dict[str, Any] = {}
+        if name == "put" and len(args) >= 3:
+            span_args["step"] = (args[2] or {}).get("step")
+        elif name == "put_writes" and len(args) >= 2:
+            span_args["writes"] = len(args[1])
+        with self._lock:
+            self.spans.append(
+                Span(
+                    f"checkpoint.{name}",
+                    threading.get_ident(),
+                    start,
+                    self.clock(),
+                    span_args,
+                )
+            )
+
+    def _timed(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = self.clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record_span(name, start, args)
+
+        return timed
+
+    def _atimed(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        async def timed(*args: Any, **kwargs: Any) -> Any:
+            start = self.clock()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self._record_span(name, start, args)
+
+        return timed
+
+    # 回调
+
+    def _track(self, run_id: UUID, parent_run_id: Optional[UUID]) -> Optional[NodeRun]:
+        """记录 run 的根和所在的节点调用，返回父 run 所在的节点调用"""
+        owner = self._owner.get(parent_run_id) if parent_run_id else None
+        self._roots[run_id] = (
+            self._roots.get(parent_run_id, parent_run_id) if parent_run_id else run_id
+        )
+        self._owner[run_id] = owner
+        return owner
+
+    def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        with self._lock:
+            owner = self._track(run_id, parent_run_id)
+            task = metadata.get("langgraph_checkpoint_ns", node)
+            # 节点本身的 run：名字是节点名，而且不是同一个任务里的 run（路由函数等）；
+            # 子图的节点在父图节点的调用里，但任务不同
+            if node is None or kwargs.get("name") != node:
+                return
+            if owner is not None and owner.task == task:
+                return
+            namespace = task.rpartition("|")[0]
+            # 子图的节点显示为 父节点/子节点
+            node = "/".join(part.partition(":")[0] for part in task.split("|"))
+            previous = self._failed.pop(task, 0)
+            run = NodeRun(
+                node=node,
+                namespace=namespace,
+                task=task,
+                step=metadata.get("langgraph_step", 0),
+                root=self._roots[run_id],
+                thread=threading.get_ident(),
+                start=self.clock(),
+                cpu_start=self.cpu_clock(),
+                attempt=previous + 1,
+            )
+            self._open[run_id] = run
+            self._owner[run_id] = run
+            self.runs.append(run)
+
+    def _finish(self, run_id: UUID, status: str) -> None:
+        end = self.clock()
+        with self._lock:
+            run = self._open.pop(run_id, None)
+            self._owner.pop(run_id, None)
+            if self._roots.get(run_id) == run_id:
+                # 一次 invoke 结束，清理这次的记录
+                self._roots = {k: v for k, v in self._roots.items() if v != run_id}
+            else:
+                self._roots.pop(run_id, None)
+            if run is None:
+                return
+            run.end = end
+            run.status = status
+            if run.thread == threading.get_ident():
+                run.cpu = self.cpu_clock() - run.cpu_start
+            if status == "error":
+                self._failed[run.task] = run.attempt
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "ok")
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        # interrupt() 和 Command 跳转到父图也是用异常实现的，不算出错
+        self._finish(
+            run_id, "interrupted" if isinstance(error, GraphBubbleUp) else "error"
+        )
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        messages: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            self._track(run_id, parent_run_id)
+
+    def on_llm_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        prompts: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            self._track(run_id, parent_run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        input_tokens, output_tokens = token_usage(response)
+        with self._lock:
+            run = self._owner.pop(run_id, None)
+            self._roots.pop(run_id, None)
+            if run is None:
+                return
+            run.llm_calls += 1
+            run.input_tokens += input_tokens
+            run.output_tokens += output_tokens
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        with self._lock:
+            self._owner.pop(run_id, None)
+            self._roots.pop(run_id, None)
+
+    # 结果
+
+    def retries(self) -> Dict[str, int]:
+        """节点 -> 重试次数"""
+        counts: Dict[str, int] = {}
+        for run in self.runs:
+            if run.attempt > 1:
+                counts[run.node] = counts.get(run.node, 0) + 1
+        return counts
+
+    def supersteps(self) -> List[Superstep]:
+        groups: Dict[Tuple[UUID, str, int], List[NodeRun]] = {}
+        for run in self.runs:
+            if run.end is not None:
+                groups.setdefault((run.root, run.namespace, run.step), []).append(run)
+        steps: List[Superstep] = []
+        previous_end: Dict[Tuple[UUID, str], float] = {}
+        for (root, namespace, step), runs in sorted(
+            groups.items(), key=lambda item: min(r.start for r in item[1])
+        ):
+            start = min(r.start for r in runs)
+            end = max(r.end for r in runs)
+            # 一个任务重试时有多次调用，以最后一次结束的时间为准
+            task_ends: Dict[str, float] = {}
+            for r in runs:
+                task_ends[r.task] = max(task_ends.get(r.task, r.end), r.end)
+            last = previous_end.get((root, namespace))
+            steps.append(
+                Superstep(
+                    root=root,
+                    namespace=namespace,
+                    step=step,
+                    start=start,
+                    end=end,
+                    tasks=len(task_ends),
+                    wait=sum(end - task_end for task_end in task_ends.values()),
+                    gap=None if last is None else max(start - last, 0.0),
+                )
+            )
+            previous_end[(root, namespace)] = end
+        return steps
+
+    def rows(
+        self, sort_by: str = "wall", descending: bool = True
+    ) -> List[Dict[str, Any]]:
+        """每个节点一行，按 sort_by（REPORT_COLUMNS 之一或 node）排序"""
+        if sort_by != "node" and sort_by not in REPORT_COLUMNS:
+            raise ValueError(
+                f"sort_by must be 'node' or one of {', '.join(REPORT_COLUMNS)}"
+            )
+        with self._lock:
+            runs = [run for run in self.runs if run.end is not None]
+        by_node: Dict[str, List[NodeRun]] = {}
+        for run in runs:
+            by_node.setdefault(run.node, []).append(run)
+        rows = []
+        for node, node_runs in by_node.items():
+            walls = sorted(run.wall for run in node_runs)
+            rows.append(
+                {
+                    "node": node,
+                    "calls": len(node_runs),
+                    "errors": sum(run.status == "error" for run in node_runs),
+                    "retries": sum(run.attempt > 1 for run in node_runs),
+                    "wall": sum(walls),
+                    "mean": sum(walls) / len(walls),
+                    "p95": walls[min(len(walls) - 1, int(len(walls) * 0.95))],
+                    "max": walls[-1],
+                    "cpu": sum(run.cpu or 0.0 for run in node_runs),
+                    "llm_calls": sum(run.llm_calls for run in node_runs),
+                    "input_tokens": sum(run.input_tokens for run in node_runs),
+                    "output_tokens": sum(run.output_tokens for run in node_runs),
+                }
+            )
+        rows.sort(key=lambda row: row[sort_by], reverse=descending)
+        return rows
+
+    def report(self, sort_by: str = "wall", descending: bool = True) -> str:
+        lines = [
+            f"{'节点':<22}{'调用':>6}{'出错':>6}{'重试':>6}{'总耗时(s)':>11}{'平均(ms)':>10}"
+            f"{'p95(ms)':>10}{'最长(ms)':>10}{'CPU(s)':>9}{'LLM':>6}{'输入token':>11}{'输出token':>11}"
+        ]
+        for row in self.rows(sort_by, descending):
+            lines.append(
+                f"{row['node']:<24}{row['calls']:>6}{row['errors']:>6}{row['retries']:>6}"
+                f"{row['wall']:>11.3f}{row['mean'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}"
+                f"{row['max'] * 1000:>10.1f}{row['cpu']:>9.3f}{row['llm_calls']:>6}"
+                f"{row['input_tokens']:>11}{row['output_tokens']:>11}"
+            )
+        with self._lock:
+            spans = [span for span in self.spans if span.name.startswith("checkpoint")]
+        if spans:
+            lines.append(
+                f"checkpoint 写入: {len(spans)} 次, "
+                f"共 {sum(s.end - s.start for s in spans):.3f}s"
+            )
+        steps = self.supersteps()
+        if steps:
+            gaps = [step.gap for step in steps if step.gap is not None]
+            lines.append(
+                f"superstep: {len(steps)} 个, 等待最慢任务共 {sum(s.wait for s in steps):.3f}s, "
+                f"superstep 之间的间隔共 {sum(gaps):.3f}s"
+            )
+        return "\n".join(lines)
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        """Chrome trace event 格式（ph="X" 的完整事件，时间单位为微秒）"""
+
+        def us(seconds: float) -> float:
+            return round((seconds - self.origin) * 1e6, 3)
+
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": 0,
+                "args": {"name": "supersteps"},
+            }
+        ]
+        with self._lock:
+            runs = [run for run in self.runs if run.end is not None]
+            spans = list(self.spans)
+        for run in runs:
+            events.append(
+                {
+                    "name": run.node,
+                    "cat": "node",
+                    "ph": "X",
+                    "ts": us(run.start),
+                    "dur": round(run.wall * 1e6, 3),
+                    "pid": pid,
+                    "tid": run.thread,
+                    "args": {
+                        "step": run.step,
+                        "namespace": run.namespace,
+                        "status": run.status,
+                        "attempt": run.attempt,
+                        "cpu_ms": None if run.cpu is None else round(run.cpu * 1000, 3),
+                        "llm_calls": run.llm_calls,
+                        "input_tokens": run.input_tokens,
+                        "output_tokens": run.output_tokens,
+                    },
+                }
+            )
+        for span in spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": "checkpoint",
+                    "ph": "X",
+                    "ts": us(span.start),
+                    "dur": round((span.end - span.start) * 1e6, 3),
+                    "pid": pid,
+                    "tid": span.thread,
+                    "args": span.args,
+                }
+            )
+        for step in self.supersteps():
+            events.append(
+                {
+                    "name": f"step {step.step}",
+                    "cat": "superstep",
+                    "ph": "X",
+                    "ts": us(step.start),
+                    "dur": round((step.end - step.start) * 1e6, 3),
+                    "pid": pid,
+                    "tid": 0,
+                    "args": {
+                        "namespace": step.namespace,
+                        "tasks": step.tasks,
+                        "wait_ms": round(step.wait * 1000, 3),
+                        "gap_ms": (
+                            None if step.gap is None else round(step.gap * 1000, 3)
+                        ),
+                    },
+                }
+            )
+        return events
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.trace_events(), "displayTimeUnit": "ms"},
+                f,
+                ensure_ascii=False,
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self.runs.clear()
+            self.spans.clear()
+            self._failed.clear()
+            self.origin = self.clock()
@@ -0,0 +1,287 @@
+# 2026/10/18
+# zhangzhong
+# llm_call 的历史消息管理：提示词不超过 token 预算，旧的轮次折叠成摘要
+
+"""
+llm_call 每次都把 SystemMessage 和全部的 state["messages"] 发给模型，
+使用工具的长会话里每次发送的 token 随轮数线性增长，总量是轮数的平方。
+HistoryManager 在调用模型之前整理消息:
+
+    [SystemMessage] + [第一条用户消息] + [摘要] + [最近的若干轮，原样保留]
+
+    - 消息按"单元"处理：带 tool_calls 的 AIMessage 和它对应的 ToolMessage 是一个单元，
+      不会被拆开（否则模型 API 会因为找不到 tool_call_id 报错）
+    - 从最新的单元往前保留，总 token 数不超过 budget；放不下的旧单元折叠进摘要
+    - 摘要是滚动的：每个 thread 记住已经折叠到第几条消息，只把新折叠的消息交给 summarizer，
+      和上一次的摘要合并，不会重复处理整个历史
+    - 同时记住第一条消息和最后一条折叠的消息，与传入的 messages 对不上时
+      （没有 thread_id 的不同对话共用一个记录、从更早的 checkpoint 分叉）从头开始
+    - 第一条用户消息（任务本身）始终原样保留
+    - token 数用 Tokenizer 计算并按文本缓存，同一条消息在每轮中只编码一次
+    - stats(thread_id) 给出每个 thread 发送的 token 数和相比发送全部历史节省的 token 数
+
+summarizer(previous_summary, messages) -> str 默认只做截断式的摘要（不调用模型），
+可以用 llm_summarizer(model) 让模型生成摘要。
+
+用法:
+    history = HistoryManager(budget=2000)
+    def llm_call(state, config):
+        messages = history.prepare(system_message, state["messages"], config)
+        return {"messages": [model_with_tools.invoke(messages)]}
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from dataclasses import asdict, dataclass
+import functools
+import json
+import re
+import threading
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+# 每条消息的格式开销（role、分隔符），与 OpenAI 的计数方式相近
+MESSAGE_OVERHEAD = 4
+_APPROX_TOKEN = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+class Tokenizer:
+    """
+    计算文本的 token 数，结果按文本缓存
+
+    有 tiktoken 且能加载 encoding 时用 tiktoken，否则按每个 token 最多 4 个字母或一个标点估算
+    """
+
+    def __init__(self, encoding: str = "cl100k_base", cache_size: int = 65536) -> None:
+        self._encode: Callable[[str], Any]
+        try:
+            import tiktoken
+
+            self._encode = tiktoken.get_encoding(encoding).encode
+            self.exact = True
+        except Exception:
+            self._encode = _APPROX_TOKEN.findall
+            self.exact = False
+        self.count = functools.lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        return len(self._encode(text))
+
+    def message_tokens(self, message: BaseMessage) -> int:
+        content = message.content
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        tokens = MESSAGE_OVERHEAD + self.count(content)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            tokens += self.count(tool_call["name"])
+            tokens += self.count(json.dumps(tool_call["args"], sort_keys=True))
+        return tokens
+
+
+def group_units(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """把消息分成不可拆分的单元：AIMessage 和它的 tool_calls 对应的 ToolMessage 在一起"""
+    units: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and units:
+            previous = units[-1][0]
+            if isinstance(previous, AIMessage) and previous.tool_calls:
+                units[-1].append(message)
+                continue
+        units.append([message])
+    return units
+
+
+def truncating_summarizer(
+    max_chars: int = 2000,
+) -> Callable[[str, Sequence[BaseMessage]], str]:
+    """不调用模型的摘要：每条消息取前 200 个字符，整体只保留最后 max_chars 个字符"""
+
+    def summarize(previous: str, messages: Sequence[BaseMessage]) -> str:
+        lines = [previous] if previous else []
+        for message in messages:
+            text = message.content if isinstance(message.content, str) else ""
+            if isinstance(message, AIMessage) and message.tool_calls:
+                calls = ", ".join(
+                    f"{call['name']}({json.dumps(call['args'], sort_keys=True)})"
+                    for call in message.tool_calls
+                )
+                text = f"{text} called {calls}".strip()
+            lines.append(f"{message.type}: {text[:200]}")
+        return "\n".join(lines)[-max_chars:]
+
+    return summarize
+
+
+def llm_summarizer(model: Any) -> Callable[[str, Sequence[BaseMessage]], str]:
+    """用模型把上一次的摘要和新折叠的消息合并成新的摘要"""
+    fallback = truncating_summarizer()
+
+    def summarize(previous: str, messages: Sequence[BaseMessage]) -> str:
+        transcript = fallback("", messages)
+        prompt = (
+            "Update the running summary of a conversation with the new messages. "
+            "Keep every number, tool result and open question. Reply with the "
+            f"summary only.\n\nSummary so far:\n{previous or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        return str(model.invoke(prompt).content)
+
+    return summarize
+
+
+@dataclass
+class ThreadHistory:
+    """一个 thread 的摘要和统计"""
+
+    summary: str = ""
+    folded: int = 0  # state["messages"] 中已经折叠进摘要的消息数
+    calls: int = 0
+    tokens_sent: int = 0
+    tokens_full: int = 0  # 发送全部历史时的 token 数
+    counted: int = 0  # history_tokens 已经包括的消息数
+    history_tokens: int = 0  # 这些消息的 token 数
+    # 上面的记录属于哪段对话：第一条消息、最后一条折叠的消息、最后一条计数的消息
+    first: Optional[BaseMessage] = None
+    last_folded: Optional[BaseMessage] = None
+    last_counted: Optional[BaseMessage] = None
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_full - self.tokens_sent
+
+    def matches(self, messages: Sequence[BaseMessage]) -> bool:
+        """摘要和计数是否属于 messages 这段对话"""
+
+        def at(count: int, expected: Optional[BaseMessage]) -> bool:
+            return count == 0 or (
+                count <= len(messages) and messages[count - 1] == expected
+            )
+
+        if self.first is not None and (not messages or messages[0] != self.first):
+            return False
+        return at(self.folded, self.last_folded) and at(self.counted, self.last_counted)
+
+    def reset(self) -> None:
+        """丢掉摘要和计数，统计（calls、tokens_sent、tokens_full）保留"""
+        self.summary, self.folded = "", 0
+        self.counted, self.history_tokens = 0, 0
+        self.first = self.last_folded = self.last_counted = None
+
+
+class HistoryManager:
+    """
+    Args:
+        budget: 每次调用模型时提示词的 token 上限；最新的一个单元总是发送，
+            即使它本身就超过了预算
+        summarizer: (上一次的摘要, 新折叠的消息) -> 新的摘要，默认 truncating_summarizer()
+        tokenizer: 默认 Tokenizer()
+    """
+
+    def __init__(
+        self,
+        budget: int = 4000,
+        summarizer: Optional[Callable[[str, Sequence[BaseMessage]], str]] = None,
+        tokenizer: Optional[Tokenizer] = None,
+    ) -> None:
+        self.budget = budget
+        self.summarizer = summarizer or truncating_summarizer()
+        self.tokenizer = tokenizer or Tokenizer()
+        self.threads: Dict[str, ThreadHistory] = {}
+        self._lock = threading.Lock()
+
+    def _thread(self, config: Optional[Dict[str, Any]]) -> ThreadHistory:
+        thread_id = str(((config or {}).get("configurable") or {}).get("thread_id", ""))
+        with self._lock:
+            return self.threads.setdefault(thread_id, ThreadHistory())
+
+    def _summary_message(self, summary: str) -> SystemMessage:
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+    def prepare(
+        self,
+        system: SystemMessage,
+        messages: Sequence[BaseMessage],
+        config: Optional[Dict[str, Any]] = None,
+    ) -> List[BaseMessage]:
+        """
+        整理一次调用模型的消息
+
+        Args:
+            system: 系统提示词，原样放在最前面
+            messages: state["messages"]，全部历史
+            config: 节点的 RunnableConfig，用其中的 thread_id 区分会话
+        """
+        count = self.tokenizer.message_tokens
+        thread = self._thread(config)
+        if not thread.matches(messages):
+            # 不是上次的那段对话（新的对话，或者从更早的 checkpoint 重新运行），重新开始
+            thread.reset()
+        # 全部历史的 token 数只用于统计，增量地累加新消息
+        thread.history_tokens += sum(count(m) for m in messages[thread.counted :])
+        thread.counted = len(messages)
+        thread.first = messages[0] if messages else None
+        thread.last_counted = messages[-1] if messages else None
+
+        pinned: List[BaseMessage] = []
+        start = 0
+        if messages and isinstance(messages[0], HumanMessage):
+            pinned, start = [messages[0]], 1
+        fixed = count(system) + sum(count(m) for m in pinned)
+
+        thread.folded = max(thread.folded, start)
+        units = group_units(messages[thread.folded :])
+        sizes = [sum(count(m) for m in unit) for unit in units]
+        while True:
+            summary_tokens = (
+                count(self._summary_message(thread.summary)) if thread.summary else 0
+            )
+            # 从最新的单元往前放，放不下的折叠进摘要
+            kept = len(units)
+            used = fixed + summary_tokens
+            for i in range(len(units) - 1, -1, -1):
+                if i < len(units) - 1 and used + sizes[i] > self.budget:
+                    break
+                used += sizes[i]
+                kept = i
+            if kept == 0:
+                break
+            # 摘要变长后可能又放不下了，再折叠一次
+            newly_folded = [m for unit in units[:kept] for m in unit]
+            thread.summary = self.summarizer(thread.summary, newly_folded)
+            thread.folded += len(newly_folded)
+            units, sizes = units[kept:], sizes[kept:]
+        thread.last_folded = messages[thread.folded - 1] if thread.folded else None
+
+        prompt: List[BaseMessage] = [system, *pinned]
+        if thread.summary:
+            prompt.append(self._summary_message(thread.summary))
+        for unit in units:
+            prompt.extend(unit)
+
+        thread.calls += 1
+        thread.tokens_sent += sum(count(m) for m in prompt)
+        thread.tokens_full += count(system) + thread.history_tokens
+        return prompt
+
+    def stats(self, thread_id: Optional[str] = None) -> Dict[str, Any]:
+        """一个 thread 的统计；thread_id 为 None 时返回所有 thread 的"""
+        if thread_id is not None:
+            thread = self.threads.get(thread_id, ThreadHistory())
+            data = asdict(thread)
+            for name in (
+                "summary",
+                "counted",
+                "history_tokens",
+                "first",
+                "last_folded",
+                "last_counted",
+            ):
+                del data[name]
+            data["tokens_saved"] = thread.tokens_saved
+            return data
+        return {thread_id: self.stats(thread_id) for thread_id in list(self.threads)}
@@ -0,0 +1,431 @@
+# 2026/10/18
+# zhangzhong
+# 图状态中 messages 的只追加日志，代替 operator.add 的列表拷贝
+
+"""
+MessagesState 的 messages 用 operator.add 合并，每个节点的更新都会创建一个包含全部历史的新列表，
+长会话里拷贝的总量是 O(n²)；有 checkpointer 时每个 checkpoint 还要再保存一份完整的列表。
+
+MessageLog 是不可变的消息序列，多个版本共享同一个底层列表（像 Go 的 slice）:
+    - extend()/append() 返回新的 MessageLog；在最新版本上追加是 O(1)（均摊），
+      旧版本仍然只看到自己的长度；在旧版本上追加（分叉）时才拷贝一次
+    - log[-1]、len(log)、log[i] 是 O(1)，切片只拷贝切出的部分
+    - 可以像 list 一样迭代、比较，[system] + log 得到 list
+
+用法:
+    class MessagesState(TypedDict):
+        messages: Annotated[MessageLog, append_messages]
+
+    app = builder.compile(checkpointer=MemorySaver(serde=message_log_serde()))
+
+序列化: JsonPlusSerializer 按 _asdict 完整保存 MessageLog，但 MessageLog 不在 LangGraph 允许恢复的
+类型里：默认的 serde 恢复时会警告（以后的版本会拒绝），LANGGRAPH_STRICT_MSGPACK=true 时恢复成普通的 dict。
+所以 checkpointer 要用 message_log_serde()（允许 MessageLog 的 JsonPlusSerializer）或 DeltaSerializer。
+DeltaSerializer 包装 message_log_serde()，按 CHUNK_SIZE 条消息分块：写满的块按内容的 sha1 只保存一次
+（存在 chunks 中），每个 checkpoint 只保存块的 sha1 和最后不满一块的消息。
+相同的块在不同 thread 之间也只存一份。
+
+块必须和 checkpoint 一样持久，否则重启后 checkpoint 里的 sha1 找不到对应的块:
+    - MemorySaver: 默认的内存 dict 即可
+    - sqlite_checkpointer.SQLiteSaver: 不指定 chunks 时，块自动存到 SQLiteSaver 的数据库文件
+      （message_chunks 表）；SQLiteSaver 的 prune()/compact() 会删除不再被引用的块
+    - 其他持久化的 checkpointer: 要传入持久化的 chunks（如 SQLiteChunkStore(path)），
+      并在删除 checkpoint 之后调用 sweep()
+"""
+
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    overload,
+)
+from collections import OrderedDict
+import hashlib
+import itertools
+import sqlite3
+import threading
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+CHUNK_SIZE = 32
+
+# JsonPlusSerializer 恢复 MessageLog 时要允许的类型
+MSGPACK_ALLOWLIST = [("learn_langgraph.message_log", "MessageLog")]
+
+
+class _Store:
+    """多个 MessageLog 共享的底层列表，只会在末尾追加"""
+
+    __slots__ = ("items", "chunk_keys", "chunk_token", "lock")
+
+    def __init__(self, items: List[BaseMessage]) -> None:
+        self.items = items
+        self.chunk_keys: List[str] = []  # 已经写满的块的 sha1，序列化时计算
+        # chunk_keys 属于哪个 DeltaSerializer（和它的哪次 sweep）
+        self.chunk_token: Any = None
+        self.lock = threading.Lock()
+
+
+class MessageLog(Sequence[BaseMessage]):
+    """不可变、共享存储的消息序列"""
+
+    __slots__ = ("_store", "_len")
+
+    def __init__(self, messages: Iterable[BaseMessage] = ()) -> None:
+        self._store = _Store(list(messages))
+        self._len = len(self._store.items)
+
+    @classmethod
+    def _view(cls, store: _Store, length: int) -> "MessageLog":
+        log = cls.__new__(cls)
+        log._store = store
+        log._len = length
+        return log
+
+    def __len__(self) -> int:
+        return self._len
+
+    @overload
+    def __getitem__(self, index: int) -> BaseMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[BaseMessage]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self._store.items[i] for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("MessageLog index out of range")
+        return self._store.items[index]
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        return itertools.islice(self._store.items, self._len)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (MessageLog, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __add__(self, other: Iterable[BaseMessage]) -> "MessageLog":
+        return self.extend(other)
+
+    def __radd__(self, other: Iterable[BaseMessage]) -> List[BaseMessage]:
+        # [SystemMessage(...)] + state["messages"]
+        return [*other, *self]
+
+    def __repr__(self) -> str:
+        return f"MessageLog({self[:]!r})"
+
+    def extend(self, messages: Iterable[BaseMessage]) -> "MessageLog":
+        new = list(messages)
+        store = self._store
+        with store.lock:
+            if self._len == len(store.items):
+                store.items.extend(new)
+                return MessageLog._view(store, self._len + len(new))
+        # 这个版本之后已经有别的版本追加过，拷贝一份（分叉）
+        return MessageLog([*self, *new])
+
+    def append(self, message: BaseMessage) -> "MessageLog":
+        return self.extend([message])
+
+    def _asdict(self) -> Dict[str, Any]:
+        # JsonPlusSerializer 把有 _asdict 的对象按 MessageLog(**_asdict()) 保存和恢复，
+        # 恢复时 MessageLog 要在 allowed_msgpack_modules 里（见 message_log_serde）
+        return {"messages": self[:]}
+
+    def chunks(self) -> Tuple[List[List[BaseMessage]], List[BaseMessage]]:
+        """写满的块和最后不满一块的消息"""
+        full = self._len // CHUNK_SIZE * CHUNK_SIZE
+        items = self._store.items
+        return (
+            [items[i : i + CHUNK_SIZE] for i in range(0, full, CHUNK_SIZE)],
+            items[full : self._len],
+        )
+
+
+def append_messages(
+    left: Optional[Sequence[BaseMessage]],
+    right: Union[BaseMessage, Iterable[BaseMessage]],
+) -> MessageLog:
+    """messages 的 reducer，与 operator.add 的结果相同，但不拷贝已有的消息"""
+    if left is None:
+        left = MessageLog()
+    elif not isinstance(left, MessageLog):
+        left = MessageLog(left)
+    if isinstance(right, BaseMessage):
+        right = [right]
+    return left.extend(right)
+
+
+def message_log_serde(
+    allowed_msgpack_modules: Iterable[Tuple[str, str]] = (),
+) -> JsonPlusSerializer:
+    """
+    允许恢复 MessageLog 的 JsonPlusSerializer，用作 MemorySaver(serde=...) 等
+
+    Args:
+        allowed_msgpack_modules: 状态中其他要恢复的自定义类型 (module, name)；
+            LangChain 的消息等内置的安全类型不用列出
+    """
+    return JsonPlusSerializer(
+        allowed_msgpack_modules=[*MSGPACK_ALLOWLIST, *allowed_msgpack_modules]
+    )
+
+
+# checkpoint 中代替 MessageLog 的普通 dict
+_MARKER = "__message_log__"
+
+
+def _markers(obj: Any) -> Iterator[Dict[str, Any]]:
+    """反序列化后的值（单个值或整个 checkpoint）中代替 MessageLog 的 dict"""
+    if not isinstance(obj, dict):
+        return
+    if _MARKER in obj:
+        yield obj
+        return
+    values = obj.get("channel_values")
+    if isinstance(values, dict):
+        for value in values.values():
+            if isinstance(value, dict) and _MARKER in value:
+                yield value
+
+
+class SQLiteChunkStore(MutableMapping[str, bytes]):
+    """
+    SQLite 中的块（message_chunks 表），可以和 sqlite_checkpointer 共用一个数据库文件
+
+    Args:
+        path: 数据库文件；":memory:" 只在这个连接里，不能和别的连接共用
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS message_chunks "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL)"
+        )
+
+    def __getitem__(self, key: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM message_chunks WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO message_chunks VALUES (?, ?)", (key, data)
+            )
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM message_chunks WHERE key = ?", (key,)
+            ).rowcount
+        if not deleted:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return (
+                self._conn.execute(
+                    "SELECT 1 FROM message_chunks WHERE key = ?", (key,)
+                ).fetchone()
+                is not None
+            )
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = self._conn.execute("SELECT key FROM message_chunks").fetchall()
+        return (key for (key,) in keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM message_chunks"
+            ).fetchone()
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DeltaSerializer:
+    """
+    按块保存 MessageLog 的 serde，其他值交给 inner
+
+    Args:
+        chunks: 块的 sha1 -> 序列化后的块，默认是内存中的 dict（与 SQLiteSaver 一起使用时
+            换成它的数据库文件）；与其他持久化的 checkpointer 一起使用时必须指定持久化的映射，
+            如 SQLiteChunkStore(path)
+        inner: 默认 message_log_serde()
+        cache_size: 反序列化后的块的缓存数，恢复同一个 thread 的多个 checkpoint 时共享这些块
+    """
+
+    def __init__(
+        self,
+        chunks: Optional[MutableMapping[Any, bytes]] = None,
+        inner: Any = None,
+        cache_size: int = 1024,
+    ) -> None:
+        self.chunks: MutableMapping[Any, bytes] = {} if chunks is None else chunks
+        self.inner = inner or message_log_serde()
+        self.cache_size = cache_size
+        self._default_chunks = chunks is None
+        self._decoded: "OrderedDict[str, List[BaseMessage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 上次 sweep 之后写入的块，sweep 时它们的 checkpoint 可能还没有提交，不能删
+        self._fresh: Set[str] = set()
+        # 每次 sweep 换一个，内存中的 MessageLog 之前算好的块可能已经被删了，要重新确认
+        self._token = object()
+
+    def bind_checkpointer(self, checkpointer: Any) -> None:
+        """
+        SQLiteSaver 创建时调用：没有指定 chunks 时把块存到它的数据库文件，
+        与 checkpoint 一样在重启后仍然可用
+        """
+        if not self._default_chunks:
+            return
+        path = getattr(checkpointer, "path", None)
+        if path is None:
+            raise ValueError(
+                "DeltaSerializer 与持久化的 checkpointer 一起使用时需要指定持久化的 chunks"
+            )
+        if path == ":memory:":
+            return  # 内存数据库本身不持久，内存中的 dict 就够了
+        store = SQLiteChunkStore(path)
+        store.update(self.chunks)
+        self.chunks = store
+        self._default_chunks = False
+
+    def _chunk_keys(self, log: MessageLog) -> List[str]:
+        full, _ = log.chunks()
+        store = log._store
+        with store.lock:
+            if store.chunk_token is not self._token:
+                # 第一次由这个 serde 保存，或者之后有过 sweep
+                store.chunk_keys, store.chunk_token = [], self._token
+            for chunk in full[len(store.chunk_keys) :]:
+                type_, data = self.inner.dumps_typed(chunk)
+                encoded = type_.encode() + b"\n" + data
+                key = hashlib.sha1(encoded).hexdigest()
+                # 先登记再检查块在不在，与 sweep 的删除不会交错
+                with self._lock:
+                    self._fresh.add(key)
+                if key not in self.chunks:
+                    self.chunks[key] = encoded
+                store.chunk_keys.append(key)
+            return store.chunk_keys[: len(full)]
+
+    def _encode(self, log: MessageLog) -> Dict[str, Any]:
+        _, tail = log.chunks()
+        return {_MARKER: self._chunk_keys(log), "tail": tail}
+
+    def _chunk(self, key: str) -> List[BaseMessage]:
+        with self._lock:
+            if key in self._decoded:
+                self._decoded.move_to_end(key)
+                return self._decoded[key]
+        type_, _, data = self.chunks[key].partition(b"\n")
+        chunk = self.inner.loads_typed((type_.decode(), data))
+        with self._lock:
+            self._decoded[key] = chunk
+            while len(self._decoded) > self.cache_size:
+                self._decoded.popitem(last=False)
+        return chunk
+
+    def _decode(self, value: Dict[str, Any]) -> MessageLog:
+        messages: List[BaseMessage] = []
+        for key in value[_MARKER]:
+            messages.extend(self._chunk(key))
+        messages.extend(value["tail"])
+        return MessageLog(messages)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if isinstance(obj, MessageLog):
+            obj = self._encode(obj)
+        elif isinstance(obj, dict) and isinstance(obj.get("channel_values"), dict):
+            # 整个 checkpoint 一起保存的 checkpointer（如 sqlite_checkpointer）
+            values = obj["channel_values"]
+            if any(isinstance(v, MessageLog) for v in values.values()):
+                obj = {
+                    **obj,
+                    "channel_values": {
+                        k: self._encode(v) if isinstance(v, MessageLog) else v
+                        for k, v in values.items()
+                    },
+                }
+        return self.inner.dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        obj = self.inner.loads_typed(data)
+        if isinstance(obj, dict):
+            if _MARKER in obj:
+                return self._decode(obj)
+            values = obj.get("channel_values")
+            if isinstance(values, dict):
+                for k, v in values.items():
+                    if isinstance(v, dict) and _MARKER in v:
+                        values[k] = self._decode(v)
+        return obj
+
+    def sweep(self, blobs: Iterable[Tuple[str, Optional[bytes]]]) -> int:
+        """
+        删除不再被引用的块
+
+        上次 sweep 之后写入的块这次不删（引用它们的 checkpoint 可能正在保存），下一次 sweep 再删。
+
+        Args:
+            blobs: checkpointer 保存的所有 (type, data)，即 checkpoint 和 writes；
+                删除 checkpoint 之后调用（SQLiteSaver 的 prune()/compact() 会调用）
+
+        Returns:
+            int: 删除的块数
+        """
+        with self._lock:
+            fresh, self._fresh = self._fresh, set()
+            self._token = object()
+        live = set(fresh)
+        for type_, data in blobs:
+            if data is None:
+                continue
+            for value in _markers(self.inner.loads_typed((type_, data))):
+                live.update(value[_MARKER])
+        deleted = 0
+        for key in list(self.chunks):
+            name = key.decode() if isinstance(key, bytes) else key
+            if name in live:
+                continue
+            # 扫描期间保存的 checkpoint 可能又用到了这个块（它已经存在，不会再写一次），
+            # 检查和删除要在同一个锁里；在这之后才用到的会发现块不在了，重新写入
+            with self._lock:
+                if name in self._fresh:
+                    continue
+                try:
+                    del self.chunks[key]
+                except KeyError:
+                    pass  # 同时进行的另一次 sweep 已经删了
+                self._decoded.pop(name, None)
+            deleted += 1
+        return deleted
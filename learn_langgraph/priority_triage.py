@@ -0,0 +1,245 @@
+# 2026/10/18
+# zhangzhong
+# 按紧急程度调度邮件：LLM 并发名额先给 critical/high 的邮件
+
+"""
+BatchTriageRunner 按到达顺序处理邮件，LLM 的并发名额用满时，一封 critical 的账单邮件
+要排在几百封 low 的功能建议后面。PriorityTriageRunner 在它前面加了一个调度器:
+
+    - 邮件从迭代器中按需读入（最多 lookahead 封），先用 pre_score 按关键词粗略估计紧急程度，
+      不调用 LLM；按这个优先级决定谁先开始处理（最多 max_in_flight 封同时处理）
+    - 每个限制并发的节点（classify_intent、draft_response）前有一个 PrioritySemaphore，
+      名额空出来时给优先级最高的等待者；分类之后用 LLM 给出的 urgency 代替 pre_score
+    - aging: 每等待 aging 秒优先级提高一级，low 的邮件最多等 3 * aging 秒就和新到的
+      critical 邮件同等对待，不会一直饿着
+    - stats()/report() 按优先级（分类后的 urgency）给出排队等待时间的 p50/p95/最大值，
+      以及满足 slo 的比例
+
+用法:
+    python -m learn_langgraph.email_batch --fake 2000 --priority --limit classify_intent=4
+"""
+
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import contextlib
+import re
+import time
+
+from learn_langgraph.email_batch import BatchTriageRunner, TriageResult
+
+# 与 EmailClassification.urgency 相同，越靠前越紧急
+URGENCY_LEVELS = ("critical", "high", "medium", "low")
+
+# (正则, 紧急程度)，按顺序匹配第一个
+PRE_SCORE_RULES = [
+    (
+        re.compile(
+            r"\b(urgent|asap|immediately|outage|down for everyone|security|breach)\b"
+        ),
+        "critical",
+    ),
+    (
+        re.compile(
+            r"\b(charged|refund|invoice|billing|payment|cancel|locked out|504|fails?)\b"
+        ),
+        "high",
+    ),
+    (re.compile(r"\b(crash\w*|error|bug|broken|not working)\b"), "medium"),
+]
+
+
+def pre_score(email: Dict[str, Any]) -> str:
+    """分类之前按关键词估计邮件的紧急程度，只用来排队，不影响路由"""
+    text = str(email.get("email_content", "")).lower()
+    for pattern, urgency in PRE_SCORE_RULES:
+        if pattern.search(text):
+            return urgency
+    return "low"
+
+
+class PrioritySemaphore:
+    """
+    按优先级分配名额的 asyncio 信号量，同一优先级先来先得
+
+    Args:
+        limit: 名额数
+        aging: 每等待这么多秒优先级提高一级，None 表示不提高（严格按优先级）
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        aging: Optional[float] = 30.0,
+        clock: Any = time.perf_counter,
+    ) -> None:
+        self.limit = limit
+        self.aging = aging
+        self.clock = clock
+        self._free = limit
+        # 每个优先级一个队列: (开始等待的时间, future)
+        self._queues: List[Deque[Tuple[float, asyncio.Future]]] = [
+            deque() for _ in URGENCY_LEVELS
+        ]
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues)
+
+    def _pick(self) -> Optional[int]:
+        """下一个得到名额的优先级：队首的有效级别最小（等待时间折算为级别）"""
+        now = self.clock()
+        best, best_rank = None, None
+        for level, queue in enumerate(self._queues):
+            while queue and queue[0][1].done():
+                queue.popleft()  # 已取消的等待者
+            if not queue:
+                continue
+            rank = level
+            if self.aging:
+                rank -= (now - queue[0][0]) / self.aging
+            if best_rank is None or rank < best_rank:
+                best, best_rank = level, rank
+        return best
+
+    def _wake(self) -> None:
+        while self._free > 0:
+            level = self._pick()
+            if level is None:
+                return
+            _, future = self._queues[level].popleft()
+            self._free -= 1
+            future.set_result(None)
+
+    async def acquire(self, urgency: str) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._queues[URGENCY_LEVELS.index(urgency)].append((self.clock(), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已经分到名额时才被取消，要还回去
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self._free += 1
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, urgency: str) -> Any:
+        await self.acquire(urgency)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+class PriorityTriageRunner(BatchTriageRunner):
+    """
+    按紧急程度调度的 BatchTriageRunner
+
+    Args:
+        limits, max_in_flight, checkpointer: 同 BatchTriageRunner
+        aging: 每等待这么多秒优先级提高一级，None 表示严格按优先级
+        lookahead: 最多预先读入多少封邮件参与排队
+        slo: 紧急程度 -> 排队等待时间的目标（秒），report() 给出满足的比例
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        max_in_flight: int = 64,
+        checkpointer: Any = None,
+        aging: Optional[float] = 30.0,
+        lookahead: int = 1000,
+        slo: Optional[Dict[str, float]] = None,
+    ) -> None:
+        super().__init__(limits, max_in_flight, checkpointer)
+        self.aging = aging
+        self.slo = dict(slo or {})
+        self._window = max(lookahead, max_in_flight)
+        self._admission = PrioritySemaphore(max_in_flight, aging)
+        self._priority_semaphores = {
+            name: PrioritySemaphore(limit, aging) for name, limit in self.limits.items()
+        }
+        self._pre_scores: Dict[str, str] = {}  # email_id -> pre_score
+        # 紧急程度 -> 每封邮件的排队等待时间
+        self.queue_waits: Dict[str, List[float]] = {
+            urgency: [] for urgency in URGENCY_LEVELS
+        }
+
+    def _urgency(self, state: Any) -> str:
+        classification = state.get("classification")
+        if classification and classification.get("urgency") in URGENCY_LEVELS:
+            return classification["urgency"]
+        return self._pre_scores.get(state.get("email_id", ""), "low")
+
+    def _slot(self, name: str, state: Any) -> Any:
+        semaphore = self._priority_semaphores.get(name)
+        if semaphore is None:
+            return contextlib.nullcontext()
+        return semaphore.slot(self._urgency(state))
+
+    async def _scheduled(self, email: Dict[str, Any]) -> TriageResult:
+        email_id = str(email.get("email_id", ""))
+        urgency = pre_score(email)
+        self._pre_scores[email_id] = urgency
+        queued = time.perf_counter()
+        try:
+            async with self._admission.slot(urgency):
+                admitted = time.perf_counter()
+                result = await self.triage(email)
+        finally:
+            self._pre_scores.pop(email_id, None)
+        result.queue_seconds += admitted - queued
+        result.priority = (result.classification or {}).get("urgency", urgency)
+        if result.priority not in self.queue_waits:
+            result.priority = urgency
+        self.queue_waits[result.priority].append(result.queue_seconds)
+        return result
+
+    def _schedule(self, email: Dict[str, Any]) -> Awaitable[TriageResult]:
+        return self._scheduled(email)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        priorities = {}
+        for urgency, waits in self.queue_waits.items():
+            if not waits:
+                continue
+            entry = {
+                "emails": len(waits),
+                "wait_p50": percentile(waits, 0.5),
+                "wait_p95": percentile(waits, 0.95),
+                "wait_max": max(waits),
+            }
+            if urgency in self.slo:
+                met = sum(wait <= self.slo[urgency] for wait in waits)
+                entry["slo_seconds"] = self.slo[urgency]
+                entry["slo_met"] = met / len(waits)
+            priorities[urgency] = entry
+        stats["priorities"] = priorities
+        return stats
+
+    def report(self) -> str:
+        lines = [super().report()]
+        lines.append(
+            f"{'优先级':<10}{'邮件':>8}{'等待p50':>10}{'等待p95':>10}{'最长':>10}{'SLO':>12}"
+        )
+        for urgency, entry in self.stats()["priorities"].items():
+            slo = ""
+            if "slo_met" in entry:
+                slo = f"{entry['slo_met']:.1%}<={entry['slo_seconds']:g}s"
+            lines.append(
+                f"{urgency:<13}{entry['emails']:>10}"
+                f"{entry['wait_p50'] * 1000:>10.0f}ms"
+                f"{entry['wait_p95'] * 1000:>10.0f}ms"
+                f"{entry['wait_max'] * 1000:>10.0f}ms{slo:>14}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,127 @@
+from langgraph.types import Command
+
+from fake_chat_model import FakeEmailModel
+from learn_langgraph import email_agent
+from learn_langgraph.classification_cache import ClassificationCache, normalize_email
+
+BILLING = {
+    "intent": "billing",
+    "urgency": "high",
+    "topic": "billing",
+    "summary": "double charge",
+}
+EMAIL = "I was charged twice for my subscription! This is urgent!"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_strips_quotes_forwards_and_signatures():
+    forwarded = (
+        "FYI, see below\n\n"
+        "---------- Forwarded message ---------\n"
+        "From: customer@example.com\n"
+        "Subject: billing\n\n"
+        f"{EMAIL}\n\n"
+        "Best regards,\nBob"
+    )
+    reply = (
+        f"{EMAIL}\n\nOn Mon, Jan 5, 2026 at 10:00 Support wrote:\n> How can we help?"
+    )
+    expected = normalize_email(EMAIL)
+    assert expected == "i was charged twice for my subscription! this is urgent!"
+    assert normalize_email(forwarded) == expected
+    assert normalize_email(reply) == expected
+    assert normalize_email("> only a quote") == "> only a quote"
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = ClassificationCache()
+    assert cache.get(EMAIL) is None
+    cache.put(EMAIL, BILLING)
+
+    hit = cache.get("Hi,\n  I was charged TWICE for my subscription. This is urgent!!")
+    assert hit == (BILLING, True)
+    near = cache.get(EMAIL + "\nPlease fix.")
+    assert near is not None and not near.exact
+    assert near.classification == BILLING
+    assert cache.get("How do I reset my password?") is None
+    assert cache.stats() == {
+        "entries": 1,
+        "hits": 1,
+        "near_hits": 1,
+        "misses": 2,
+        "evictions": 0,
+        "hit_rate": 0.5,
+    }
+
+
+def test_lru_ttl_and_persistence(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "cache.jsonl")
+    cache = ClassificationCache(path, max_entries=2, ttl=60, clock=clock)
+    cache.put("first email about invoices", BILLING)
+    cache.put("second email about a crash", BILLING)
+    cache.get("first email about invoices")
+    cache.put("third email about dark mode", BILLING)
+    assert cache.evictions == 1
+    assert cache.get("second email about a crash") is None
+    cache.close()
+
+    restored = ClassificationCache(path, ttl=60, clock=clock)
+    assert len(restored) == 2
+    assert restored.get("third email about dark mode").classification == BILLING
+    clock.now += 61
+    assert restored.get("first email about invoices") is None
+    assert len(restored) == 1
+
+
+def test_classify_intent_uses_cache(monkeypatch):
+    calls = []
+
+    class CountingModel(FakeEmailModel):
+        def _generate(self, *args, **kwargs):
+            calls.append(1)
+            return super()._generate(*args, **kwargs)
+
+    monkeypatch.setattr(email_agent, "llm", CountingModel())
+    monkeypatch.setattr(email_agent, "classification_cache", ClassificationCache())
+    state = {"email_content": EMAIL, "sender_email": "a@example.com"}
+
+    first = email_agent.classify_intent(state)
+    second = email_agent.classify_intent(
+        {"email_content": EMAIL + "\n\nThanks,\nAlice", "sender_email": "b@x.com"}
+    )
+    assert isinstance(second, Command)
+    assert second.goto == first.goto == "human_review"
+    assert second.update == first.update
+    assert len(calls) == 1
+
+
+def test_cached_hit_is_routed_by_current_rules(monkeypatch):
+    question = {**BILLING, "intent": "question", "urgency": "low"}
+    cache = ClassificationCache()
+    cache.put(EMAIL, question)
+    monkeypatch.setattr(email_agent, "classification_cache", cache)
+
+    # 缓存之后路由规则变了，命中时按新的规则走
+    monkeypatch.setitem(
+        email_agent.CONTEXT_BRANCHES, "question", ["lookup_customer_history"]
+    )
+    command = email_agent.classify_intent(
+        {"email_content": EMAIL, "sender_email": "a@example.com"}
+    )
+    assert command.update == {"classification": question}
+    assert command.goto == ["lookup_customer_history"]
+
+
+def test_get_returns_a_copy():
+    cache = ClassificationCache()
+    cache.put(EMAIL, BILLING)
+    cache.get(EMAIL).classification["urgency"] = "low"
+    assert cache.get(EMAIL).classification == BILLING
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from learn_langgraph import email_agent
+from learn_langgraph.doc_search import DocSearch, SearchAPIError
+
+ARTICLES = {
+    "password.md": (
+        "# Password\n\n"
+        "Reset password via Settings > Security > Change Password.\n\n"
+        "Password must be at least 12 characters."
+    ),
+    "billing.md": (
+        "# Billing\n\n"
+        "Refunds take 5 to 10 business days.\n\n"
+        "If you were charged twice we will refund the second charge."
+    ),
+}
+
+
+def write_articles(directory, articles):
+    for name, text in articles.items():
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def test_search_ranks_relevant_paragraphs(tmp_path):
+    write_articles(tmp_path, ARTICLES)
+    search = DocSearch(str(tmp_path))
+    hits = search.hits("charged twice", k=2)
+    assert hits[0].article == "billing.md"
+    assert hits[0].text == "If you were charged twice we will refund the second charge."
+    assert search.search("reset my password", k=1) == [
+        "Reset password via Settings > Security > Change Password."
+    ]
+    assert search.search("unrelated words") == []
+
+
+def test_refresh_only_reads_changed_articles(tmp_path):
+    write_articles(tmp_path, ARTICLES)
+    search = DocSearch(str(tmp_path))
+    assert search.refresh() == {"articles": 2, "read": 2, "reused": 0, "removed": 0}
+    assert search.refresh() == {"articles": 2, "read": 0, "reused": 2, "removed": 0}
+
+    write_articles(tmp_path, {"billing.md": "# Billing\n\nInvoices are sent monthly."})
+    assert search.refresh()["read"] == 1
+    assert search.search("charged twice") == []
+    assert search.search("invoice") == ["Invoices are sent monthly."]
+
+    os.remove(tmp_path / "password.md")
+    assert search.refresh() == {"articles": 1, "read": 0, "reused": 1, "removed": 1}
+    assert search.search("password") == []
+
+    # 新的进程直接使用已有的索引文件
+    assert DocSearch(str(tmp_path)).refresh()["read"] == 0
+
+
+def test_missing_directory_raises_search_error(tmp_path):
+    with pytest.raises(SearchAPIError):
+        DocSearch(str(tmp_path / "missing")).search("password")
+
+
+def test_search_documentation_node_uses_index(tmp_path, monkeypatch):
+    write_articles(tmp_path, ARTICLES)
+    monkeypatch.setattr(email_agent, "doc_search", DocSearch(str(tmp_path)))
+    state = {"classification": {"intent": "question", "topic": "password reset"}}
+    command = email_agent.search_documentation(state)
+    assert command.goto == "gather_context"
+    assert command.update["search_results"][0].startswith("Reset password")
+
+    monkeypatch.setattr(email_agent, "doc_search", DocSearch(str(tmp_path / "no")))
+    command = email_agent.search_documentation(state)
+    assert command.update["search_results"][0].startswith("Search temporarily")
@@ -0,0 +1,112 @@
+import functools
+import threading
+import time
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from fake_chat_model import FakeEmailModel
+from learn_langgraph import email_agent
+
+BRANCH_DELAY = 0.2
+BRANCHES = ("search_documentation", "bug_tracking", "lookup_customer_history")
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(email_agent, "llm", FakeEmailModel(delay=0.0))
+
+
+def compile_app(calls, speculative=True):
+    """每个上下文分支第一次调用时 sleep BRANCH_DELAY，模拟外部服务的延迟"""
+    lock = threading.Lock()
+
+    def wrap(name, func):
+        @functools.wraps(func)
+        def wrapper(state):
+            with lock:
+                calls.append(name)
+            if name in BRANCHES and state.get("classification") is not None:
+                time.sleep(BRANCH_DELAY)
+            return func(state)
+
+        return wrapper
+
+    workflow = email_agent.build_workflow(wrap, speculative=speculative)
+    return workflow.compile(checkpointer=MemorySaver())
+
+
+def triage(app, content):
+    config = {"configurable": {"thread_id": content}}
+    email = {"email_content": content, "sender_email": "a@example.com"}
+    start = time.perf_counter()
+    result = app.invoke(email, config)
+    return result, time.perf_counter() - start
+
+
+def test_context_branches_run_concurrently():
+    calls = []
+    app = compile_app(calls)
+    result, elapsed = triage(app, "The export feature crashes, looks like a bug")
+
+    # 三个分支各 0.2s，串行需要 0.6s
+    assert elapsed < 2 * BRANCH_DELAY
+    assert calls.count("gather_context") == 1
+    assert calls.index("gather_context") > max(calls.index(b) for b in BRANCHES)
+    assert result["search_results"][-1] == "Bug ticket BUG-12345 created"
+    assert result["customer_history"]["email"] == "a@example.com"
+    assert result["draft_response"] == email_agent.llm.reply
+
+
+def test_customer_history_is_fetched_speculatively(monkeypatch):
+    fetched = []
+    service = email_agent.CustomerService()
+    monkeypatch.setattr(
+        email_agent.customer_service,
+        "history",
+        lambda sender: fetched.append(sender) or service.history(sender),
+    )
+
+    calls = []
+    app = compile_app(calls)
+    # 和 classify_intent 在同一个超步执行，分类后的分支沿用结果
+    assert calls == []
+    triage(app, "How do I reset my password?")
+    assert calls.index("lookup_customer_history") < calls.index("search_documentation")
+    assert fetched == ["a@example.com"]
+
+    # 路由到 human_review 时不需要客户信息，也不会进入 gather_context
+    calls.clear()
+    result, _ = triage(app, "I was charged twice!")
+    assert "__interrupt__" in result
+    assert "gather_context" not in calls
+
+    # 关闭 speculative 时只在分类之后查询
+    calls.clear()
+    fetched.clear()
+    app = compile_app(calls, speculative=False)
+    triage(app, "How do I reset my password?")
+    assert calls.index("lookup_customer_history") > calls.index("classify_intent")
+    assert fetched == ["a@example.com"]
+
+
+def test_second_email_on_same_thread_starts_fresh():
+    app = compile_app([])
+    config = {"configurable": {"thread_id": "customer_123"}}
+    bug = {
+        "email_content": "The export feature crashes when I select PDF format",
+        "sender_email": "a@example.com",
+    }
+    app.invoke(bug, config)
+
+    # 同一个 thread 的第二封邮件，上一封的分类、工单和客户信息不能带过来
+    feature = {
+        "email_content": "Can you add dark mode to the mobile app?",
+        "sender_email": "b@example.com",
+    }
+    result = app.invoke(feature, config)
+    assert result["classification"]["intent"] == "feature"
+    assert result["bug_ticket"] is None
+    assert result["customer_history"]["email"] == "b@example.com"
+    assert not any("Bug ticket" in doc for doc in result["search_results"])
+    assert result["draft_response"] == email_agent.llm.reply
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+from fake_chat_model import FakeEmailModel
+from learn_langgraph import email_agent
+from learn_langgraph.email_batch import BatchTriageRunner, fake_emails
+
+
+class CountingEmailModel(FakeEmailModel):
+    """记录同时进行的调用数"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._peak = 0
+
+    @property
+    def peak(self):
+        return self._peak
+
+    def _generate(self, *args, **kwargs):
+        with self._lock:
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+        try:
+            return super()._generate(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    model = CountingEmailModel(delay=0.01)
+    monkeypatch.setattr(email_agent, "llm", model)
+    return model
+
+
+def run(runner, emails):
+    async def collect():
+        return [result async for result in runner.run(emails)]
+
+    return asyncio.run(collect())
+
+
+def test_batch_respects_node_limits(fake_llm):
+    runner = BatchTriageRunner(
+        {"classify_intent": 3, "draft_response": 2}, max_in_flight=32
+    )
+    results = run(runner, fake_emails(100))
+    runner.close()
+
+    assert sorted(r.email_id for r in results) == sorted(
+        f"fake-{i}" for i in range(100)
+    )
+    # 同一时刻最多 3 个 classify_intent 加 2 个 draft_response 在调用模型
+    assert 1 < fake_llm.peak <= 5
+    stats = runner.stats()
+    assert stats["emails"] == 100
+    assert stats["failed"] == 0
+    assert stats["nodes"]["classify_intent"]["calls"] == 100
+    assert stats["nodes"]["classify_intent"]["wait_seconds"] > 0
+    assert "吞吐量" in runner.report()
+
+
+def test_parked_emails_can_be_resumed(fake_llm):
+    runner = BatchTriageRunner(max_in_flight=4)
+    emails = [
+        {"email_id": "a", "email_content": "How do I reset my password?"},
+        {"email_id": "b", "email_content": "I was charged twice!"},
+        {"email_id": "c"},
+    ]
+    results = {r.email_id: r for r in run(runner, emails)}
+    assert results["a"].status == "completed"
+    assert results["a"].draft_response == fake_llm.reply
+    assert results["b"].status == "parked"
+    assert results["b"].interrupt["intent"] == "billing"
+    assert results["c"].status == "failed"
+    assert list(runner.parked) == ["b"]
+
+    resumed = asyncio.run(
+        runner.resume("b", {"approved": True, "edited_response": "Refunded."})
+    )
+    runner.close()
+    assert resumed.status == "completed"
+    assert resumed.draft_response == "Refunded."
+    assert runner.parked == {}
+    assert runner.counts == {"completed": 2, "parked": 0, "failed": 1}
+    with pytest.raises(KeyError):
+        asyncio.run(runner.resume("b", {"approved": True}))
+
+
+def test_resume_after_restart(fake_llm, tmp_path):
+    from sqlite_checkpointer import SQLiteSaver
+
+    path = str(tmp_path / "triage.sqlite")
+    email = {"email_id": "b", "email_content": "I was charged twice!"}
+    with SQLiteSaver(path) as saver:
+        runner = BatchTriageRunner(checkpointer=saver)
+        assert [r.status for r in run(runner, [email])] == ["parked"]
+        runner.close()
+
+    with SQLiteSaver(path) as saver:
+        runner = BatchTriageRunner(checkpointer=saver)
+        decision = {"approved": True, "edited_response": "Refunded."}
+        resumed = asyncio.run(runner.resume("b", decision))
+        runner.close()
+    assert resumed.status == "completed"
+    assert resumed.draft_response == "Refunded."
@@ -0,0 +1,170 @@
+# 2026/10/18
+# zhangzhong
+# graph_profiler 的测试
+
+from typing import Any, Dict
+import asyncio
+import json
+import operator
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, RetryPolicy, interrupt
+from typing_extensions import Annotated, TypedDict
+
+from learn_langgraph.graph_profiler import GraphProfiler
+
+
+class State(TypedDict):
+    values: Annotated[list, operator.add]
+
+
+def build_graph() -> StateGraph:
+    """a 调用模型后同时转到 b 和 c，b 前两次失败由 RetryPolicy 重试"""
+    model = GenericFakeChatModel(
+        messages=iter(
+            AIMessage(
+                content="hi",
+                usage_metadata={
+                    "input_tokens": 5,
+                    "output_tokens": 2,
+                    "total_tokens": 7,
+                },
+            )
+            for _ in range(10)
+        )
+    )
+    attempts = {"b": 0}
+
+    def a(state: State) -> Dict[str, Any]:
+        return {"values": [model.invoke("hello").content]}
+
+    def b(state: State) -> Dict[str, Any]:
+        attempts["b"] += 1
+        time.sleep(0.02)
+        if attempts["b"] < 3:
+            raise ValueError("flaky")
+        return {"values": ["b"]}
+
+    def c(state: State) -> Dict[str, Any]:
+        return {"values": ["c"]}
+
+    builder = StateGraph(State)
+    builder.add_node("a", a)
+    builder.add_node(
+        "b",
+        b,
+        retry_policy=RetryPolicy(
+            max_attempts=3, initial_interval=0.001, jitter=False, retry_on=ValueError
+        ),
+    )
+    builder.add_node("c", c)
+    builder.add_edge(START, "a")
+    builder.add_conditional_edges("a", lambda state: ["b", "c"], ["b", "c"])
+    builder.add_edge("b", END)
+    builder.add_edge("c", END)
+    return builder
+
+
+def test_nodes_tokens_retries_and_checkpoints():
+    app = build_graph().compile(checkpointer=MemorySaver())
+    profiler = GraphProfiler()
+    profiled = profiler.attach(app)
+    config = {"configurable": {"thread_id": "1"}}
+    assert profiled.invoke({"values": []}, config) == {"values": ["hi", "b", "c"]}
+
+    rows = {row["node"]: row for row in profiler.rows()}
+    # 路由函数不算节点调用
+    assert set(rows) == {"a", "b", "c"}
+    assert rows["a"]["llm_calls"] == 1
+    assert (rows["a"]["input_tokens"], rows["a"]["output_tokens"]) == (5, 2)
+    assert rows["b"]["calls"] == 3
+    assert rows["b"]["errors"] == 2
+    assert profiler.retries() == {"b": 2}
+    assert rows["b"]["wall"] >= 0.06
+
+    # b 和 c 在同一个 superstep，c 等 b 重试结束
+    steps = profiler.supersteps()
+    assert [step.tasks for step in steps] == [1, 2]
+    assert steps[1].wait >= 0.05
+
+    assert any(span.name == "checkpoint.put" for span in profiler.spans)
+    # 原来的图不受影响，两者共用存储
+    assert not hasattr(app.checkpointer.put, "__wrapped__")
+    assert app.get_state(config).values == {"values": ["hi", "b", "c"]}
+
+
+def test_report_sorting():
+    profiler = GraphProfiler()
+    profiler.attach(build_graph().compile()).invoke({"values": []})
+    assert profiler.rows(sort_by="wall")[0]["node"] == "b"
+    names = [row["node"] for row in profiler.rows(sort_by="node", descending=False)]
+    assert names == ["a", "b", "c"]
+    assert profiler.report(sort_by="calls").splitlines()[1].startswith("b")
+    with pytest.raises(ValueError):
+        profiler.rows(sort_by="bogus")
+
+
+def test_async_invoke():
+    profiler = GraphProfiler()
+    app = profiler.attach(build_graph().compile())
+    asyncio.run(app.ainvoke({"values": []}))
+    assert profiler.retries() == {"b": 2}
+    assert all(run.end is not None for run in profiler.runs)
+
+
+def test_subgraph_and_interrupt():
+    class Counter(TypedDict):
+        x: int
+
+    inner = StateGraph(Counter)
+    inner.add_node("inner", lambda state: {"x": state["x"] + 1})
+    inner.add_edge(START, "inner")
+    inner.add_edge("inner", END)
+
+    def ask(state: Counter) -> Dict[str, Any]:
+        return {"x": interrupt("value?")}
+
+    builder = StateGraph(Counter)
+    builder.add_node("sub", inner.compile())
+    builder.add_node("ask", ask)
+    builder.add_edge(START, "sub")
+    builder.add_edge("sub", "ask")
+    builder.add_edge("ask", END)
+
+    profiler = GraphProfiler()
+    app = profiler.attach(builder.compile(checkpointer=MemorySaver()))
+    config = {"configurable": {"thread_id": "1"}}
+    app.invoke({"x": 1}, config)
+    assert app.invoke(Command(resume=5), config) == {"x": 5}
+
+    statuses = [(run.node, run.status) for run in profiler.runs]
+    assert statuses == [
+        ("sub", "ok"),
+        ("sub/inner", "ok"),
+        ("ask", "interrupted"),
+        ("ask", "ok"),
+    ]
+    # interrupt 后恢复不算重试
+    assert profiler.retries() == {}
+
+
+def test_chrome_trace(tmp_path):
+    profiler = GraphProfiler()
+    profiler.attach(build_graph().compile(checkpointer=MemorySaver())).invoke(
+        {"values": []}, {"configurable": {"thread_id": "1"}}
+    )
+    path = tmp_path / "trace.json"
+    profiler.write_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    categories = {event.get("cat") for event in events}
+    assert {"node", "checkpoint", "superstep"} <= categories
+    for event in events:
+        if event["ph"] == "X":
+            assert event["ts"] >= 0 and event["dur"] >= 0
+    node_events = [event for event in events if event.get("cat") == "node"]
+    assert sorted(event["name"] for event in node_events) == ["a", "b", "b", "b", "c"]
@@ -0,0 +1,111 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from learn_langgraph.history_manager import (
+    HistoryManager,
+    Tokenizer,
+    group_units,
+    truncating_summarizer,
+)
+
+SYSTEM = SystemMessage(content="You are a helpful assistant doing arithmetic.")
+CONFIG = {"configurable": {"thread_id": "t1"}}
+
+
+def tool_turn(i):
+    call = {"name": "add", "args": {"a": i, "b": i}, "id": f"call-{i}"}
+    return [
+        AIMessage(content=f"Step {i}: adding numbers", tool_calls=[call]),
+        ToolMessage(content=str(2 * i) * 20, tool_call_id=f"call-{i}"),
+    ]
+
+
+def test_group_units_keeps_tool_calls_with_results():
+    messages = [HumanMessage(content="hi"), *tool_turn(1), AIMessage(content="done")]
+    units = group_units(messages)
+    assert [len(unit) for unit in units] == [1, 2, 1]
+
+
+def test_prompt_stays_within_budget_and_summary_is_incremental():
+    summarized = []
+    summarize = truncating_summarizer(max_chars=400)
+
+    def summarizer(previous, messages):
+        summarized.extend(messages)
+        return summarize(previous, messages)
+
+    tokenizer = Tokenizer()
+    history = HistoryManager(budget=300, summarizer=summarizer, tokenizer=tokenizer)
+    messages = [HumanMessage(content="Add all the numbers from 1 to 60.")]
+    for i in range(60):
+        prompt = history.prepare(SYSTEM, messages, CONFIG)
+        assert sum(tokenizer.message_tokens(m) for m in prompt) <= 300
+        assert prompt[0] is SYSTEM
+        assert prompt[1] is messages[0]
+        # 每个 ToolMessage 前面都有它的 tool call
+        call_ids = set()
+        for message in prompt:
+            if isinstance(message, AIMessage):
+                call_ids.update(call["id"] for call in message.tool_calls)
+            if isinstance(message, ToolMessage):
+                assert message.tool_call_id in call_ids
+        assert prompt[-1] is messages[-1]
+        messages.extend(tool_turn(i))
+
+    # 每条消息最多被摘要一次，摘要不重复处理整个历史
+    assert len(summarized) == len({id(m) for m in summarized})
+    assert history.threads["t1"].folded == 1 + len(summarized)
+    assert "Summary of the earlier conversation" in prompt[2].content
+
+    stats = history.stats("t1")
+    assert stats["calls"] == 60
+    assert stats["tokens_saved"] > stats["tokens_sent"]
+    assert history.stats()["t1"] == stats
+
+
+def test_short_history_is_sent_verbatim():
+    history = HistoryManager(budget=4000)
+    messages = [HumanMessage(content="Add 3 and 4."), *tool_turn(3)]
+    prompt = history.prepare(SYSTEM, messages, CONFIG)
+    assert prompt == [SYSTEM, *messages]
+    assert history.stats("t1")["tokens_saved"] == 0
+
+
+def conversation(topic, turns):
+    messages = [HumanMessage(content=f"Task about {topic}.")]
+    for i in range(turns):
+        messages.append(AIMessage(content=f"{topic} step {i}"))
+        messages.append(HumanMessage(content=f"{topic} reply {i}"))
+    return messages
+
+
+def test_different_conversations_without_thread_id_do_not_share_summary():
+    summarized = []
+    summarize = truncating_summarizer()
+
+    def summarizer(previous, messages):
+        summarized.extend(messages)
+        return summarize(previous, messages)
+
+    history = HistoryManager(budget=60, summarizer=summarizer)
+    first = conversation("secret alpha", 5)
+    history.prepare(SYSTEM, first)
+    assert history.threads[""].summary
+
+    summarized.clear()
+    second = conversation("beta", 6)
+    prompt = history.prepare(SYSTEM, second)
+    assert all("alpha" not in str(m.content) for m in prompt)
+    # 第二段对话的每条消息要么原样发送，要么折叠进了摘要
+    sent = {id(m) for m in prompt} | {id(m) for m in summarized}
+    assert all(id(m) in sent for m in second)
+
+
+def test_fork_from_earlier_checkpoint_starts_over():
+    history = HistoryManager(budget=60)
+    messages = conversation("gamma", 6)
+    history.prepare(SYSTEM, messages, CONFIG)
+    # 从较早的 checkpoint 分叉出不同的后续，长度不变
+    forked = messages[:3] + conversation("delta", 6)[3:]
+    prompt = history.prepare(SYSTEM, forked, CONFIG)
+    assert all("gamma step 2" not in str(m.content) for m in prompt)
+    assert history.threads["t1"].last_folded is forked[history.threads["t1"].folded - 1]
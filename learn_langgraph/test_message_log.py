@@ -0,0 +1,195 @@
+# 2026/10/18
+# zhangzhong
+# message_log 的测试
+
+from typing import Any, Dict
+import operator
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import Annotated, TypedDict
+
+from learn_langgraph.message_log import (
+    CHUNK_SIZE,
+    DeltaSerializer,
+    MessageLog,
+    SQLiteChunkStore,
+    append_messages,
+    message_log_serde,
+)
+from sqlite_checkpointer import SQLiteSaver
+
+
+def human(i: int) -> HumanMessage:
+    return HumanMessage(content=f"message {i}", id=str(i))
+
+
+def test_append_shares_storage():
+    log = MessageLog([human(0)])
+    longer = log.append(human(1))
+    assert len(log) == 1 and len(longer) == 2
+    assert longer._store is log._store
+    assert longer[-1] == human(1)
+    assert log[-1] == human(0)
+    assert list(log) == [human(0)]
+    assert longer[:] == [human(0), human(1)]
+    assert longer[1:] == [human(1)]
+
+
+def test_append_to_older_version_branches():
+    base = MessageLog([human(0)])
+    a = base.append(human(1))
+    b = base.append(human(2))
+    assert b._store is not base._store
+    assert list(a) == [human(0), human(1)]
+    assert list(b) == [human(0), human(2)]
+    assert list(base) == [human(0)]
+
+
+def test_list_interop():
+    log = MessageLog([human(0), human(1)])
+    assert log == [human(0), human(1)]
+    assert [human(9)] + log == [human(9), human(0), human(1)]
+    assert isinstance(log + [human(2)], MessageLog)
+
+
+def test_reducer_matches_operator_add():
+    left = [human(0)]
+    right = [human(1), human(2)]
+    assert append_messages(left, right) == operator.add(left, right)
+    assert append_messages(None, human(0)) == [human(0)]
+    log = append_messages(MessageLog(), right)
+    assert isinstance(log, MessageLog) and len(log) == 2
+
+
+class State(TypedDict):
+    messages: Annotated[MessageLog, append_messages]
+
+
+def agent_loop(steps: int):
+    def agent(state: State) -> Dict[str, Any]:
+        i = len(state["messages"])
+        call = {"name": "add", "args": {"a": i, "b": 1}, "id": f"call-{i}"}
+        return {"messages": [AIMessage(content="", tool_calls=[call])]}
+
+    def tool(state: State) -> Dict[str, Any]:
+        call = state["messages"][-1].tool_calls[0]
+        result = call["args"]["a"] + call["args"]["b"]
+        return {"messages": [ToolMessage(content=str(result), tool_call_id=call["id"])]}
+
+    def should_continue(state: State) -> str:
+        return "tool" if len(state["messages"]) < steps else END
+
+    builder = StateGraph(State)
+    builder.add_node("agent", agent)
+    builder.add_node("tool", tool)
+    builder.add_edge(START, "agent")
+    builder.add_conditional_edges("agent", should_continue, ["tool", END])
+    builder.add_edge("tool", "agent")
+    return builder
+
+
+def test_message_log_serde_restores_message_log(caplog):
+    app = agent_loop(10).compile(checkpointer=MemorySaver(serde=message_log_serde()))
+    config = {"configurable": {"thread_id": "1"}}
+    result = app.invoke({"messages": [HumanMessage(content="go")]}, config)
+    restored = app.get_state(config).values["messages"]
+    assert isinstance(restored, MessageLog)
+    assert restored == result["messages"]
+    assert "unregistered" not in caplog.text
+
+    # LANGGRAPH_STRICT_MSGPACK=true 时默认的 serde 不允许 MessageLog，恢复成 dict
+    log = MessageLog(human(i) for i in range(3))
+    strict = JsonPlusSerializer(allowed_msgpack_modules=None)
+    assert not isinstance(strict.loads_typed(strict.dumps_typed(log)), MessageLog)
+    serde = message_log_serde()
+    assert serde.loads_typed(serde.dumps_typed(log)) == log
+
+
+def test_graph_with_delta_serializer():
+    serde = DeltaSerializer()
+    app = agent_loop(2 * CHUNK_SIZE + 10).compile(checkpointer=MemorySaver(serde=serde))
+    config = {"configurable": {"thread_id": "1"}, "recursion_limit": 10_000}
+    result = app.invoke({"messages": [HumanMessage(content="go")]}, config)
+    assert isinstance(result["messages"], MessageLog)
+
+    restored = app.get_state(config).values["messages"]
+    assert isinstance(restored, MessageLog)
+    assert restored == result["messages"]
+    # 每个写满的块只保存一次
+    assert len(serde.chunks) == 2
+
+    # 从较早的 checkpoint 恢复的也是完整的历史
+    history = list(app.get_state_history(config))
+    older = history[len(history) // 2].values["messages"]
+    assert older == result["messages"][: len(older)]
+
+
+def test_delta_checkpoint_is_small():
+    log = MessageLog(human(i) for i in range(4 * CHUNK_SIZE + 3))
+    serde = DeltaSerializer()
+    _, delta = serde.dumps_typed(log)
+    _, full = serde.inner.dumps_typed(log)
+    assert len(delta) < len(full) / 20
+    assert serde.loads_typed(serde.dumps_typed(log)) == log
+
+
+def test_chunks_survive_restart_with_sqlite_saver(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "1"}, "recursion_limit": 10_000}
+    with SQLiteSaver(path, serde=DeltaSerializer()) as saver:
+        assert isinstance(saver.serde.chunks, SQLiteChunkStore)
+        app = agent_loop(2 * CHUNK_SIZE + 10).compile(checkpointer=saver)
+        result = app.invoke({"messages": [HumanMessage(content="go")]}, config)
+
+    # 重启：新的进程里只有数据库文件
+    with SQLiteSaver(path, serde=DeltaSerializer()) as saver:
+        app = agent_loop(2 * CHUNK_SIZE + 10).compile(checkpointer=saver)
+        assert app.get_state(config).values["messages"] == result["messages"]
+
+
+def test_compact_sweeps_unreferenced_chunks(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    serde = DeltaSerializer()
+    with SQLiteSaver(path, serde=serde) as saver:
+        app = agent_loop(2 * CHUNK_SIZE + 10).compile(checkpointer=saver)
+        for thread_id, first in [("1", "go"), ("2", "start")]:
+            config = {
+                "configurable": {"thread_id": thread_id},
+                "recursion_limit": 10_000,
+            }
+            app.invoke({"messages": [HumanMessage(content=first)]}, config)
+        # 第二个块两个 thread 相同，只存一份
+        assert len(serde.chunks) == 3
+
+        saver.delete_thread("1")
+        saver.compact()
+        assert len(serde.chunks) == 3  # 刚写入的块要等到下一次
+        saver.compact()
+        # 只删除 thread 1 独有的块
+        assert len(serde.chunks) == 2
+        config = {"configurable": {"thread_id": "2"}}
+        assert len(app.get_state(config).values["messages"]) == 2 * CHUNK_SIZE + 10
+
+        saver.prune(["2"], strategy="delete")
+        assert len(serde.chunks) == 0
+
+
+def test_sweep_keeps_chunk_reused_during_sweep():
+    serde = DeltaSerializer()
+    log = MessageLog(human(i) for i in range(CHUNK_SIZE))
+    serde.dumps_typed(log)
+    serde.sweep([])
+    (key,) = serde.chunks
+    saved = []
+
+    def blobs():
+        # 扫描期间另一个 thread 保存了内容相同的消息，这个块已经存在，不会再写一次
+        saved.append(serde.dumps_typed(MessageLog(log)))
+        yield from []
+
+    assert serde.sweep(blobs()) == 0
+    assert key in serde.chunks
+    assert serde.loads_typed(saved[0]) == log
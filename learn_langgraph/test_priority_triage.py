@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from fake_chat_model import FakeEmailModel
+from learn_langgraph import email_agent
+from learn_langgraph.priority_triage import (
+    PrioritySemaphore,
+    PriorityTriageRunner,
+    pre_score,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_pre_score():
+    assert pre_score({"email_content": "URGENT: the site is down"}) == "critical"
+    assert pre_score({"email_content": "I was charged twice"}) == "high"
+    assert pre_score({"email_content": "Export crashes on PDF"}) == "medium"
+    assert pre_score({"email_content": "Can you add dark mode?"}) == "low"
+
+
+def test_semaphore_prefers_urgent_and_ages_waiters():
+    clock = FakeClock()
+    semaphore = PrioritySemaphore(1, aging=10.0, clock=clock)
+    order = []
+
+    async def worker(name, urgency):
+        async with semaphore.slot(urgency):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await semaphore.acquire("low")
+        tasks = [asyncio.create_task(worker("low", "low"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("critical", "critical")))
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+        assert order == ["critical", "low"]
+
+        # low 等了 4 个 aging 周期，比新到的 critical 先拿到名额
+        order.clear()
+        await semaphore.acquire("low")
+        tasks = [asyncio.create_task(worker("low", "low"))]
+        await asyncio.sleep(0)
+        clock.now += 40
+        tasks.append(asyncio.create_task(worker("critical", "critical")))
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["low", "critical"]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    model = FakeEmailModel(delay=0.005)
+    monkeypatch.setattr(email_agent, "llm", model)
+    return model
+
+
+def test_critical_emails_skip_the_queue(fake_llm):
+    # 先到 40 封 low 的功能建议，最后才是 5 封紧急的账单邮件
+    emails = [
+        {"email_id": f"low-{i}", "email_content": "Can you add dark mode?"}
+        for i in range(40)
+    ] + [
+        {"email_id": f"critical-{i}", "email_content": "Charged twice! Urgent!"}
+        for i in range(5)
+    ]
+    runner = PriorityTriageRunner(
+        {"classify_intent": 1, "draft_response": 1},
+        max_in_flight=4,
+        aging=None,
+        slo={"critical": 1.0},
+    )
+
+    async def collect():
+        return [result async for result in runner.run(emails)]
+
+    results = asyncio.run(collect())
+    runner.close()
+
+    order = [r.email_id for r in results]
+    assert max(order.index(f"critical-{i}") for i in range(5)) < 12
+    stats = runner.stats()["priorities"]
+    assert stats["critical"]["emails"] == 5
+    assert stats["low"]["emails"] == 40
+    assert stats["critical"]["wait_p95"] < stats["low"]["wait_p50"]
+    assert stats["critical"]["slo_met"] == 1.0
+    assert "critical" in runner.report()
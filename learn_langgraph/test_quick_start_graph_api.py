@@ -39,12 +39,19 @@
 import os
 from langchain.tools import tool
 from langchain_openai import ChatOpenAI
-from langchain.messages import AnyMessage, SystemMessage, ToolMessage
+from langchain.messages import SystemMessage
 from typing_extensions import TypedDict, Annotated
-import operator
 from typing import Literal
 from langgraph.graph import StateGraph, START, END
 
+from langchain_core.runnables import RunnableConfig
+
+from learn_langgraph.graph_profiler import GraphProfiler
+from learn_langgraph.history_manager import HistoryManager
+from learn_langgraph.message_log import MessageLog, append_messages
+from learn_langgraph.tool_cache import ToolCache, memoize
+from learn_langgraph.tool_executor import ToolExecutor
+
 api_key = os.environ["BIGMODEL_API_KEY"]
 
 
@@ -56,7 +63,12 @@ model = ChatOpenAI(
 )
 
 
+# 三个工具都是纯函数，同样的参数直接返回缓存的结果，tool_node 命中时不会调用工具
+tool_cache = ToolCache(max_entries=1024)
+
+
 # Define tools
+@memoize(tool_cache)
 @tool
 def multiply(a: int, b: int) -> int:
     """Multiply `a` and `b`.
@@ -68,6 +80,7 @@ def multiply(a: int, b: int) -> int:
     return a * b
 
 
+@memoize(tool_cache)
 @tool
 def add(a: int, b: int) -> int:
     """Adds `a` and `b`.
@@ -79,6 +92,7 @@ def add(a: int, b: int) -> int:
     return a + b
 
 
+@memoize(tool_cache)
 @tool
 def divide(a: int, b: int) -> float:
     """Divide `a` and `b`.
@@ -94,6 +108,8 @@ def divide(a: int, b: int) -> float:
 tools = [add, multiply, divide]
 tools_by_name = {tool.name: tool for tool in tools}
 model_with_tools = model.bind_tools(tools)
+# 同一轮的多个 tool call 并发执行，单个调用最多等 10 秒
+tool_executor = ToolExecutor(tools, timeout=10.0)
 
 
 ## 2. Define state
@@ -118,29 +134,30 @@ model_with_tools = model.bind_tools(tools)
 
 
 # only support TypedDict? no, it also support pydantic model, let's use it!
+# messages: Annotated[list[AnyMessage], operator.add] 每次更新都拷贝全部历史，
+# MessageLog 共享已有的消息，追加是 O(1)
 class MessagesState(TypedDict):
-    messages: Annotated[list[AnyMessage], operator.add]
+    messages: Annotated[MessageLog, append_messages]
     llm_calls: int
 
 
 ## 3. Define model node
 # The model node is used to call the LLM and decide whether to call a tool or not.
-def llm_call(state: dict):
+system_message = SystemMessage(
+    content="You are a helpful assistant tasked with performing arithmetic on a set of inputs."
+)
+# 原来每次都加上所有的历史消息，长会话的提示词越来越长；
+# 现在只原样保留最近的几轮，更早的折叠成摘要，每次不超过 4000 个 token
+history = HistoryManager(budget=4000)
+
+
+def llm_call(state: dict, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
 
+    messages = history.prepare(system_message, state["messages"], config)
     # shared state get partial update
     return {
-        "messages": [
-            model_with_tools.invoke(
-                [
-                    SystemMessage(
-                        content="You are a helpful assistant tasked with performing arithmetic on a set of inputs."
-                    )
-                ]
-                # 这里加上了所有的历史消息
-                + state["messages"]
-            )
-        ],
+        "messages": [model_with_tools.invoke(messages)],
         "llm_calls": state.get("llm_calls", 0) + 1,
     }
 
@@ -150,11 +167,8 @@ def llm_call(state: dict):
 def tool_node(state: dict):
     """Performs the tool call"""
 
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
+    # 所有 tool call 同时执行，ToolMessage 的顺序与 tool_calls 相同，超时的调用返回错误信息
+    result = tool_executor.run(state["messages"][-1].tool_calls)
     # partial state update
     return {"messages": result}
 
@@ -203,6 +217,10 @@ display(Image(agent.get_graph(xray=True).draw_mermaid_png()))
 from langchain.messages import HumanMessage
 
 messages = [HumanMessage(content="Add 3 and 4.")]
-messages = agent.invoke({"messages": messages})
+# 记录每个节点的耗时和 token，结果可以在 chrome://tracing 中查看
+profiler = GraphProfiler()
+messages = profiler.attach(agent).invoke({"messages": messages})
 for m in messages["messages"]:
     m.pretty_print()
+print(profiler.report())
+profiler.write_trace("quick_start_trace.json")
@@ -0,0 +1,110 @@
+import asyncio
+
+from langchain_core.tools import tool
+
+from learn_langgraph.tool_cache import ToolCache, cache_for, memoize
+from learn_langgraph.tool_executor import ToolExecutor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tools(cache, calls):
+    @memoize(cache)
+    @tool
+    def multiply(a: int, b: int) -> int:
+        """Multiply `a` and `b`."""
+        calls.append(("multiply", a, b))
+        return a * b
+
+    @memoize(cache, ttl=10)
+    @tool
+    async def add(a: int, b: int) -> int:
+        """Adds `a` and `b`."""
+        calls.append(("add", a, b))
+        return a + b
+
+    @tool
+    def now() -> str:
+        """Not cacheable."""
+        calls.append(("now",))
+        return "now"
+
+    return multiply, add, now
+
+
+def test_memoize_keys_on_canonical_args_and_expires():
+    clock = FakeClock()
+    cache = ToolCache(max_entries=2, clock=clock)
+    calls = []
+    multiply, add, now = make_tools(cache, calls)
+
+    assert multiply.invoke({"a": 3, "b": 4}) == 12
+    assert multiply.invoke({"b": "4", "a": "3"}) == 12
+    assert calls == [("multiply", 3, 4)]
+    assert cache_for(multiply) is cache and cache_for(now) is None
+    assert multiply.metadata["cacheable"]
+
+    assert asyncio.run(add.ainvoke({"a": 1, "b": 2})) == 3
+    clock.now += 5
+    assert asyncio.run(add.ainvoke({"a": 1, "b": 2})) == 3
+    clock.now += 10
+    assert asyncio.run(add.ainvoke({"a": 1, "b": 2})) == 3
+    assert calls.count(("add", 1, 2)) == 2
+
+    now.invoke({})
+    now.invoke({})
+    assert calls.count(("now",)) == 2
+
+    multiply.invoke({"a": 5, "b": 6})
+    multiply.invoke({"a": 7, "b": 8})
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] >= 1
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 5
+
+
+def test_disk_tier_is_shared(tmp_path):
+    path = str(tmp_path / "tools.sqlite")
+    first_calls, second_calls = [], []
+    first = ToolCache(path=path)
+    multiply, _, _ = make_tools(first, first_calls)
+    assert multiply.invoke({"a": 2, "b": 3}) == 6
+    first.close()
+
+    # 另一个进程（新的 ToolCache 和工具）从 SQLite 中读到结果
+    second = ToolCache(path=path)
+    multiply, _, _ = make_tools(second, second_calls)
+    assert multiply.invoke({"a": 2, "b": 3}) == 6
+    assert second_calls == []
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_executor_serves_hits_without_dispatching():
+    cache = ToolCache()
+    calls = []
+    tools = make_tools(cache, calls)
+    executor = ToolExecutor(tools)
+    tool_calls = [
+        {"name": "multiply", "args": {"a": 3, "b": 4}, "id": "call-0"},
+        {"name": "add", "args": {"a": 1, "b": 2}, "id": "call-1"},
+    ]
+    executor.run(tool_calls)
+    executor._pool.shutdown(wait=True)
+    executor._pool = None  # 再提交到线程池就会失败
+
+    messages = executor.run(tool_calls)
+    assert [m.content for m in messages] == ["12", "3"]
+    messages = asyncio.run(executor.arun(tool_calls))
+    assert [m.content for m in messages] == ["12", "3"]
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 4
+    assert cache.stats()["misses"] == 2
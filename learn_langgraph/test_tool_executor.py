@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from langchain_core.tools import tool
+
+from learn_langgraph.tool_executor import ToolExecutor
+
+
+@tool
+def slow_add(a: int, b: int) -> int:
+    """Adds `a` and `b` slowly."""
+    time.sleep(0.2)
+    return a + b
+
+
+@tool
+async def slow_multiply(a: int, b: int) -> int:
+    """Multiplies `a` and `b` slowly."""
+    await asyncio.sleep(0.2)
+    return a * b
+
+
+@tool
+def hang(seconds: float) -> str:
+    """Sleeps for `seconds`."""
+    time.sleep(seconds)
+    return "done"
+
+
+def calls():
+    return [
+        {"name": "slow_add", "args": {"a": 1, "b": 2}, "id": "call-0"},
+        {"name": "slow_multiply", "args": {"a": 3, "b": 4}, "id": "call-1"},
+        {"name": "slow_add", "args": {"a": 5, "b": 6}, "id": "call-2"},
+        {"name": "missing", "args": {}, "id": "call-3"},
+        {"name": "hang", "args": {"seconds": 2}, "id": "call-4"},
+    ]
+
+
+def check(messages, elapsed):
+    # 三个 0.2s 的调用同时执行，hang 在 0.3s 时超时
+    assert elapsed < 0.6
+    assert [m.tool_call_id for m in messages] == [f"call-{i}" for i in range(5)]
+    assert [m.content for m in messages[:3]] == ["3", "12", "11"]
+    assert messages[3].status == "error"
+    assert "unknown tool" in messages[3].content
+    assert messages[4].status == "error"
+    assert "timed out after 0.3s" in messages[4].content
+
+
+def test_run_executes_calls_concurrently():
+    executor = ToolExecutor(
+        [slow_add, slow_multiply, hang], timeout=5, timeouts={"hang": 0.3}
+    )
+    start = time.perf_counter()
+    messages = executor.run(calls())
+    check(messages, time.perf_counter() - start)
+    executor.close()
+
+
+def test_arun_executes_calls_concurrently():
+    executor = ToolExecutor(
+        [slow_add, slow_multiply, hang], timeout=5, timeouts={"hang": 0.3}
+    )
+    start = time.perf_counter()
+    messages = asyncio.run(executor.arun(calls()))
+    check(messages, time.perf_counter() - start)
+    executor.close()
@@ -0,0 +1,275 @@
+# 2026/10/18
+# zhangzhong
+# 确定性工具的结果缓存：同样的工具和参数不再重复执行
+
+"""
+add/multiply/divide 这样的工具是纯函数，agent 在不同轮次、不同 thread 里会反复发出同样的调用，
+生产环境中对应的工具往往要访问很慢的后端。
+
+用法（只有加了 memoize 的工具才缓存，其他工具不受影响）:
+    tool_cache = ToolCache(max_entries=1024, path="tool_cache.sqlite")
+
+    @memoize(tool_cache, ttl=3600)
+    @tool
+    def multiply(a: int, b: int) -> int: ...
+
+    - 键为工具名加规范化的参数：先用工具的 args_schema 校验（"3" 和 3 是同一个参数），
+      再按参数名排序序列化为 JSON，取 sha1
+    - 内存中按 LRU 淘汰（max_entries），每个条目可以有过期时间（ttl，默认用 ToolCache 的）
+    - path 不为 None 时还有一层 SQLite 缓存，多个进程可以共用；
+      内存未命中时查 SQLite，命中后放回内存。结果不能序列化为 JSON 时只缓存在内存中
+    - 工具抛出的异常不缓存
+    - stats() 给出命中、未命中、淘汰、过期的次数
+ToolExecutor 在提交到线程池之前先查缓存，命中时直接生成 ToolMessage，不调用工具；
+直接 tool.invoke 时由 memoize 包装的函数查缓存。
+"""
+
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from collections import OrderedDict
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from langchain_core.tools import BaseTool
+
+# 缓存未命中，与值为 None 的结果区分开
+MISS = object()
+
+
+class CachedResult(NamedTuple):
+    value: Any
+    expires: Optional[float]
+
+
+def schema_fields(tool: BaseTool) -> Optional[set]:
+    schema = tool.args_schema
+    fields = getattr(schema, "model_fields", None)
+    return set(fields) if fields is not None else None
+
+
+def validated_args(tool: BaseTool, args: Dict[str, Any]) -> Dict[str, Any]:
+    """与工具执行时相同的参数：按 args_schema 校验和转换类型，只保留调用时给出的参数"""
+    schema = tool.args_schema
+    if not hasattr(schema, "model_validate"):
+        return dict(args)
+    parsed = schema.model_validate(args)
+    return {name: getattr(parsed, name) for name in args if name in schema.model_fields}
+
+
+def cache_key(tool_name: str, args: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        args, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr
+    )
+    return hashlib.sha1(f"{tool_name}\0{canonical}".encode()).hexdigest()
+
+
+class ToolCache:
+    """
+    工具结果缓存，线程安全
+
+    Args:
+        max_entries: 内存中最多缓存的结果数，超过时淘汰最久未用的
+        ttl: 默认的有效期（秒），None 表示不过期
+        path: SQLite 文件，多个进程共用的第二层缓存；None 表示只在内存中
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, expires: Optional[float]) -> bool:
+        return expires is not None and self.clock() > expires
+
+    def _insert(self, key: str, entry: CachedResult) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, key: str) -> Any:
+        row = self._db.execute(
+            "SELECT value, expires FROM tool_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return MISS
+        value, expires = row
+        if self._expired(expires):
+            self._db.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self.expirations += 1
+            return MISS
+        entry = CachedResult(json.loads(value), expires)
+        self._insert(key, entry)
+        self.disk_hits += 1
+        return entry.value
+
+    def get(self, key: str, record_miss: bool = True) -> Any:
+        """
+        查找缓存的结果，未命中时返回 MISS
+
+        Args:
+            record_miss: 未命中时是否计数；ToolExecutor 查不到时会接着调用工具，
+                由工具的包装函数计数，避免同一次调用算两次
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry.expires):
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            value = MISS if self._db is None else self._load(key)
+            if value is not MISS:
+                self.hits += 1
+            elif record_miss:
+                self.misses += 1
+            return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._insert(key, CachedResult(value, expires))
+            if self._db is None:
+                return
+            try:
+                encoded = json.dumps(value, ensure_ascii=False)
+            except (TypeError, ValueError):
+                return  # 只缓存在内存中
+            self._db.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, encoded, expires),
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM tool_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def memoize(
+    cache: ToolCache, ttl: Optional[float] = None
+) -> Callable[[BaseTool], BaseTool]:
+    """
+    把 @tool 创建的工具声明为可缓存的，放在 @tool 的上面
+
+    Args:
+        cache: 结果存放的 ToolCache，可以多个工具共用
+        ttl: 这个工具的结果的有效期，None 表示用 cache.ttl
+    """
+
+    def decorate(tool: BaseTool) -> BaseTool:
+        fields = schema_fields(tool)
+
+        def key_for(kwargs: Dict[str, Any]) -> str:
+            # 只用工具的参数，不包括 LangChain 注入的 config/callbacks
+            if fields is not None:
+                kwargs = {k: v for k, v in kwargs.items() if k in fields}
+            return cache_key(tool.name, kwargs)
+
+        def wrap_sync(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(**kwargs: Any) -> Any:
+                key = key_for(kwargs)
+                value = cache.get(key)
+                if value is MISS:
+                    value = func(**kwargs)
+                    cache.put(key, value, ttl)
+                return value
+
+            wrapper.tool_cache = cache
+            return wrapper
+
+        def wrap_async(func: Callable) -> Callable:
+            @functools.wraps(func)
+            async def wrapper(**kwargs: Any) -> Any:
+                key = key_for(kwargs)
+                value = cache.get(key)
+                if value is MISS:
+                    value = await func(**kwargs)
+                    cache.put(key, value, ttl)
+                return value
+
+            wrapper.tool_cache = cache
+            return wrapper
+
+        if getattr(tool, "func", None) is not None:
+            tool.func = wrap_sync(tool.func)
+        if getattr(tool, "coroutine", None) is not None:
+            tool.coroutine = wrap_async(tool.coroutine)
+        tool.metadata = {**(tool.metadata or {}), "cacheable": True}
+        return tool
+
+    return decorate
+
+
+def cache_for(tool: BaseTool) -> Optional[ToolCache]:
+    """加了 memoize 的工具使用的缓存，其他工具返回 None"""
+    func = getattr(tool, "func", None) or getattr(tool, "coroutine", None)
+    return getattr(func, "tool_cache", None)
+
+
+def lookup(tool: BaseTool, args: Dict[str, Any]) -> Any:
+    """调用工具之前查缓存（ToolExecutor 用），未命中或工具不可缓存时返回 MISS"""
+    cache = cache_for(tool)
+    if cache is None:
+        return MISS
+    try:
+        args = validated_args(tool, args)
+    except ValueError:
+        return MISS  # 参数不合法，交给工具报错
+    return cache.get(cache_key(tool.name, args), record_miss=False)
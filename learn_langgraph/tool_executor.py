@@ -0,0 +1,177 @@
+# 2026/10/18
+# zhangzhong
+# tool_node 用的工具执行器：同一轮的多个 tool call 并发执行
+
+"""
+模型一轮可以发出多个互不依赖的 tool call，逐个 tool.invoke 的延迟是所有调用之和。
+ToolExecutor 同时执行同一轮的所有调用:
+    - run(): 同步节点用，每个调用提交到线程池；同步工具直接 invoke，
+      异步工具（@tool 修饰的 async def）在工作线程里用 asyncio.run(tool.ainvoke(...))
+    - arun(): 异步节点用，异步工具直接 await ainvoke，同步工具放到线程池
+    - 返回的 ToolMessage 与 tool_calls 的顺序相同（即 tool_call_id 的顺序）
+    - 用 tool_cache.memoize 声明为可缓存的工具先查缓存，命中时直接返回，不提交到线程池
+    - 每个工具可以单独设置超时，超时或者工具名不存在时返回 status="error" 的 ToolMessage，
+      模型能看到错误，图不会卡住；工具本身抛出的异常照常抛出
+
+注意：线程不能被强制停止，超时的同步工具会继续占用一个工作线程直到它自己返回，
+max_workers 要留出余量。
+
+用法:
+    executor = ToolExecutor(tools, timeout=10, timeouts={"search": 30})
+    def tool_node(state):
+        return {"messages": executor.run(state["messages"][-1].tool_calls)}
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import asyncio
+import contextvars
+import time
+
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.tools import BaseTool
+
+from learn_langgraph.tool_cache import MISS, lookup
+
+
+def is_async_tool(tool: BaseTool) -> bool:
+    """工具是否有原生的异步实现（否则 ainvoke 只是把 invoke 放到默认线程池）"""
+    # @tool 创建的 StructuredTool 覆盖了 _arun，要看有没有 coroutine
+    if hasattr(tool, "coroutine"):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def error_message(tool_call: ToolCall, content: str) -> ToolMessage:
+    return ToolMessage(
+        content=content,
+        tool_call_id=tool_call["id"],
+        name=tool_call["name"],
+        status="error",
+    )
+
+
+class ToolExecutor:
+    """
+    并发执行一轮 tool call
+
+    Args:
+        tools: 可以调用的工具
+        max_workers: 线程池大小
+        timeout: 每个调用的默认超时（秒），None 表示不限制
+        timeouts: 工具名 -> 超时，覆盖 timeout
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_workers: int = 8,
+        timeout: Optional[float] = 30.0,
+        timeouts: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tool"
+        )
+
+    def timeout_for(self, name: str) -> Optional[float]:
+        return self.timeouts.get(name, self.timeout)
+
+    def _message(self, tool_call: ToolCall, observation: Any) -> ToolMessage:
+        return ToolMessage(
+            content=observation, tool_call_id=tool_call["id"], name=tool_call["name"]
+        )
+
+    def _timed_out(self, tool_call: ToolCall) -> ToolMessage:
+        timeout = self.timeout_for(tool_call["name"])
+        return error_message(
+            tool_call, f"Error: tool {tool_call['name']} timed out after {timeout}s"
+        )
+
+    def _unknown(self, tool_call: ToolCall) -> ToolMessage:
+        return error_message(tool_call, f"Error: unknown tool {tool_call['name']}")
+
+    @staticmethod
+    def _call_sync(tool: BaseTool, args: Dict[str, Any]) -> Any:
+        if is_async_tool(tool):
+            return asyncio.run(tool.ainvoke(args))
+        return tool.invoke(args)
+
+    def run(self, tool_calls: Sequence[ToolCall]) -> List[ToolMessage]:
+        """同步执行，所有调用同时提交到线程池"""
+        start = time.monotonic()
+        futures: List[Any] = []
+        for tool_call in tool_calls:
+            tool = self.tools_by_name.get(tool_call["name"])
+            if tool is None:
+                futures.append(None)
+                continue
+            cached = lookup(tool, tool_call["args"])
+            if cached is not MISS:
+                futures.append(self._message(tool_call, cached))
+                continue
+            # 复制 contextvars，工具里仍能拿到 LangGraph 的配置和回调
+            futures.append(
+                self._pool.submit(
+                    contextvars.copy_context().run,
+                    self._call_sync,
+                    tool,
+                    tool_call["args"],
+                )
+            )
+
+        messages = []
+        for tool_call, future in zip(tool_calls, futures):
+            if future is None:
+                messages.append(self._unknown(tool_call))
+                continue
+            if isinstance(future, ToolMessage):
+                messages.append(future)
+                continue
+            timeout = self.timeout_for(tool_call["name"])
+            # 超时从提交时算起，所有调用共用同一个起点
+            remaining = None if timeout is None else start + timeout - time.monotonic()
+            try:
+                observation = future.result(
+                    timeout=None if remaining is None else max(remaining, 0)
+                )
+            except FutureTimeoutError:
+                future.cancel()
+                messages.append(self._timed_out(tool_call))
+                continue
+            messages.append(self._message(tool_call, observation))
+        return messages
+
+    async def _acall(self, tool_call: ToolCall) -> ToolMessage:
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return self._unknown(tool_call)
+        cached = lookup(tool, tool_call["args"])
+        if cached is not MISS:
+            return self._message(tool_call, cached)
+        if is_async_tool(tool):
+            call = tool.ainvoke(tool_call["args"])
+        else:
+            call = asyncio.get_running_loop().run_in_executor(
+                self._pool,
+                contextvars.copy_context().run,
+                tool.invoke,
+                tool_call["args"],
+            )
+        try:
+            observation = await asyncio.wait_for(
+                call, self.timeout_for(tool_call["name"])
+            )
+        except asyncio.TimeoutError:
+            return self._timed_out(tool_call)
+        return self._message(tool_call, observation)
+
+    async def arun(self, tool_calls: Sequence[ToolCall]) -> List[ToolMessage]:
+        """异步执行，gather 保持 tool_calls 的顺序"""
+        return list(await asyncio.gather(*(self._acall(call) for call in tool_calls)))
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,213 @@
+"""
+紧凑的数组式思维导图树
+
+两种格式都是嵌套的 dict/list，每个前端节点还带着自己的 data 字典，
+百万节点的导图每个节点要占几百字节。这里把树存成:
+    - parent / first_child / next_sibling 三个整数数组（-1 表示没有）
+    - 标题字符串表（相同标题只存一份）和每个节点的标题下标
+    - 每个节点一个字节的标志位
+节点编号就是先序遍历顺序，根节点为 0。
+"""
+
+from typing import Any, Dict, List
+from array import array
+import sys
+
+from mindmap_converter import SMM_VERSION, _strip_html
+
+# 标志位
+HAS_TITLE = 0x01  # 简单格式节点有 title 键
+CHILDREN_LIST = 0x02  # 节点有 children 列表
+EXPAND = 0x04
+RICH_TEXT = 0x08
+IS_ACTIVE = 0x10
+BAD_CHILD = 0x20  # children 中有不是对象的元素（已跳过）
+
+_DEFAULT_FLAGS = EXPAND | RICH_TEXT
+_VALID = HAS_TITLE | CHILDREN_LIST
+
+
+class CompactMindMap:
+    """数组存储的思维导图树"""
+
+    def __init__(self) -> None:
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.title_index = array("i")
+        self.flags = bytearray()
+        self.titles: List[str] = []
+        self._title_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def title(self, node: int) -> str:
+        return self.titles[self.title_index[node]]
+
+    def children(self, node: int) -> List[int]:
+        """节点的子节点编号"""
+        result = []
+        child = self.first_child[node]
+        while child >= 0:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+    def nbytes(self) -> int:
+        """估算占用的内存字节数"""
+        size = sum(
+            sys.getsizeof(part)
+            for part in (
+                self.parent,
+                self.first_child,
+                self.next_sibling,
+                self.title_index,
+                self.flags,
+                self.titles,
+            )
+        )
+        return size + sum(sys.getsizeof(title) for title in self.titles)
+
+    # ---- 加载 ----
+
+    def _intern(self, title: str) -> int:
+        index = self._title_ids.get(title)
+        if index is None:
+            index = len(self.titles)
+            self.titles.append(title)
+            self._title_ids[title] = index
+        return index
+
+    def _add_node(self, parent: int, last_child: array, title: str, flags: int) -> int:
+        node = len(self.flags)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.title_index.append(self._intern(title))
+        self.flags.append(flags)
+        last_child.append(-1)
+        if parent >= 0:
+            previous = last_child[parent]
+            if previous < 0:
+                self.first_child[parent] = node
+            else:
+                self.next_sibling[previous] = node
+            last_child[parent] = node
+        return node
+
+    @classmethod
+    def from_simple(cls, simple_data: Dict[str, Any]) -> "CompactMindMap":
+        """从简单格式加载"""
+        return cls._load(simple_data, frontend=False)
+
+    @classmethod
+    def from_frontend(cls, frontend_data: Dict[str, Any]) -> "CompactMindMap":
+        """从前端格式加载，标题为去掉HTML标签后的文本（同 frontend_to_simple）"""
+        return cls._load(frontend_data, frontend=True)
+
+    @classmethod
+    def _load(cls, data: Dict[str, Any], frontend: bool) -> "CompactMindMap":
+        if not isinstance(data, dict):
+            raise ValueError(f"根节点不是字典类型: {type(data)}")
+
+        tree = cls()
+        last_child = array("i")
+        stack = [(data, -1)]
+        while stack:
+            node_data, parent = stack.pop()
+
+            if frontend:
+                node_fields = node_data.get("data", {})
+                title = _strip_html(node_fields.get("text", ""))
+                flags = HAS_TITLE
+                if node_fields.get("expand", True):
+                    flags |= EXPAND
+                if node_fields.get("richText", True):
+                    flags |= RICH_TEXT
+                if node_fields.get("isActive", False):
+                    flags |= IS_ACTIVE
+            elif "title" in node_data:
+                title = node_data["title"]
+                if not isinstance(title, str):
+                    title = str(title)
+                flags = HAS_TITLE | _DEFAULT_FLAGS
+            else:
+                title = ""
+                flags = _DEFAULT_FLAGS
+
+            children = node_data.get("children")
+            if isinstance(children, list):
+                flags |= CHILDREN_LIST
+                if not all(isinstance(child, dict) for child in children):
+                    flags |= BAD_CHILD
+                    children = [child for child in children if isinstance(child, dict)]
+            else:
+                children = []
+
+            node = tree._add_node(parent, last_child, title, flags)
+            for child in reversed(children):
+                stack.append((child, node))
+
+        tree._title_ids = {}
+        return tree
+
+    # ---- 序列化 ----
+
+    def _build(self, make_node) -> Dict[str, Any]:
+        """按编号逆序构建嵌套字典，子节点总在父节点之前完成"""
+        built: List[Any] = [None] * len(self)
+        for node in range(len(self) - 1, -1, -1):
+            children = []
+            child = self.first_child[node]
+            while child >= 0:
+                children.append(built[child])
+                built[child] = None
+                child = self.next_sibling[child]
+            built[node] = make_node(node, children)
+        return built[0]
+
+    def to_simple(self) -> Dict[str, Any]:
+        """序列化为简单格式"""
+        return self._build(
+            lambda node, children: {"title": self.title(node), "children": children}
+        )
+
+    def to_frontend(self) -> Dict[str, Any]:
+        """序列化为前端格式，结果与 MindMapConverter.simple_to_frontend 一致"""
+
+        def make_node(node: int, children: List[Dict[str, Any]]) -> Dict[str, Any]:
+            flags = self.flags[node]
+            title = self.title(node) if flags & HAS_TITLE else "未命名节点"
+            data = {
+                "text": f"<p>{title}</p>",
+                "expand": bool(flags & EXPAND),
+                "richText": bool(flags & RICH_TEXT),
+                "isActive": bool(flags & IS_ACTIVE),
+            }
+            if node == 0 or (flags & CHILDREN_LIST and not children):
+                data.update(
+                    {"generalization": [], "imgMap": {}, "gradientStyle": False}
+                )
+            return {"data": data, "children": children}
+
+        return {**self._build(make_node), "smmVersion": SMM_VERSION}
+
+    # ---- 直接在紧凑结构上运行的操作 ----
+
+    def validate_simple_format(self) -> bool:
+        """同 MindMapConverter.validate_simple_format：每个节点都有 title 和 children 列表"""
+        return all(
+            flags & _VALID == _VALID and not flags & BAD_CHILD for flags in self.flags
+        )
+
+    def extract_text_content(self) -> str:
+        """同 MindMapConverter.extract_text_content：编号即先序，按编号输出即可"""
+        depth = array("i", bytes(4 * len(self)))
+        lines = []
+        for node in range(len(self)):
+            parent = self.parent[node]
+            if parent >= 0:
+                depth[node] = depth[parent] + 1
+            lines.append(f"{'  ' * depth[node]}{self.title(node)}\n")
+        return "".join(lines)
@@ -1,12 +1,125 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 import logging
 import re
 import json
+import time
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# simple-mind-map 前端版本
+SMM_VERSION = "0.14.0-fix.1"
+
+# 富文本中的HTML标签
+_HTML_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+def _strip_html(text: str) -> str:
+    """移除HTML标签；不含 '<' 的纯文本直接返回，省去一次正则替换"""
+    if isinstance(text, str) and "<" not in text:
+        return text
+    return _HTML_TAG_PATTERN.sub("", text)
+
+
+def _frontend_tree(simple_data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    把简单格式的树转换为前端格式，出错时直接抛出异常
+
+    Returns:
+        Tuple: (前端格式数据, 标题不是字符串的节点数)
+    """
+    non_str_titles = 0
+
+    def convert_node(node_data: Dict[str, Any]) -> Dict[str, Any]:
+        """转换单个节点（不含子节点）"""
+        nonlocal non_str_titles
+        # 获取标题，确保是字符串类型
+        title = node_data.get("title", "未命名节点")
+        if not isinstance(title, str):
+            non_str_titles += 1
+            title = str(title)
+
+        return {
+            "data": {
+                "text": f"<p>{title}</p>",
+                "expand": True,
+                "richText": True,
+                "isActive": False,
+            },
+            "children": [],
+        }
+
+    # 使用显式栈做先序遍历，避免深层树触发 RecursionError
+    # 子节点逆序入栈，保证同一父节点的子节点按原顺序追加
+    roots: List[Dict[str, Any]] = []
+    stack = [(simple_data, roots)]
+    while stack:
+        node_data, siblings = stack.pop()
+        frontend_node = convert_node(node_data)
+        siblings.append(frontend_node)
+
+        # 根节点需要额外的属性
+        if "children" in node_data and isinstance(node_data["children"], list):
+            if len(node_data["children"]) == 0:
+                # 这可能是根节点
+                frontend_node["data"].update(
+                    {"generalization": [], "imgMap": {}, "gradientStyle": False}
+                )
+
+            # 转换子节点
+            for child in reversed(node_data["children"]):
+                stack.append((child, frontend_node["children"]))
+
+    root_node = roots[0]
+
+    # 确保根节点有完整的属性
+    if "generalization" not in root_node["data"]:
+        root_node["data"].update(
+            {"generalization": [], "imgMap": {}, "gradientStyle": False}
+        )
+
+    # 添加版本信息
+    return {**root_node, "smmVersion": SMM_VERSION}, non_str_titles
+
+
+def _convert_batch(
+    direction: str, items: List[Any]
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    在工作进程中转换一批思维导图，不打逐项日志，单项失败只记录该项的错误
+
+    Returns:
+        Tuple: (转换结果列表, 标题不是字符串的节点总数)
+    """
+    results: List[Dict[str, Any]] = []
+    non_str_titles = 0
+    for item in items:
+        try:
+            if direction == "to-simple":
+                results.append(MindMapConverter.frontend_to_simple(item))
+                continue
+
+            # 与 simple_to_frontend 相同的输入检查
+            if not isinstance(item, dict):
+                if not isinstance(item, str):
+                    results.append({"error": "输入数据格式错误"})
+                    continue
+                try:
+                    item = json.loads(item)
+                except json.JSONDecodeError:
+                    results.append({"error": "输入数据格式错误"})
+                    continue
+
+            result, count = _frontend_tree(item)
+            results.append(result)
+            non_str_titles += count
+        except Exception as e:
+            results.append({"error": f"转换失败: {str(e)}"})
+    return results, non_str_titles
+
 
 class MindMapConverter:
     """思维导图格式转换器"""
@@ -22,7 +135,8 @@ class MindMapConverter:
         Returns:
             Dict: 前端格式的思维导图数据
         """
-        logger.info(f"开始转换简单格式到前端格式: 类型={type(simple_data)}")
+        # 单次转换只打 debug 日志，批量转换时按批次汇总
+        logger.debug("开始转换简单格式到前端格式: 类型=%s", type(simple_data))
 
         # 安全检查
         if not isinstance(simple_data, dict):
@@ -37,55 +151,12 @@ class MindMapConverter:
             else:
                 return {"error": "输入数据格式错误"}
 
-        def convert_node(node_data: Dict[str, Any]) -> Dict[str, Any]:
-            """递归转换节点"""
-            # 获取标题，确保是字符串类型
-            title = node_data.get("title", "未命名节点")
-            if not isinstance(title, str):
-                logger.warning(f"节点标题不是字符串类型: {type(title)}")
-                title = str(title)
-
-            frontend_node = {
-                "data": {
-                    "text": f"<p>{title}</p>",
-                    "expand": True,
-                    "richText": True,
-                    "isActive": False,
-                },
-                "children": [],
-            }
-
-            # 根节点需要额外的属性
-            if "children" in node_data and isinstance(node_data["children"], list):
-                if (
-                    len(node_data["children"]) == 0
-                    and "generalization" not in frontend_node["data"]
-                ):
-                    # 这可能是根节点
-                    frontend_node["data"].update(
-                        {"generalization": [], "imgMap": {}, "gradientStyle": False}
-                    )
-
-                # 转换子节点
-                for child in node_data["children"]:
-                    frontend_node["children"].append(convert_node(child))
-
-            return frontend_node
-
         try:
-            # 转换根节点
-            root_node = convert_node(simple_data)
+            result, non_str_titles = _frontend_tree(simple_data)
+            if non_str_titles:
+                logger.warning("节点标题不是字符串类型: %d 个节点", non_str_titles)
 
-            # 确保根节点有完整的属性
-            if "generalization" not in root_node["data"]:
-                root_node["data"].update(
-                    {"generalization": [], "imgMap": {}, "gradientStyle": False}
-                )
-
-            # 添加版本信息
-            result = {**root_node, "smmVersion": "0.14.0-fix.1"}
-
-            logger.info(f"转换完成: 键={list(result.keys())}")
+            logger.debug("转换完成: 键=%s", list(result.keys()))
             return result
         except Exception as e:
             logger.error(f"转换过程中发生错误: {str(e)}")
@@ -106,24 +177,24 @@ class MindMapConverter:
             Dict: 简单格式的思维导图数据
         """
 
-        def convert_node(node_data: Dict[str, Any]) -> Dict[str, Any]:
-            """递归转换节点"""
-            import re
+        roots: List[Dict[str, Any]] = []
+        stack = [(frontend_data, roots)]
+        while stack:
+            node_data, siblings = stack.pop()
 
             # 提取文本内容
             text = node_data.get("data", {}).get("text", "")
-            title = re.sub(r"<[^>]*>", "", text)  # 移除HTML标签
+            title = _strip_html(text)  # 移除HTML标签
 
             simple_node = {"title": title, "children": []}
+            siblings.append(simple_node)
 
             # 转换子节点
             if "children" in node_data and isinstance(node_data["children"], list):
-                for child in node_data["children"]:
-                    simple_node["children"].append(convert_node(child))
+                for child in reversed(node_data["children"]):
+                    stack.append((child, simple_node["children"]))
 
-            return simple_node
-
-        return convert_node(frontend_data)
+        return roots[0]
 
     @staticmethod
     def validate_simple_format(data: Dict[str, Any]) -> bool:
@@ -136,71 +207,215 @@ class MindMapConverter:
         Returns:
             bool: 是否有效
         """
-        if not isinstance(data, dict):
-            return False
+        stack = [data]
+        while stack:
+            node = stack.pop()
 
-        if "title" not in data:
-            return False
+            if not isinstance(node, dict):
+                return False
 
-        if "children" not in data:
-            return False
+            if "title" not in node:
+                return False
 
-        if not isinstance(data["children"], list):
-            return False
+            if "children" not in node:
+                return False
 
-        # 递归验证子节点
-        for child in data["children"]:
-            if not MindMapConverter.validate_simple_format(child):
+            if not isinstance(node["children"], list):
                 return False
 
+            # 子节点入栈继续验证
+            stack.extend(node["children"])
+
         return True
 
     @staticmethod
-    def extract_text_content(mindmap_data: Dict[str, Any]) -> str:
+    def validate_and_convert(
+        simple_data: Dict[str, Any], collect_all: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, str]]]:
         """
-        从思维导图数据中提取所有文本内容
+        一次遍历完成验证和转换，代替先 validate_simple_format 再 simple_to_frontend
 
         Args:
-            mindmap_data: 思维导图数据（简单格式或前端格式）
+            simple_data: 简单格式的思维导图数据
+            collect_all: 为 False 时遇到第一个错误即停止，否则收集所有错误
 
         Returns:
-            str: 提取的文本内容
+            Tuple: (前端格式数据, 错误列表)；有错误时前端格式数据为 None，
+            每个错误形如 {"path": "$.children[0].children", "message": "..."}
         """
+        errors: List[Dict[str, str]] = []
+
+        def error(link: Any, suffix: str, message: str) -> None:
+            # 路径只在出错时才拼出来
+            indexes = []
+            while link is not None:
+                link, index = link
+                indexes.append(index)
+            path = "$" + "".join(f".children[{i}]" for i in reversed(indexes))
+            errors.append({"path": path + suffix, "message": message})
+
+        roots: List[Dict[str, Any]] = []
+        # (节点, 父节点的前端 children 列表, 路径链)
+        stack: List[Tuple[Any, List[Dict[str, Any]], Any]] = [
+            (simple_data, roots, None)
+        ]
+        while stack:
+            node_data, siblings, link = stack.pop()
+
+            if not isinstance(node_data, dict):
+                error(link, "", f"节点不是对象: {type(node_data).__name__}")
+            else:
+                if "title" not in node_data:
+                    error(link, "", "缺少 title")
+                if "children" not in node_data:
+                    error(link, "", "缺少 children")
+                elif not isinstance(node_data["children"], list):
+                    error(link, ".children", "children 不是列表")
+
+            if errors:
+                if not collect_all:
+                    del errors[1:]
+                    break
+                # 已经无效，只继续验证，不再转换
+                if isinstance(node_data, dict) and isinstance(
+                    node_data.get("children"), list
+                ):
+                    children = node_data["children"]
+                    for index in range(len(children) - 1, -1, -1):
+                        stack.append((children[index], siblings, (link, index)))
+                continue
 
-        def extract_from_simple(node: Dict[str, Any], level: int = 0) -> str:
-            """从简单格式提取文本"""
-            text = f"{'  ' * level}{node.get('title', '')}\n"
+            title = node_data["title"]
+            if not isinstance(title, str):
+                title = str(title)
+            children = node_data["children"]
+            frontend_node = {
+                "data": {
+                    "text": f"<p>{title}</p>",
+                    "expand": True,
+                    "richText": True,
+                    "isActive": False,
+                },
+                "children": [],
+            }
+            if not children:
+                frontend_node["data"].update(
+                    {"generalization": [], "imgMap": {}, "gradientStyle": False}
+                )
+            siblings.append(frontend_node)
 
-            for child in node.get("children", []):
-                text += extract_from_simple(child, level + 1)
+            for index in range(len(children) - 1, -1, -1):
+                stack.append(
+                    (children[index], frontend_node["children"], (link, index))
+                )
 
-            return text
+        if errors:
+            logger.debug("验证失败: %d 个错误", len(errors))
+            return None, errors
 
-        def extract_from_frontend(node: Dict[str, Any], level: int = 0) -> str:
-            """从前端格式提取文本"""
-            import re
+        root_node = roots[0]
+        if "generalization" not in root_node["data"]:
+            root_node["data"].update(
+                {"generalization": [], "imgMap": {}, "gradientStyle": False}
+            )
+        return {**root_node, "smmVersion": SMM_VERSION}, []
 
-            raw_text = node.get("data", {}).get("text", "")
-            title = re.sub(r"<[^>]*>", "", raw_text)  # 移除HTML标签
-            text = f"{'  ' * level}{title}\n"
+    @staticmethod
+    def extract_text_content(mindmap_data: Dict[str, Any]) -> str:
+        """
+        从思维导图数据中提取所有文本内容
 
-            for child in node.get("children", []):
-                text += extract_from_frontend(child, level + 1)
+        Args:
+            mindmap_data: 思维导图数据（简单格式或前端格式）
 
-            return text
+        Returns:
+            str: 提取的文本内容
+        """
 
         # 判断是简单格式还是前端格式
         if "title" in mindmap_data:
-            return extract_from_simple(mindmap_data)
+            from_frontend = False
         elif "data" in mindmap_data:
-            return extract_from_frontend(mindmap_data)
+            from_frontend = True
         else:
             return ""
 
+        # 先序遍历收集每一行，最后一次性拼接，避免逐层字符串复制
+        lines: List[str] = []
+        stack = [(mindmap_data, 0)]
+        while stack:
+            node, level = stack.pop()
+
+            if from_frontend:
+                raw_text = node.get("data", {}).get("text", "")
+                title = _strip_html(raw_text)  # 移除HTML标签
+            else:
+                title = node.get("title", "")
+            lines.append(f"{'  ' * level}{title}\n")
+
+            children = list(node.get("children", []))
+            for child in reversed(children):
+                stack.append((child, level + 1))
+
+        return "".join(lines)
+
+    @staticmethod
+    def convert_many(
+        mindmaps: Iterable[Any],
+        direction: str = "to-frontend",
+        max_workers: Optional[int] = None,
+        chunksize: int = 64,
+    ) -> List[Dict[str, Any]]:
+        """
+        用进程池批量转换思维导图
+
+        Args:
+            mindmaps: 思维导图数据的可迭代对象
+            direction: "to-frontend"（简单格式→前端格式）或 "to-simple"（前端格式→简单格式）
+            max_workers: 进程数，默认为CPU核数；为1时在当前进程内转换
+            chunksize: 每个任务包含的思维导图数量
+
+        Returns:
+            List[Dict]: 与输入顺序一致的转换结果，失败的项为 {"error": ...}
+        """
+        if direction not in ("to-frontend", "to-simple"):
+            raise ValueError(f"不支持的转换方向: {direction}")
+        if chunksize < 1:
+            raise ValueError(f"chunksize 必须大于0: {chunksize}")
+
+        start = time.perf_counter()
+        iterator = iter(mindmaps)
+        batches = iter(lambda: list(islice(iterator, chunksize)), [])
+
+        results: List[Dict[str, Any]] = []
+        non_str_titles = 0
+        if max_workers == 1:
+            outputs = map(_convert_batch, repeat(direction), batches)
+            for batch_results, count in outputs:
+                results.extend(batch_results)
+                non_str_titles += count
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                outputs = executor.map(_convert_batch, repeat(direction), batches)
+                for batch_results, count in outputs:
+                    results.extend(batch_results)
+                    non_str_titles += count
+
+        failed = sum(1 for result in results if "error" in result)
+        if non_str_titles:
+            logger.warning("节点标题不是字符串类型: %d 个节点", non_str_titles)
+        logger.info(
+            "批量转换完成: 方向=%s, 数量=%d, 失败=%d, 耗时=%.3fs",
+            direction,
+            len(results),
+            failed,
+            time.perf_counter() - start,
+        )
+        return results
+
 
 if __name__ == "__main__":
-    with open("mindmap.json", "r") as f:
-        mindmap_data = json.load(f)
-    frontend_data = MindMapConverter.simple_to_frontend(mindmap_data)
-    with open("mindmap_frontend.json", "w") as f:
-        json.dump(frontend_data, f, indent=4)
+    # 流式转换，内存只和树的深度相关
+    from mindmap_streaming import convert_file
+
+    convert_file("to-frontend", "mindmap.json", "mindmap_frontend.json")
@@ -0,0 +1,252 @@
+"""
+思维导图增量转换
+
+LLM 每次只改动一个分支，但整棵树都要重新走一遍 simple_to_frontend，
+前端也要重新渲染整个文档。这里给每个子树计算内容哈希：
+没有变化的子树直接复用上一次生成的前端节点，
+并生成一个只描述增删改节点的补丁，前端应用补丁即可，不必接收整个文档。
+
+补丁是按顺序应用的操作列表，path 为从根节点开始的子节点下标，
+每个操作的 path 都以前面的操作全部应用之后的树为准:
+    {"op": "replace", "path": [], "node": {...}}        替换整个文档（首次转换）
+    {"op": "update", "path": [0, 2], "data": {...}}     替换节点的 data
+    {"op": "insert", "path": [0, 3], "node": {...}}     在该位置插入子树
+    {"op": "remove", "path": [1]}                       删除该位置的子树
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from difflib import SequenceMatcher
+import hashlib
+import logging
+
+from mindmap_converter import SMM_VERSION
+
+logger = logging.getLogger(__name__)
+
+_ROOT_EXTRAS = {"generalization": [], "imgMap": {}, "gradientStyle": False}
+
+
+class _Entry:
+    """一个已转换的子树：内容哈希、前端节点和子树列表"""
+
+    __slots__ = ("digest", "node", "children")
+
+    def __init__(
+        self, digest: bytes, node: Dict[str, Any], children: List["_Entry"]
+    ) -> None:
+        self.digest = digest
+        self.node = node
+        self.children = children
+
+
+def _root_data(entry: _Entry) -> Dict[str, Any]:
+    """根节点的 data：总是带有根节点属性"""
+    data = entry.node["data"]
+    if "generalization" in data:
+        return data
+    return {**data, **_ROOT_EXTRAS}
+
+
+class IncrementalMindMapConverter:
+    """
+    带子树缓存的 simple_to_frontend
+
+    每次 convert 返回与 MindMapConverter.simple_to_frontend 相同的前端文档，
+    以及从上一次结果到这一次结果的补丁。未变化的子树与上一次的结果共享同一个对象，
+    返回的文档应视为只读。
+    """
+
+    def __init__(self) -> None:
+        self._root: Optional[_Entry] = None
+        self._entries: Dict[bytes, _Entry] = {}
+
+    def reset(self) -> None:
+        """丢弃缓存，下一次转换将返回完整文档"""
+        self._root = None
+        self._entries = {}
+
+    def convert(
+        self, simple_data: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        转换简单格式的思维导图，并与上一次转换的结果做差异比较
+
+        Args:
+            simple_data: 简单格式的思维导图数据
+
+        Returns:
+            Tuple: (前端格式的思维导图数据, 补丁)；转换失败时为 ({"error": ...}, [])，缓存保持不变
+        """
+        if not isinstance(simple_data, dict):
+            logger.error(f"输入数据不是字典类型: {type(simple_data)}")
+            return {"error": "输入数据格式错误"}, []
+
+        try:
+            root, entries, reused = self._build(simple_data)
+        except Exception as e:
+            logger.error(f"转换过程中发生错误: {str(e)}")
+            return {"error": f"转换失败: {str(e)}"}, []
+
+        document = {
+            "data": _root_data(root),
+            "children": root.node["children"],
+            "smmVersion": SMM_VERSION,
+        }
+        if self._root is None:
+            patch = [{"op": "replace", "path": [], "node": document}]
+        else:
+            patch = _diff(self._root, root)
+
+        logger.debug(
+            "增量转换完成: 节点=%d, 复用=%d, 补丁操作=%d",
+            len(entries),
+            reused,
+            len(patch),
+        )
+        self._root = root
+        self._entries = entries
+        return document, patch
+
+    def _build(
+        self, simple_data: Dict[str, Any]
+    ) -> Tuple[_Entry, Dict[bytes, _Entry], int]:
+        """后序计算每个子树的哈希，哈希命中缓存的子树直接复用"""
+        # 先序展开，记录每个节点的父节点
+        nodes: List[Tuple[str, bool]] = []
+        parents: List[int] = []
+        stack = [(simple_data, -1)]
+        while stack:
+            node_data, parent = stack.pop()
+            title = node_data.get("title", "未命名节点")
+            if not isinstance(title, str):
+                title = str(title)
+            has_list = "children" in node_data and isinstance(
+                node_data["children"], list
+            )
+
+            index = len(nodes)
+            nodes.append((title, has_list))
+            parents.append(parent)
+            if has_list:
+                for child in reversed(node_data["children"]):
+                    stack.append((child, index))
+
+        # 逆先序即子节点总在父节点之前处理
+        children: List[List[_Entry]] = [[] for _ in nodes]
+        entries: Dict[bytes, _Entry] = {}
+        reused = 0
+        for index in range(len(nodes) - 1, -1, -1):
+            title, has_list = nodes[index]
+            kids = children[index]
+            kids.reverse()
+
+            encoded = title.encode("utf-8", "surrogatepass")
+            hasher = hashlib.blake2b(digest_size=16)
+            hasher.update(len(encoded).to_bytes(8, "little"))
+            hasher.update(encoded)
+            hasher.update(b"L" if has_list else b"N")
+            for kid in kids:
+                hasher.update(kid.digest)
+            digest = hasher.digest()
+
+            entry = entries.get(digest) or self._entries.get(digest)
+            if entry is not None:
+                reused += 1
+            else:
+                data = {
+                    "text": f"<p>{title}</p>",
+                    "expand": True,
+                    "richText": True,
+                    "isActive": False,
+                }
+                if has_list and not kids:
+                    data.update(_ROOT_EXTRAS)
+                node = {"data": data, "children": [kid.node for kid in kids]}
+                entry = _Entry(digest, node, kids)
+            entries[digest] = entry
+
+            parent = parents[index]
+            if parent >= 0:
+                children[parent].append(entry)
+            else:
+                root = entry
+
+        return root, entries, reused
+
+
+def _diff(old_root: _Entry, new_root: _Entry) -> List[Dict[str, Any]]:
+    """生成把 old_root 变为 new_root 的补丁，只进入哈希不同的子树"""
+    patch: List[Dict[str, Any]] = []
+    if old_root.digest == new_root.digest:
+        return patch
+
+    if _root_data(old_root) != _root_data(new_root):
+        patch.append({"op": "update", "path": [], "data": _root_data(new_root)})
+
+    # 同一父节点下的操作从左到右生成，处理到下标 j 时，
+    # 当前树中该父节点的子节点为 new[:j] + old[i:]，子树的路径因此总是有效
+    stack = [(old_root, new_root, [])]
+    while stack:
+        old, new, path = stack.pop()
+        old_kids = [kid.digest for kid in old.children]
+        new_kids = [kid.digest for kid in new.children]
+        matcher = SequenceMatcher(None, old_kids, new_kids, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            pairs = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+            for k in range(pairs):
+                old_kid, new_kid = old.children[i1 + k], new.children[j1 + k]
+                kid_path = path + [j1 + k]
+                if old_kid.node["data"] != new_kid.node["data"]:
+                    patch.append(
+                        {"op": "update", "path": kid_path, "data": new_kid.node["data"]}
+                    )
+                stack.append((old_kid, new_kid, kid_path))
+            for _ in range(i2 - i1 - pairs):
+                patch.append({"op": "remove", "path": path + [j1 + pairs]})
+            for j in range(j1 + pairs, j2):
+                patch.append(
+                    {"op": "insert", "path": path + [j], "node": new.children[j].node}
+                )
+    return patch
+
+
+def apply_patch(
+    document: Dict[str, Any], patch: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    把补丁应用到前端文档上，返回新文档，原文档不会被修改
+
+    前端可以按同样的语义实现；这里主要用于测试和服务端校验。
+    """
+    for op in patch:
+        path = op["path"]
+        if op["op"] == "replace" and not path:
+            document = op["node"]
+            continue
+
+        # 沿路径复制节点，未涉及的子树继续共享
+        document = dict(document)
+        node = document
+        steps = path if op["op"] == "update" else path[:-1]
+        for index in steps:
+            node["children"] = list(node["children"])
+            child = dict(node["children"][index])
+            node["children"][index] = child
+            node = child
+
+        if op["op"] == "update":
+            node["data"] = op["data"]
+        elif op["op"] == "replace":
+            node["children"] = list(node["children"])
+            node["children"][path[-1]] = op["node"]
+        elif op["op"] == "insert":
+            node["children"] = list(node["children"])
+            node["children"].insert(path[-1], op["node"])
+        elif op["op"] == "remove":
+            node["children"] = list(node["children"])
+            del node["children"][path[-1]]
+        else:
+            raise ValueError(f"未知的补丁操作: {op['op']}")
+    return document
@@ -0,0 +1,279 @@
+"""
+从 LLM 的流式输出增量构建思维导图
+
+以前要等 ChatDeepSeek 生成完整个 JSON 才能调用 simple_to_frontend，
+首个节点出现的时间等于整个生成时间。这里把 model.stream(...) 的文本块
+喂给增量 JSON 解析器，每个节点的 title 一完整就产出一个前端格式的插入事件，
+界面可以边生成边绘制。
+
+事件与 mindmap_incremental 的补丁操作格式相同，可以用 apply_patch 依次应用:
+    {"op": "replace", "path": [], "node": {...}}      根节点（带 smmVersion）
+    {"op": "insert", "path": [0, 2], "node": {...}}   插入节点
+    {"op": "update", "path": [0, 2], "data": {...}}   子节点列表为空时补上根节点属性
+全部应用后的文档与对完整输出调用 simple_to_frontend 的结果一致。
+"""
+
+from typing import Any, AsyncIterable, Deque, Dict, Iterable, Iterator, List, Optional
+from collections import deque
+import logging
+import time
+
+from mindmap_converter import SMM_VERSION
+from mindmap_streaming import JsonEventParser, _Skipper, _ValueBuilder
+
+logger = logging.getLogger(__name__)
+
+_ROOT_EXTRAS = {"generalization": [], "imgMap": {}, "gradientStyle": False}
+
+# 栈中表示“正在读取 children 列表”的标记
+_CHILDREN = object()
+
+
+class _Slot:
+    """事件队列中的一个位置；节点标题未就绪时事件为 None，后面的事件都要等它"""
+
+    __slots__ = ("event",)
+
+    def __init__(self, event: Optional[Dict[str, Any]] = None) -> None:
+        self.event = event
+
+
+class _LiveNode:
+    """一个正在生成的节点"""
+
+    __slots__ = (
+        "path",
+        "node",
+        "slot",
+        "key",
+        "resolved",
+        "child_count",
+        "children_empty",
+    )
+
+    def __init__(self, path: List[int], node: Dict[str, Any], slot: _Slot) -> None:
+        self.path = path
+        self.node = node  # 文档中的前端节点
+        self.slot = slot  # 插入事件的位置
+        self.key: Optional[str] = None
+        self.resolved = False
+        self.child_count = 0
+        self.children_empty = False  # children 是空列表
+
+
+class MindMapStreamBuilder:
+    """
+    增量构建思维导图
+
+    每次 feed 一段 LLM 输出的文本，返回已经可以发给前端的事件。
+    根对象之前的内容（如 ```json）和之后的内容都会被忽略。
+    """
+
+    def __init__(self) -> None:
+        self._parser = JsonEventParser(allow_trailing=True)
+        self._started = False
+        self._stack: List[Any] = []
+        self._queue: Deque[_Slot] = deque()
+        self.document: Optional[Dict[str, Any]] = None
+
+    @property
+    def done(self) -> bool:
+        """根节点是否已经结束"""
+        return self._parser.done
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """喂入一段文本，返回新就绪的事件"""
+        if not self._started:
+            start = text.find("{")
+            if start < 0:
+                return []
+            text = text[start:]
+            self._started = True
+
+        for event, value in self._parser.feed(text):
+            self._handle(event, value)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """输出结束，返回剩余事件；JSON 不完整时抛出 ValueError"""
+        if not self._started:
+            raise ValueError("输出中没有思维导图 JSON")
+        for event, value in self._parser.close():
+            self._handle(event, value)
+        return self._drain()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        events = []
+        while self._queue and self._queue[0].event is not None:
+            events.append(self._queue.popleft().event)
+        return events
+
+    # ---- 事件处理 ----
+
+    def _handle(self, event: str, value: Any) -> None:
+        if not self._stack:
+            if self.document is not None:
+                return
+            if event != "start_map":
+                raise ValueError("思维导图根节点必须是对象")
+            self.document = {"data": {}, "children": [], "smmVersion": SMM_VERSION}
+            self._open(self.document, path=[])
+            return
+
+        top = self._stack[-1]
+
+        if top is _CHILDREN:
+            live = self._stack[-2]
+            if event == "start_map":
+                node = {"data": {}, "children": []}
+                live.node["children"].append(node)
+                self._open(node, path=live.path + [live.child_count])
+                live.child_count += 1
+            elif event == "end_array":
+                self._stack.pop()
+                self._close_children(live)
+            else:
+                # 不是对象的子节点无法绘制，跳过
+                logger.warning("跳过不是对象的子节点: %s", event)
+                if event == "start_array":
+                    skipper = _Skipper()
+                    skipper.feed(event, value)
+                    self._stack.append(skipper)
+            return
+
+        if not isinstance(top, _LiveNode):
+            if top.feed(event, value):
+                self._stack.pop()
+                if isinstance(top, _ValueBuilder):
+                    self._resolve(self._stack[-1], top.value)
+            return
+
+        live = top
+        if event == "map_key":
+            live.key = value
+        elif event == "end_map":
+            self._stack.pop()
+            if not live.resolved:
+                self._resolve(live, "未命名节点")
+        else:
+            key, live.key = live.key, None
+            if key == "children" and event == "start_array":
+                self._stack.append(_CHILDREN)
+            elif key == "title" and not live.resolved:
+                builder = _ValueBuilder()
+                if builder.feed(event, value):
+                    self._resolve(live, builder.value)
+                else:
+                    self._stack.append(builder)
+            elif event in ("start_map", "start_array"):
+                skipper = _Skipper()
+                skipper.feed(event, value)
+                self._stack.append(skipper)
+
+    def _open(self, node: Dict[str, Any], path: List[int]) -> None:
+        slot = _Slot()
+        self._queue.append(slot)
+        self._stack.append(_LiveNode(path, node, slot))
+
+    def _data(self, live: _LiveNode, title: Any) -> Dict[str, Any]:
+        if not isinstance(title, str):
+            logger.warning("节点标题不是字符串类型: %s", type(title))
+            title = str(title)
+        data = {
+            "text": f"<p>{title}</p>",
+            "expand": True,
+            "richText": True,
+            "isActive": False,
+        }
+        if not live.path or live.children_empty:
+            data.update(_ROOT_EXTRAS)
+        return data
+
+    def _resolve(self, live: _LiveNode, title: Any) -> None:
+        """标题就绪：填上插入事件"""
+        live.resolved = True
+        live.node["data"] = self._data(live, title)
+        if not live.path:
+            node = {**live.node, "data": dict(live.node["data"]), "children": []}
+            live.slot.event = {"op": "replace", "path": [], "node": node}
+        else:
+            node = {"data": dict(live.node["data"]), "children": []}
+            live.slot.event = {"op": "insert", "path": live.path, "node": node}
+
+    def _close_children(self, live: _LiveNode) -> None:
+        if live.child_count or not live.path:
+            return
+        # 空的 children 列表：和 simple_to_frontend 一样带上根节点属性
+        live.children_empty = True
+        if live.resolved:
+            live.node["data"] = {**live.node["data"], **_ROOT_EXTRAS}
+            self._queue.append(
+                _Slot(
+                    {"op": "update", "path": live.path, "data": dict(live.node["data"])}
+                )
+            )
+
+
+def _chunk_text(chunk: Any) -> str:
+    """取出 LLM 流式输出块中的文本"""
+    if isinstance(chunk, str):
+        return chunk
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") for block in content if isinstance(block, dict)
+    )
+
+
+def stream_mindmap(chunks: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """
+    把 LLM 的流式输出转换为思维导图事件流
+
+    Args:
+        chunks: model.stream(...) 的输出，或者普通字符串的可迭代对象
+
+    Yields:
+        Dict: 前端格式的节点事件
+    """
+    builder = MindMapStreamBuilder()
+    for chunk in chunks:
+        yield from builder.feed(_chunk_text(chunk))
+    yield from builder.close()
+
+
+async def astream_mindmap(chunks: AsyncIterable[Any]):
+    """stream_mindmap 的异步版本，chunks 为 model.astream(...) 的输出"""
+    builder = MindMapStreamBuilder()
+    async for chunk in chunks:
+        for event in builder.feed(_chunk_text(chunk)):
+            yield event
+    for event in builder.close():
+        yield event
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from langchain_deepseek import ChatDeepSeek
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    model = ChatDeepSeek(model="deepseek-chat", temperature=0)
+    messages = [
+        SystemMessage(
+            '用 JSON 输出思维导图，格式为 {"title": "...", "children": [...]}，'
+            "每个节点都有 title 和 children，不要输出其他内容"
+        ),
+        HumanMessage("人工智能在教育领域的应用"),
+    ]
+
+    start = time.perf_counter()
+    first_node = None
+    for event in stream_mindmap(model.stream(messages)):
+        elapsed = time.perf_counter() - start
+        if first_node is None:
+            first_node = elapsed
+        print(f"[{elapsed:6.2f}s] {event['op']} {event['path']}")
+    print(f"首个节点: {first_node:.2f}s, 总耗时: {time.perf_counter() - start:.2f}s")
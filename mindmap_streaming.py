@@ -0,0 +1,575 @@
+"""
+思维导图流式转换
+
+整个文件 json.load 之后再 json.dump，峰值内存是文件大小的好几倍。
+这里用增量的事件式 JSON 解析器逐块读取输入，节点一就绪就写出，
+内存只和树的深度相关，和节点数量无关。
+
+用法:
+    python mindmap_streaming.py to-frontend mindmap.json mindmap_frontend.json
+    python mindmap_streaming.py to-simple mindmap_frontend.json mindmap.json
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import json
+import re
+from json.decoder import scanstring
+
+from mindmap_converter import SMM_VERSION, _strip_html, logger
+
+# 事件: (类型, 值)，类型与 ijson 一致:
+# start_map / end_map / map_key / start_array / end_array /
+# string / number / boolean / null
+Event = Tuple[str, Any]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?")
+_NUMBER_CHARS = re.compile(r"[-+.eE0-9]*")
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# 解析器状态
+_VALUE = 0  # 期待一个值
+_VALUE_OR_END = 1  # '[' 之后: 值或 ']'
+_KEY_OR_END = 2  # '{' 之后: 键或 '}'
+_KEY = 3  # ',' 之后: 键
+_COLON = 4
+_COMMA_OR_END = 5
+_DONE = 6
+
+
+class JsonEventParser:
+    """
+    增量 JSON 事件解析器
+
+    每次 feed 一段文本，返回这段文本里已经能确定的事件；
+    被截断的字符串、数字等会留在缓冲区，等下一段文本到来再解析。
+    """
+
+    def __init__(self, allow_trailing: bool = False) -> None:
+        """
+        Args:
+            allow_trailing: 是否忽略顶层值之后的内容（如 LLM 输出末尾的 ```）
+        """
+        self._allow_trailing = allow_trailing
+        self._buffer = ""
+        self._offset = 0  # 缓冲区起点在整个输入中的位置，用于报错
+        self._containers: List[str] = []  # "{" 或 "["
+        self._state = _VALUE
+
+    @property
+    def done(self) -> bool:
+        """顶层值是否已经解析完毕"""
+        return self._state == _DONE
+
+    def feed(self, text: str) -> List[Event]:
+        """喂入一段文本，返回新产生的事件"""
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List[Event]:
+        """输入结束，解析缓冲区剩余内容"""
+        events = self._parse(final=True)
+        if self._state != _DONE:
+            raise ValueError(f"JSON不完整: 位置 {self._offset + len(self._buffer)}")
+        return events
+
+    def _error(self, pos: int, message: str) -> ValueError:
+        return ValueError(f"JSON格式错误: 位置 {self._offset + pos}: {message}")
+
+    def _after_value(self) -> None:
+        self._state = _COMMA_OR_END if self._containers else _DONE
+
+    def _parse(self, final: bool) -> List[Event]:
+        buf = self._buffer
+        end = len(buf)
+        pos = 0
+        events: List[Event] = []
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= end:
+                break
+            ch = buf[pos]
+            state = self._state
+
+            if state == _DONE:
+                if self._allow_trailing:
+                    pos = end
+                    break
+                raise self._error(pos, "顶层值之后存在多余内容")
+
+            if state == _COLON:
+                if ch != ":":
+                    raise self._error(pos, "期待 ':'")
+                pos += 1
+                self._state = _VALUE
+                continue
+
+            if state == _COMMA_OR_END:
+                top = self._containers[-1]
+                if ch == ",":
+                    pos += 1
+                    self._state = _KEY if top == "{" else _VALUE
+                elif ch == "}" and top == "{":
+                    pos += 1
+                    self._containers.pop()
+                    events.append(("end_map", None))
+                    self._after_value()
+                elif ch == "]" and top == "[":
+                    pos += 1
+                    self._containers.pop()
+                    events.append(("end_array", None))
+                    self._after_value()
+                else:
+                    raise self._error(pos, "期待 ',' 或容器结束")
+                continue
+
+            if state in (_KEY_OR_END, _KEY):
+                if ch == "}" and state == _KEY_OR_END:
+                    pos += 1
+                    self._containers.pop()
+                    events.append(("end_map", None))
+                    self._after_value()
+                    continue
+                if ch != '"':
+                    raise self._error(pos, "期待字符串键")
+                if self._find_string_end(buf, pos) < 0:
+                    break
+                key, pos = scanstring(buf, pos + 1)
+                events.append(("map_key", key))
+                self._state = _COLON
+                continue
+
+            # _VALUE / _VALUE_OR_END
+            if ch == "]" and state == _VALUE_OR_END:
+                pos += 1
+                self._containers.pop()
+                events.append(("end_array", None))
+                self._after_value()
+            elif ch == "{":
+                pos += 1
+                self._containers.append("{")
+                events.append(("start_map", None))
+                self._state = _KEY_OR_END
+            elif ch == "[":
+                pos += 1
+                self._containers.append("[")
+                events.append(("start_array", None))
+                self._state = _VALUE_OR_END
+            elif ch == '"':
+                if self._find_string_end(buf, pos) < 0:
+                    break
+                value, pos = scanstring(buf, pos + 1)
+                events.append(("string", value))
+                self._after_value()
+            elif ch == "-" or ch.isdigit():
+                span = _NUMBER_CHARS.match(buf, pos).end()
+                if span == end and not final:
+                    break  # 数字可能还没读完
+                match = _NUMBER.fullmatch(buf, pos, span)
+                if match is None:
+                    raise self._error(pos, "非法数字")
+                number = (
+                    float(match.group(0))
+                    if match.group(1) or match.group(2)
+                    else int(match.group(0))
+                )
+                events.append(("number", number))
+                pos = span
+                self._after_value()
+            elif ch in "tfn":
+                for literal, value in _LITERALS.items():
+                    if buf.startswith(literal, pos):
+                        break
+                else:
+                    if not final and _is_literal_prefix(buf[pos:]):
+                        break
+                    raise self._error(pos, "非法字面量")
+                events.append(("boolean" if value is not None else "null", value))
+                pos += len(literal)
+                self._after_value()
+            else:
+                raise self._error(pos, f"非法字符 {ch!r}")
+
+        self._buffer = buf[pos:]
+        self._offset += pos
+        return events
+
+    @staticmethod
+    def _find_string_end(buf: str, start: int) -> int:
+        """返回字符串结束引号的位置，字符串被截断时返回 -1"""
+        pos = start + 1
+        while True:
+            quote = buf.find('"', pos)
+            if quote < 0:
+                return -1
+            # 引号前连续反斜杠为偶数个时才是真正的结束引号
+            backslashes = 0
+            while buf[quote - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return quote
+            pos = quote + 1
+
+
+def _is_literal_prefix(text: str) -> bool:
+    """text 是否可能是一个被截断的 true/false/null"""
+    return any(literal.startswith(text) for literal in _LITERALS)
+
+
+def iter_json_events(fp: TextIO, chunk_size: int = 1 << 16) -> Iterator[Event]:
+    """逐块读取文件并产出 JSON 事件"""
+    parser = JsonEventParser()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class _ValueBuilder:
+    """把一段事件还原成 Python 对象（只用于标题等小对象）"""
+
+    def __init__(self) -> None:
+        self._stack: List[Any] = []
+        self._keys: List[Optional[str]] = []
+        self.value: Any = None
+
+    def feed(self, event: str, value: Any) -> bool:
+        """处理一个事件，值构建完成时返回 True"""
+        if event == "map_key":
+            self._keys[-1] = value
+            return False
+        if event in ("start_map", "start_array"):
+            self._stack.append({} if event == "start_map" else [])
+            self._keys.append(None)
+            return False
+        if event in ("end_map", "end_array"):
+            value = self._stack.pop()
+            self._keys.pop()
+        if not self._stack:
+            self.value = value
+            return True
+        container = self._stack[-1]
+        if isinstance(container, dict):
+            container[self._keys[-1]] = value
+        else:
+            container.append(value)
+        return False
+
+
+class _Skipper:
+    """跳过一个不关心的值"""
+
+    def __init__(self) -> None:
+        self._depth = 0
+
+    def feed(self, event: str, value: Any) -> bool:
+        if event in ("start_map", "start_array"):
+            self._depth += 1
+        elif event in ("end_map", "end_array"):
+            self._depth -= 1
+        return self._depth == 0
+
+
+# 节点内容尚未读到 / 已经写出
+_MISSING = object()
+_WRITTEN = object()
+
+# 栈中表示“正在读取 children 列表”的标记
+_CHILDREN = object()
+
+
+class _NodeFrame:
+    """一个正在输出的节点"""
+
+    __slots__ = ("level", "key", "head", "members", "children", "child_count")
+
+    def __init__(self, level: int) -> None:
+        self.level = level
+        self.key: Optional[str] = None  # 当前正在读取的键
+        self.head: Any = _MISSING  # 节点内容（标题或 data）
+        self.members = 0  # 已写出的成员数
+        self.children: Optional[str] = None  # None / "open" / "closed"
+        self.child_count = 0
+
+
+class _StreamingTreeConverter:
+    """
+    流式树转换的公共部分
+
+    两种格式都是 {"<head>": ..., "children": [...]} 形式的嵌套节点，
+    子类只需说明读取哪个键作为节点内容、写出哪些成员。
+    节点内容在 children 之前出现时，输出与 json.dump(..., indent=indent) 完全一致；
+    否则先写出 children，节点内容在节点结束时补上（JSON 语义相同，键顺序不同）。
+    """
+
+    # 输入中节点内容所在的键
+    head_key = ""
+
+    def __init__(self, out: TextIO, indent: Optional[int] = 4) -> None:
+        self._out = out
+        self._indent = indent
+        self._item_separator = "," if indent is not None else ", "
+        self._stack: List[Any] = []  # _NodeFrame / _CHILDREN / 值读取器
+        self._finished = False
+
+    # ---- 子类接口 ----
+
+    def _head_members(
+        self, head: Any, children_empty: Optional[bool], is_root: bool
+    ) -> List[Tuple[str, Any]]:
+        """
+        节点自身的成员
+
+        Args:
+            head: 输入中 head_key 对应的值，没有时为 _MISSING
+            children_empty: 输入的 children 是否为空列表，没有 children 列表时为 None
+            is_root: 是否为根节点
+        """
+        raise NotImplementedError
+
+    def _root_trailer(self) -> List[Tuple[str, Any]]:
+        """根节点末尾追加的成员"""
+        return []
+
+    # ---- 输出 ----
+
+    def _newline(self, level: int) -> str:
+        if self._indent is None:
+            return ""
+        return "\n" + " " * (self._indent * level)
+
+    def _member_prefix(self, frame: _NodeFrame) -> str:
+        prefix = self._newline(frame.level + 1)
+        if frame.members:
+            prefix = self._item_separator + prefix
+        frame.members += 1
+        return prefix
+
+    def _write_members(self, frame: _NodeFrame, members: List[Tuple[str, Any]]) -> None:
+        for key, value in members:
+            text = json.dumps(value, indent=self._indent)
+            if self._indent is not None:
+                text = text.replace("\n", self._newline(frame.level + 1))
+            self._out.write(f"{self._member_prefix(frame)}{json.dumps(key)}: {text}")
+
+    def _write_head(self, frame: _NodeFrame, children_empty: Optional[bool]) -> None:
+        members = self._head_members(frame.head, children_empty, frame.level == 0)
+        self._write_members(frame, members)
+        frame.head = _WRITTEN
+
+    # ---- 事件处理 ----
+
+    def feed(self, event: str, value: Any) -> None:
+        """处理一个 JSON 事件"""
+        if self._finished:
+            raise ValueError("思维导图之后存在多余内容")
+
+        if not self._stack:
+            if event != "start_map":
+                raise ValueError("思维导图根节点必须是对象")
+            self._open_node(level=0)
+            return
+
+        top = self._stack[-1]
+
+        if top is _CHILDREN:
+            frame = self._stack[-2]
+            if event == "start_map":
+                self._open_child(frame)
+            elif event == "end_array":
+                self._stack.pop()
+                self._close_children(frame)
+            else:
+                raise ValueError("子节点必须是对象")
+            return
+
+        if not isinstance(top, _NodeFrame):
+            # 正在读取节点内容或跳过不关心的值
+            if top.feed(event, value):
+                self._stack.pop()
+                if isinstance(top, _ValueBuilder):
+                    self._set_head(self._stack[-1], top.value)
+            return
+
+        frame = top
+        if event == "map_key":
+            frame.key = value
+        elif event == "end_map":
+            self._close_node(frame)
+        else:
+            key, frame.key = frame.key, None
+            if key == "children" and event == "start_array":
+                frame.children = "open"
+                self._stack.append(_CHILDREN)
+            elif key == self.head_key:
+                builder = _ValueBuilder()
+                if builder.feed(event, value):
+                    self._set_head(frame, builder.value)
+                else:
+                    self._stack.append(builder)
+            elif event in ("start_map", "start_array"):
+                skipper = _Skipper()
+                skipper.feed(event, value)
+                self._stack.append(skipper)
+
+    def close(self) -> None:
+        """输入结束"""
+        if not self._finished:
+            raise ValueError("思维导图不完整")
+
+    def _open_node(self, level: int) -> None:
+        self._out.write("{")
+        self._stack.append(_NodeFrame(level))
+
+    def _set_head(self, frame: _NodeFrame, head: Any) -> None:
+        # 节点内容已经写出（重复的键）时忽略
+        if frame.head is not _WRITTEN:
+            frame.head = head
+
+    def _open_child(self, frame: _NodeFrame) -> None:
+        if frame.child_count == 0:
+            # 子节点非空，节点内容已知时先写出，保持和原格式一致的键顺序
+            if frame.head is not _MISSING and frame.head is not _WRITTEN:
+                self._write_head(frame, children_empty=False)
+            self._out.write(f'{self._member_prefix(frame)}"children": [')
+        else:
+            self._out.write(self._item_separator)
+        self._out.write(self._newline(frame.level + 2))
+        frame.child_count += 1
+        self._open_node(level=frame.level + 2)
+
+    def _close_children(self, frame: _NodeFrame) -> None:
+        frame.children = "closed"
+        if frame.child_count:
+            self._out.write(self._newline(frame.level + 1) + "]")
+
+    def _close_node(self, frame: _NodeFrame) -> None:
+        self._stack.pop()
+        if frame.head is not _WRITTEN:
+            if frame.children is None:
+                children_empty = None
+            else:
+                children_empty = frame.child_count == 0
+            self._write_head(frame, children_empty)
+        if frame.child_count == 0:
+            self._out.write(f'{self._member_prefix(frame)}"children": []')
+        if frame.level == 0:
+            self._write_members(frame, self._root_trailer())
+            self._finished = True
+        self._out.write(self._newline(frame.level) + "}")
+
+
+class SimpleToFrontendStream(_StreamingTreeConverter):
+    """流式版 MindMapConverter.simple_to_frontend"""
+
+    head_key = "title"
+
+    def _head_members(
+        self, head: Any, children_empty: Optional[bool], is_root: bool
+    ) -> List[Tuple[str, Any]]:
+        title = "未命名节点" if head is _MISSING else head
+        if not isinstance(title, str):
+            logger.warning("节点标题不是字符串类型: %s", type(title))
+            title = str(title)
+
+        data: Dict[str, Any] = {
+            "text": f"<p>{title}</p>",
+            "expand": True,
+            "richText": True,
+            "isActive": False,
+        }
+        if is_root or children_empty:
+            data.update({"generalization": [], "imgMap": {}, "gradientStyle": False})
+        return [("data", data)]
+
+    def _root_trailer(self) -> List[Tuple[str, Any]]:
+        return [("smmVersion", SMM_VERSION)]
+
+
+class FrontendToSimpleStream(_StreamingTreeConverter):
+    """流式版 MindMapConverter.frontend_to_simple"""
+
+    head_key = "data"
+
+    def _head_members(
+        self, head: Any, children_empty: Optional[bool], is_root: bool
+    ) -> List[Tuple[str, Any]]:
+        if head is _MISSING:
+            head = {}
+        if not isinstance(head, dict):
+            raise ValueError(f"节点 data 不是对象: {type(head)}")
+        text = head.get("text", "")
+        if not isinstance(text, str):
+            raise ValueError(f"节点文本不是字符串类型: {type(text)}")
+        return [("title", _strip_html(text))]
+
+
+_CONVERTERS = {
+    "to-frontend": SimpleToFrontendStream,
+    "to-simple": FrontendToSimpleStream,
+}
+
+
+def convert_stream(
+    direction: str,
+    fin: TextIO,
+    fout: TextIO,
+    indent: Optional[int] = 4,
+    chunk_size: int = 1 << 16,
+) -> None:
+    """
+    流式转换思维导图文件
+
+    Args:
+        direction: "to-frontend"（简单格式→前端格式）或 "to-simple"（前端格式→简单格式）
+        fin: 输入文件
+        fout: 输出文件
+        indent: 输出缩进，None 表示紧凑输出
+        chunk_size: 每次读取的字符数
+    """
+    converter = _CONVERTERS[direction](fout, indent=indent)
+    for event, value in iter_json_events(fin, chunk_size):
+        converter.feed(event, value)
+    converter.close()
+
+
+def convert_file(
+    direction: str,
+    input_path: str,
+    output_path: str,
+    indent: Optional[int] = 4,
+    chunk_size: int = 1 << 16,
+) -> None:
+    """流式转换思维导图文件，参数同 convert_stream"""
+    with open(input_path, "r") as fin, open(output_path, "w") as fout:
+        convert_stream(direction, fin, fout, indent=indent, chunk_size=chunk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="流式转换思维导图文件")
+    parser.add_argument("direction", choices=sorted(_CONVERTERS))
+    parser.add_argument("input", help="输入文件")
+    parser.add_argument("output", help="输出文件")
+    parser.add_argument(
+        "--indent", type=int, default=4, help="输出缩进，小于0表示紧凑输出"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1 << 16)
+    args = parser.parse_args(argv)
+
+    indent = args.indent if args.indent >= 0 else None
+    convert_file(
+        args.direction,
+        args.input,
+        args.output,
+        indent=indent,
+        chunk_size=args.chunk_size,
+    )
+    logger.info(f"转换完成: {args.input} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
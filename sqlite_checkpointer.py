@@ -0,0 +1,508 @@
+# 2026/10/18
+# zhangzhong
+# 基于 SQLite（WAL 模式）的 checkpointer，可以直接替换 MemorySaver
+
+"""
+MemorySaver 把所有 checkpoint 放在进程内存里：进程重启后等待 human_review 的 interrupt 全部丢失，
+而且每个 thread 的每一步都留在内存里，内存随 thread 数和对话长度一直增长。
+
+SQLiteSaver 把 checkpoint 和 pending writes 存到本地的 SQLite 文件:
+    - WAL 模式 + synchronous=NORMAL：提交只追加到 WAL 文件，不等待 fsync；
+      进程崩溃不丢已提交的数据，断电最多丢最近几次提交（需要时可设 synchronous="FULL"）
+    - 按超步批量写入：一个超步中各个任务的 put_writes 先放在内存里，
+      在该超步结束的 put 中与 checkpoint 一起在一个事务里提交；
+      多个线程同时提交时，后来者的数据会被正在提交的一方顺带写入（group commit）。
+      包含 interrupt/error 的写入（运行在此结束）立即提交，读之前也会先提交
+    - 压缩：每个 thread 只保留最近 keep_last 到 2 * keep_last 个 checkpoint 及其 writes，
+      每隔 keep_last 步删除一次旧的；compact() 对所有 thread 压缩并收缩 WAL 文件
+    - 恢复一个 thread 只需要按主键 (thread_id, checkpoint_ns, checkpoint_id) 查最新的一个 checkpoint
+      和它的 writes，与 thread 数和历史长度无关
+
+用法（与 MemorySaver 相同）:
+    from sqlite_checkpointer import SQLiteSaver
+    agent_executor = create_react_agent(model, tools, checkpointer=SQLiteSaver("checkpoints.sqlite"))
+异步方法直接调用同步实现（与 MemorySaver 一样），本地 SQLite 的一次读写只需要几十微秒。
+checkpoint 保存完整的 channel_values，不支持 DeltaChannel 的增量存储。
+serde 是 learn_langgraph.message_log.DeltaSerializer 时，它的消息块也存在这个数据库文件里，
+prune()/compact() 之后删除不再被引用的块（delete_thread() 留下的块在下一次 compact() 时删除）。
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import itertools
+import sqlite3
+import threading
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import ERROR, INTERRUPT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+INSERT_CHECKPOINT = "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+# 普通写入不覆盖已有的（与 MemorySaver 相同），特殊写入（interrupt 等）覆盖
+INSERT_WRITE = "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+REPLACE_WRITE = "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+# 第 keep_last 新的 checkpoint 之前的都删除
+_OLDER = """
+    checkpoint_id < (
+        SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+        ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+    )
+"""
+DELETE_OLD_WRITES = (
+    f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND {_OLDER}"
+)
+DELETE_OLD_CHECKPOINTS = (
+    f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND {_OLDER}"
+)
+
+# 运行在这些写入之后结束，不能等下一次 put
+_FINAL_CHANNELS = frozenset([ERROR, INTERRUPT])
+
+
+class SQLiteSaver(BaseCheckpointSaver):
+    """
+    SQLite 文件中的 checkpointer，线程安全
+
+    Args:
+        path: 数据库文件，":memory:" 为内存数据库
+        keep_last: 每个 thread（和 checkpoint_ns）保留的 checkpoint 数，None 表示全部保留
+        synchronous: SQLite 的 synchronous 设置，"NORMAL" 或 "FULL"
+        max_pending: 缓冲的写入超过这么多条时立即提交
+    """
+
+    def __init__(
+        self,
+        path: str = "checkpoints.sqlite",
+        *,
+        keep_last: Optional[int] = 10,
+        synchronous: str = "NORMAL",
+        max_pending: int = 1000,
+        serde: Any = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.max_pending = max_pending
+        self.commits = 0
+        # _db_lock 保护连接，_buffer_lock 只保护缓冲区，提交时其他线程仍然可以缓冲
+        self._db_lock = threading.Lock()
+        self._buffer_lock = threading.Lock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        # 把 checkpoint 之外的数据（如 DeltaSerializer 的消息块）存到同一个数据库文件
+        bind = getattr(self.serde, "bind_checkpointer", None)
+        if bind is not None:
+            bind(self)
+
+    def __enter__(self) -> "SQLiteSaver":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "SQLiteSaver":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ---- 写入 ----
+
+    def _buffer(self, statements: List[Tuple[str, tuple]], commit: bool) -> None:
+        with self._buffer_lock:
+            self._pending.extend(statements)
+            commit = commit or len(self._pending) >= self.max_pending
+        if commit:
+            self.flush()
+
+    def _flush_locked(self) -> None:
+        with self._buffer_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            # 保持顺序，相邻的同一语句合并为一次 executemany
+            for sql, group in itertools.groupby(pending, key=lambda item: item[0]):
+                self._conn.executemany(sql, [params for _, params in group])
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.commits += 1
+
+    def flush(self) -> None:
+        """提交所有缓冲的写入；返回时之前的写入都已经提交"""
+        with self._db_lock:
+            self._flush_locked()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        statements = [
+            (
+                INSERT_CHECKPOINT,
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                ),
+            )
+        ]
+        step = metadata.get("step")
+        if self.keep_last and isinstance(step, int) and step % self.keep_last == 0:
+            params = (
+                thread_id,
+                checkpoint_ns,
+                thread_id,
+                checkpoint_ns,
+                self.keep_last - 1,
+            )
+            statements.append((DELETE_OLD_WRITES, params))
+            statements.append((DELETE_OLD_CHECKPOINTS, params))
+        self._buffer(statements, commit=True)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        statements = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, data = self.serde.dumps_typed(value)
+            statements.append(
+                (
+                    REPLACE_WRITE if idx < 0 else INSERT_WRITE,
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        idx,
+                        channel,
+                        type_,
+                        data,
+                        task_path,
+                    ),
+                )
+            )
+        final = any(channel in _FINAL_CHANNELS for channel, _ in writes)
+        self._buffer(statements, commit=final)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._db_lock:
+            self._flush_locked()
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            self._conn.execute("COMMIT")
+
+    def prune(
+        self, thread_ids: Sequence[str], *, strategy: str = "keep_latest"
+    ) -> None:
+        """keep_latest 只保留每个 thread 最新的 checkpoint，delete 删除整个 thread"""
+        if strategy not in ("keep_latest", "delete"):
+            raise ValueError(f"未知的 strategy: {strategy}")
+        with self._db_lock:
+            self._flush_locked()
+            self._conn.execute("BEGIN")
+            for thread_id in thread_ids:
+                if strategy == "delete":
+                    self._conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ?", (thread_id,)
+                    )
+                    self._conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                    )
+                    continue
+                namespaces = self._conn.execute(
+                    "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?",
+                    (thread_id,),
+                ).fetchall()
+                for (checkpoint_ns,) in namespaces:
+                    params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, 0)
+                    self._conn.execute(DELETE_OLD_WRITES, params)
+                    self._conn.execute(DELETE_OLD_CHECKPOINTS, params)
+            self._conn.execute("COMMIT")
+            self._sweep_locked()
+
+    def compact(self, vacuum: bool = False) -> int:
+        """
+        所有 thread 只保留最近 keep_last 个 checkpoint，并把 WAL 写回数据库文件
+
+        Returns:
+            int: 删除的 checkpoint 数
+        """
+        with self._db_lock:
+            self._flush_locked()
+            deleted = 0
+            if self.keep_last:
+                self._conn.execute("BEGIN")
+                deleted = self._conn.execute(
+                    """
+                    DELETE FROM checkpoints WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY thread_id, checkpoint_ns
+                                ORDER BY checkpoint_id DESC
+                            ) AS n FROM checkpoints
+                        ) WHERE n > ?
+                    )
+                    """,
+                    (self.keep_last,),
+                ).rowcount
+                self._conn.execute("""
+                    DELETE FROM writes WHERE NOT EXISTS (
+                        SELECT 1 FROM checkpoints c
+                        WHERE c.thread_id = writes.thread_id
+                        AND c.checkpoint_ns = writes.checkpoint_ns
+                        AND c.checkpoint_id = writes.checkpoint_id
+                    )
+                    """)
+                self._conn.execute("COMMIT")
+            self._sweep_locked()
+            if vacuum:
+                self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return deleted
+
+    def _sweep_locked(self) -> None:
+        """serde 有 sweep() 时（DeltaSerializer），删除剩下的 checkpoint 都不再引用的数据"""
+        sweep = getattr(self.serde, "sweep", None)
+        if sweep is None:
+            return
+        blobs = itertools.chain(
+            self._conn.execute("SELECT type, checkpoint FROM checkpoints"),
+            self._conn.execute("SELECT type, value FROM writes"),
+        )
+        sweep(blobs)
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._flush_locked()
+            self._conn.close()
+
+    # ---- 读取 ----
+
+    def _tuple(self, row: Tuple[Any, ...]) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_checkpoint_id,
+            type_,
+            data,
+            metadata_type,
+            metadata_data,
+        ) = row
+        writes = self._conn.execute(
+            """
+            SELECT task_id, channel, type, value FROM writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+            ORDER BY task_path, task_id, idx
+            """,
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, data)),
+            metadata=self.serde.loads_typed((metadata_type, metadata_data)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._db_lock:
+            self._flush_locked()
+            if checkpoint_id:
+                row = self._conn.execute(
+                    """
+                    SELECT * FROM checkpoints
+                    WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+                    """,
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    """
+                    SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                    ORDER BY checkpoint_id DESC LIMIT 1
+                    """,
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return None if row is None else self._tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = "SELECT * FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        # 先取出结果再产出，迭代期间不占用连接
+        results = []
+        with self._db_lock:
+            self._flush_locked()
+            for row in self._conn.execute(sql, params).fetchall():
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if not all(metadata.get(k) == v for k, v in filter.items()):
+                        continue
+                results.append(self._tuple(row))
+        yield from results
+
+    # ---- 异步接口：直接调用同步实现 ----
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    async def aprune(
+        self, thread_ids: Sequence[str], *, strategy: str = "keep_latest"
+    ) -> None:
+        self.prune(thread_ids, strategy=strategy)
@@ -0,0 +1,264 @@
+# 2026/10/18
+# zhangzhong
+# agent 只运行一次，把决策事件和 token 事件分发给任意多个订阅者
+
+"""
+以前展示决策过程和流式 token 要各开一个线程，分别用 stream_mode="values" 和
+stream_mode="messages" 调用 agent_executor.stream，同一个请求会把整个 ReAct 循环跑两遍：
+模型和搜索工具的调用次数翻倍，两次运行的结果也可能不一致。
+
+这里用 stream_mode=["values", "messages"] 只运行一次，把两种输出转换为有类型的事件，
+由一个生产者线程按收到的顺序放入每个订阅者自己的有界队列，
+因此每个订阅者看到的决策事件和 token 事件的相对顺序都与 agent 的执行顺序一致。
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+from dataclasses import dataclass
+import logging
+import queue
+import threading
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DecisionEvent:
+    """
+    agent 的一步决策
+
+    kind:
+        "tool_call"    决定调用工具，tool_call 为 {"name", "args", "id"}
+        "tool_result"  工具执行完成，message 为 ToolMessage
+        "ai_message"   不再调用工具的 AI 回复
+    """
+
+    kind: str
+    message: Any
+    tool_call: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class TokenEvent:
+    """模型流式输出的一段文本"""
+
+    text: str
+    node: Optional[str] = None
+
+
+@dataclass
+class EndEvent:
+    """运行结束；error 为运行中抛出的异常"""
+
+    error: Optional[BaseException] = None
+
+
+StreamEvent = Union[DecisionEvent, TokenEvent, EndEvent]
+
+# 一次运行同时得到状态（决策）和模型输出（token）
+STREAM_MODES = ["values", "messages"]
+
+
+def _message_text(message: Any) -> str:
+    # 新版本 text 是属性，旧版本是方法
+    text = getattr(message, "text", "")
+    if not isinstance(text, str) and callable(text):
+        text = text()
+    return str(text)
+
+
+def decision_events(message: Any) -> List[DecisionEvent]:
+    """把 values 模式中新出现的一条消息转换为决策事件"""
+    if isinstance(message, ToolMessage):
+        return [DecisionEvent("tool_result", message)]
+    if isinstance(message, AIMessage):
+        if message.tool_calls:
+            return [
+                DecisionEvent("tool_call", message, tool_call)
+                for tool_call in message.tool_calls
+            ]
+        if message.content:
+            return [DecisionEvent("ai_message", message)]
+    return []
+
+
+class StreamEventConverter:
+    """
+    把 stream_mode=STREAM_MODES 的输出 (mode, chunk) 转换为事件
+
+    values 模式每次给出完整状态，这里记住已经看过的消息数，
+    只为新出现的消息生成决策事件；一次运行使用一个转换器。
+    metrics 为 stream_metrics.RequestMetrics 时记录这次运行的延迟统计。
+    """
+
+    def __init__(self, metrics: Any = None) -> None:
+        self._seen: Optional[int] = None
+        self.metrics = metrics
+
+    def convert(self, mode: str, chunk: Any) -> List[StreamEvent]:
+        events = self._convert(mode, chunk)
+        if self.metrics is not None:
+            self.metrics.record(mode, chunk, events)
+        return events
+
+    def _convert(self, mode: str, chunk: Any) -> List[StreamEvent]:
+        if mode == "messages":
+            message, metadata = chunk
+            if not isinstance(message, AIMessage):
+                return []
+            text = _message_text(message)
+            if not text:
+                return []
+            return [TokenEvent(text, metadata.get("langgraph_node"))]
+
+        messages = chunk.get("messages", []) if isinstance(chunk, dict) else []
+        if self._seen is None or len(messages) < self._seen:
+            # 第一个状态是输入和历史消息，不是这次运行的决策
+            new_messages = [] if self._seen is None else messages[-1:]
+        else:
+            new_messages = messages[self._seen :]
+        self._seen = len(messages)
+        return [event for message in new_messages for event in decision_events(message)]
+
+
+class Subscription:
+    """一个订阅者：迭代得到事件，运行结束时停止迭代"""
+
+    def __init__(self, maxsize: int, kinds: Optional[Sequence[type]]) -> None:
+        self._queue: "queue.Queue[StreamEvent]" = queue.Queue(maxsize)
+        self._kinds = tuple(kinds) if kinds else None
+        self.closed = False
+        self.error: Optional[BaseException] = None
+
+    def wants(self, event: StreamEvent) -> bool:
+        return (
+            self._kinds is None
+            or isinstance(event, EndEvent)
+            or isinstance(event, self._kinds)
+        )
+
+    def offer(self, event: StreamEvent) -> bool:
+        """由生产者调用；队列满时阻塞等待，订阅者关闭后返回 False"""
+        while not self.closed:
+            try:
+                self._queue.put(event, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self) -> None:
+        """不再接收事件；所有订阅者都关闭后 agent 会提前停止"""
+        self.closed = True
+
+    def get(self, timeout: Optional[float] = None) -> StreamEvent:
+        return self._queue.get(timeout=timeout)
+
+    def __iter__(self) -> Iterator[StreamEvent]:
+        while True:
+            event = self._queue.get()
+            if isinstance(event, EndEvent):
+                self.error = event.error
+                self.closed = True
+                return
+            yield event
+
+
+class AgentStreamBroadcaster:
+    """
+    运行一次 agent，把事件分发给所有订阅者
+
+    用法:
+        broadcaster = AgentStreamBroadcaster(agent_executor)
+        decisions = broadcaster.subscribe(kinds=[DecisionEvent])
+        tokens = broadcaster.subscribe(kinds=[TokenEvent])
+        broadcaster.start({"messages": [input_message]}, config)
+        for event in tokens: ...
+
+    每个订阅者的队列都是有界的，某个订阅者消费太慢时生产者会等待它，
+    不会丢事件，也不会无限占用内存。订阅要在 start 之前完成。
+    """
+
+    def __init__(
+        self, agent_executor: Any, maxsize: int = 256, metrics: Any = None
+    ) -> None:
+        """
+        Args:
+            agent_executor: agent
+            maxsize: 每个订阅者的队列长度
+            metrics: stream_metrics.MetricsRegistry，记录每次运行的延迟统计
+        """
+        self.agent_executor = agent_executor
+        self.maxsize = maxsize
+        self.metrics = metrics
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self,
+        kinds: Optional[Sequence[type]] = None,
+        maxsize: Optional[int] = None,
+    ) -> Subscription:
+        """
+        添加一个订阅者
+
+        Args:
+            kinds: 只接收这些类型的事件，如 [DecisionEvent]；None 表示全部
+            maxsize: 队列长度，默认使用构造时的 maxsize
+
+        Returns:
+            Subscription: 订阅者
+        """
+        subscription = Subscription(maxsize or self.maxsize, kinds)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def _publish(self, event: StreamEvent) -> bool:
+        """分发一个事件，返回是否还有订阅者"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        alive = []
+        for subscription in subscribers:
+            if subscription.closed:
+                continue
+            if not subscription.wants(event) or subscription.offer(event):
+                alive.append(subscription)
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if not s.closed]
+        return bool(alive)
+
+    def run(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None):
+        """在当前线程中运行 agent 并分发事件，结束时向所有订阅者发送 EndEvent"""
+        error = None
+        request = self.metrics.start() if self.metrics is not None else None
+        converter = StreamEventConverter(request)
+        try:
+            for mode, chunk in self.agent_executor.stream(
+                inputs, config, stream_mode=STREAM_MODES
+            ):
+                for event in converter.convert(mode, chunk):
+                    if not self._publish(event):
+                        logger.info("所有订阅者都已关闭，停止运行 agent")
+                        return
+        except Exception as e:
+            logger.error("agent 运行出错: %s", e)
+            error = e
+        finally:
+            # 先通知订阅者结束，统计出错也不能让客户端一直等下去
+            self._publish(EndEvent(error))
+            if request is not None:
+                try:
+                    request.finish(error)
+                    self.metrics.record(request)
+                except Exception:
+                    logger.exception("记录延迟统计出错")
+
+    def start(
+        self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None
+    ) -> threading.Thread:
+        """在后台线程中运行，返回该线程"""
+        thread = threading.Thread(target=self.run, args=(inputs, config), daemon=True)
+        thread.start()
+        return thread
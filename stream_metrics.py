@@ -0,0 +1,274 @@
+# 2026/10/18
+# zhangzhong
+# agent 流式输出的延迟统计：首 token 时间、token 间隔、节点耗时、工具往返时间
+
+"""
+每个请求一个 RequestMetrics，由 StreamEventConverter 在收到每个 (mode, chunk) 时调用 record。
+热路径上只有一次计时、几次加法和一次 bisect，可以在生产环境常开。
+
+统计内容:
+    - ttft: 从开始运行到第一个 token 的时间
+    - 相邻 token 间隔的直方图
+    - 每个 LangGraph 节点（metadata["langgraph_node"]）的耗时：
+      两个事件之间的时间记到产生后一个事件的节点上，values 事件记到当前节点
+    - 工具往返时间：决定调用工具（tool_call）到收到对应结果（tool_result）
+    - token 数（流式块数），以及模型返回的 usage_metadata 中的输出 token 数
+
+MetricsRegistry 汇总所有请求，导出为 JSON lines（每个请求一行）和 Prometheus 文本格式。
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Set, TextIO, Tuple
+from bisect import bisect_left
+import json
+import threading
+import time
+
+from stream_broadcaster import TokenEvent
+
+# 直方图桶的上界（秒），最后一个桶为 +Inf
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """累积前的直方图：每个桶的计数、总和与样本数"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": list(self.buckets),
+            "counts": self.counts,
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class RequestMetrics:
+    """一个请求的延迟统计"""
+
+    def __init__(self, request_id: Optional[str] = None, clock=time.perf_counter):
+        self.request_id = request_id
+        self.clock = clock
+        self.start = clock()
+        self.end: Optional[float] = None
+        self.ttft: Optional[float] = None
+        self.tokens = 0
+        self.output_tokens = 0  # usage_metadata 中的输出 token 数
+        self.inter_token = Histogram()
+        self.node_seconds: Dict[str, float] = {}
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+        self._last_event = self.start
+        self._last_token: Optional[float] = None
+        self._node: Optional[str] = None
+        self._pending_tools: Dict[str, Tuple[str, float]] = {}
+        self._counted: Set[int] = set()
+
+    def record(self, mode: str, chunk: Any, events: Sequence[Any]) -> None:
+        """记录一个流式输出；events 为它转换得到的事件"""
+        now = self.clock()
+        if mode == "messages":
+            node = chunk[1].get("langgraph_node")
+            if node is not None:
+                self._node = node
+        node = self._node or "__start__"
+        self.node_seconds[node] = (
+            self.node_seconds.get(node, 0.0) + now - self._last_event
+        )
+        self._last_event = now
+
+        for event in events:
+            if isinstance(event, TokenEvent):
+                if self._last_token is None:
+                    self.ttft = now - self.start
+                else:
+                    self.inter_token.observe(now - self._last_token)
+                self._last_token = now
+                self.tokens += 1
+            elif event.kind == "tool_call":
+                self._pending_tools[event.tool_call["id"]] = (
+                    event.tool_call["name"],
+                    now,
+                )
+                self._count_usage(event.message)
+            elif event.kind == "tool_result":
+                pending = self._pending_tools.pop(event.message.tool_call_id, None)
+                if pending is not None:
+                    name, started = pending
+                    self.tool_calls.append({"name": name, "seconds": now - started})
+            else:
+                self._count_usage(event.message)
+
+    def _count_usage(self, message: Any) -> None:
+        # 一条消息可能有多个工具调用，只计一次
+        if id(message) in self._counted:
+            return
+        self._counted.add(id(message))
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self.output_tokens += usage.get("output_tokens", 0)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.end = self.clock()
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+
+    @property
+    def total(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "total_seconds": self.total,
+            "ttft_seconds": self.ttft,
+            "tokens": self.tokens,
+            "output_tokens": self.output_tokens,
+            "inter_token_seconds": self.inter_token.to_dict(),
+            "node_seconds": self.node_seconds,
+            "tool_calls": self.tool_calls,
+            "error": self.error,
+        }
+
+
+class MetricsRegistry:
+    """
+    汇总所有请求的统计
+
+    Args:
+        jsonl: 每个请求结束时写一行 JSON 的文件路径或文本流；None 表示不写
+    """
+
+    def __init__(self, jsonl: Any = None) -> None:
+        self._lock = threading.Lock()
+        self._owns_file = isinstance(jsonl, str)
+        self._jsonl: Optional[TextIO] = (
+            open(jsonl, "a", encoding="utf-8") if isinstance(jsonl, str) else jsonl
+        )
+        self.requests = {"ok": 0, "error": 0}
+        self.tokens = 0
+        self.output_tokens = 0
+        self.ttft = Histogram()
+        self.inter_token = Histogram()
+        self.request_seconds = Histogram()
+        self.node_seconds: Dict[str, float] = {}
+        self.tool_seconds: Dict[str, Histogram] = {}
+
+    def start(self, request_id: Optional[str] = None) -> RequestMetrics:
+        return RequestMetrics(request_id)
+
+    def record(self, metrics: RequestMetrics) -> None:
+        """合并一个已结束请求的统计"""
+        line = json.dumps(metrics.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self.requests["error" if metrics.error else "ok"] += 1
+            self.tokens += metrics.tokens
+            self.output_tokens += metrics.output_tokens
+            if metrics.ttft is not None:
+                self.ttft.observe(metrics.ttft)
+            if metrics.total is not None:
+                self.request_seconds.observe(metrics.total)
+            self.inter_token.merge(metrics.inter_token)
+            for node, seconds in metrics.node_seconds.items():
+                self.node_seconds[node] = self.node_seconds.get(node, 0.0) + seconds
+            for call in metrics.tool_calls:
+                histogram = self.tool_seconds.get(call["name"])
+                if histogram is None:
+                    histogram = self.tool_seconds[call["name"]] = Histogram()
+                histogram.observe(call["seconds"])
+            if self._jsonl is not None:
+                self._jsonl.write(line + "\n")
+                self._jsonl.flush()
+
+    def close(self) -> None:
+        if self._owns_file and self._jsonl is not None:
+            self._jsonl.close()
+
+    def prometheus_text(self, prefix: str = "agent_stream") -> str:
+        """导出为 Prometheus 文本格式"""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, samples: Dict[str, float]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in samples.items():
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def histogram(name: str, help_text: str, series: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for labels, h in series.items():
+                extra = labels[1:-1] + "," if labels else ""
+                cumulative = 0
+                for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{prefix}_{name}_bucket{{{extra}le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"{prefix}_{name}_sum{labels} {h.sum}")
+                lines.append(f"{prefix}_{name}_count{labels} {h.count}")
+
+        with self._lock:
+            counter(
+                "requests_total",
+                "Agent stream requests.",
+                {f'{{status="{k}"}}': v for k, v in self.requests.items()},
+            )
+            counter("tokens_total", "Streamed token chunks.", {"": self.tokens})
+            counter(
+                "output_tokens_total",
+                "Output tokens reported by the model.",
+                {"": self.output_tokens},
+            )
+            histogram("ttft_seconds", "Time to first token.", {"": self.ttft})
+            histogram(
+                "inter_token_seconds",
+                "Latency between consecutive tokens.",
+                {"": self.inter_token},
+            )
+            histogram(
+                "request_seconds", "Total request time.", {"": self.request_seconds}
+            )
+            counter(
+                "node_seconds_total",
+                "Time spent in each LangGraph node.",
+                {f'{{node="{k}"}}': v for k, v in sorted(self.node_seconds.items())},
+            )
+            histogram(
+                "tool_seconds",
+                "Tool round-trip time.",
+                {f'{{tool="{k}"}}': v for k, v in sorted(self.tool_seconds.items())},
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,348 @@
+# 2026/10/18
+# zhangzhong
+# 录制 agent 的流式输出并按原速、最快速度或 N 倍速回放
+
+"""
+每次运行 agent_streaming_demo.py 都要实际调用 DeepSeek 和 Tavily，
+没法单独对流式处理代码做压测，也没法复现一次很慢的运行。
+
+RecordingAgent 包装 agent_executor，把 stream/astream 的每个输出
+（messages 模式的 (chunk, metadata)、values 模式的状态）连同相对时间写入 gzip 压缩的 JSON lines 文件；
+ReplayAgent 读取录制文件，提供同样的 stream/astream 接口，
+可以直接替换 agent_executor 交给 AgentStreamBroadcaster、AsyncStreamingAgent 或 SSE 服务。
+
+文件格式（每行一个 JSON 对象）:
+    {"format": "agent-stream", "version": 1, "stream_mode": ...}    文件头
+    {"m": 0, "v": {...}}                        消息表：values 中的消息只存一次
+    {"d": 0, "v": {...}}                        metadata 表：相同的 metadata 只存一次
+    {"t": 0.12, "mode": "messages", "msg": {...}, "meta": 0}
+    {"t": 0.50, "mode": "values", "refs": [0, 1], "state": {...}}
+values 每次都是完整的消息列表，按引用存储后文件大小与消息数成线性关系。
+
+用法:
+    python stream_recorder.py record run.jsonl.gz --message "What's the weather in Beijing?"
+    python stream_recorder.py replay run.jsonl.gz --speed 10
+    python stream_recorder.py info run.jsonl.gz
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
+import gzip
+import json
+import math
+import time
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+FORMAT = "agent-stream"
+VERSION = 1
+
+StreamMode = Union[str, List[str], None]
+
+
+class StreamRecorder:
+    """把一次运行的流式输出写入录制文件"""
+
+    def __init__(self, path: str, stream_mode: StreamMode) -> None:
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._multi = isinstance(stream_mode, (list, tuple))
+        self._messages: Dict[int, Tuple[int, BaseMessage]] = {}
+        self._metadata: Dict[str, int] = {}
+        self._write({"format": FORMAT, "version": VERSION, "stream_mode": stream_mode})
+        self.start = time.perf_counter()
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        self._file.write(
+            json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+        )
+        self._file.write("\n")
+
+    def _message_ref(self, message: BaseMessage) -> int:
+        # 以对象身份去重；表中保留对象引用，避免 id 被复用
+        entry = self._messages.get(id(message))
+        if entry is None:
+            entry = (len(self._messages), message)
+            self._messages[id(message)] = entry
+            self._write({"m": entry[0], "v": message_to_dict(message)})
+        return entry[0]
+
+    def _metadata_ref(self, metadata: Dict[str, Any]) -> int:
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        ref = self._metadata.get(key)
+        if ref is None:
+            ref = self._metadata[key] = len(self._metadata)
+            self._write({"d": ref, "v": json.loads(key)})
+        return ref
+
+    def record(self, item: Any, mode: Optional[str] = None) -> None:
+        """
+        记录一个输出
+
+        Args:
+            item: stream 产出的原始对象；多个 stream_mode 时为 (mode, chunk)
+            mode: 单个 stream_mode 时的模式名
+        """
+        t = time.perf_counter() - self.start
+        if self._multi:
+            mode, chunk = item
+        else:
+            chunk = item
+
+        line: Dict[str, Any] = {"t": round(t, 6), "mode": mode}
+        if mode == "messages":
+            message, metadata = chunk
+            line["msg"] = message_to_dict(message)
+            line["meta"] = self._metadata_ref(metadata)
+        elif (
+            mode == "values"
+            and isinstance(chunk, dict)
+            and isinstance(chunk.get("messages"), list)
+        ):
+            line["refs"] = [self._message_ref(m) for m in chunk["messages"]]
+            line["state"] = {k: v for k, v in chunk.items() if k != "messages"}
+        else:
+            line["data"] = chunk
+        self._write(line)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _mode_of(stream_mode: StreamMode) -> Optional[str]:
+    return stream_mode if isinstance(stream_mode, str) else None
+
+
+class RecordingAgent:
+    """
+    包装 agent_executor，录制每次 stream/astream 的输出
+
+    path 可以包含 {n}，第 n 次运行写入各自的文件；否则每次运行覆盖同一个文件。
+    其他属性（如 get_state）转发给原 agent。
+    """
+
+    def __init__(self, agent_executor: Any, path: str) -> None:
+        self.agent_executor = agent_executor
+        self.path = path
+        self.runs = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.agent_executor, name)
+
+    def _recorder(self, stream_mode: StreamMode) -> StreamRecorder:
+        path = self.path.format(n=self.runs)
+        self.runs += 1
+        return StreamRecorder(path, stream_mode)
+
+    def stream(
+        self, inputs: Any, config: Any = None, *, stream_mode: StreamMode = None, **kw
+    ) -> Iterator[Any]:
+        recorder = self._recorder(stream_mode)
+        mode = _mode_of(stream_mode)
+        try:
+            for item in self.agent_executor.stream(
+                inputs, config, stream_mode=stream_mode, **kw
+            ):
+                recorder.record(item, mode)
+                yield item
+        finally:
+            recorder.close()
+
+    async def astream(
+        self, inputs: Any, config: Any = None, *, stream_mode: StreamMode = None, **kw
+    ) -> AsyncIterator[Any]:
+        recorder = self._recorder(stream_mode)
+        mode = _mode_of(stream_mode)
+        try:
+            async for item in self.agent_executor.astream(
+                inputs, config, stream_mode=stream_mode, **kw
+            ):
+                recorder.record(item, mode)
+                yield item
+        finally:
+            recorder.close()
+
+
+def load_recording(path: str) -> Tuple[StreamMode, List[Tuple[float, str, Any]]]:
+    """
+    读取录制文件
+
+    Returns:
+        Tuple: (录制时的 stream_mode, [(相对时间, 模式, chunk), ...])
+    """
+    messages: Dict[int, BaseMessage] = {}
+    metadata: Dict[int, Dict[str, Any]] = {}
+    items: List[Tuple[float, str, Any]] = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"不是 {FORMAT} v{VERSION} 录制文件: {path}")
+        for line in f:
+            obj = json.loads(line)
+            if "m" in obj:
+                messages[obj["m"]] = messages_from_dict([obj["v"]])[0]
+            elif "d" in obj:
+                metadata[obj["d"]] = obj["v"]
+            elif "msg" in obj:
+                message = messages_from_dict([obj["msg"]])[0]
+                items.append((obj["t"], obj["mode"], (message, metadata[obj["meta"]])))
+            elif "refs" in obj:
+                state = dict(obj["state"])
+                state["messages"] = [messages[ref] for ref in obj["refs"]]
+                items.append((obj["t"], obj["mode"], state))
+            else:
+                items.append((obj["t"], obj["mode"], obj["data"]))
+    return header["stream_mode"], items
+
+
+class ReplayAgent:
+    """
+    回放录制文件，接口与 agent_executor.stream/astream 相同，输入被忽略
+
+    Args:
+        path: 录制文件
+        speed: 1 为原速，N 为 N 倍速，0 或 math.inf 为不等待、尽快输出
+    """
+
+    def __init__(self, path: str, speed: float = 1.0) -> None:
+        self.stream_mode, self.items = load_recording(path)
+        self.speed = speed
+
+    @property
+    def duration(self) -> float:
+        """录制时的总时长（秒）"""
+        return self.items[-1][0] if self.items else 0.0
+
+    def _select(self, stream_mode: StreamMode) -> List[Tuple[float, Any]]:
+        """按请求的 stream_mode 筛选并整理输出的形式"""
+        if stream_mode is None:
+            stream_mode = self.stream_mode
+        recorded = self.stream_mode
+        recorded_modes = (
+            set(recorded) if isinstance(recorded, (list, tuple)) else {recorded}
+        )
+        wanted = (
+            stream_mode if isinstance(stream_mode, (list, tuple)) else [stream_mode]
+        )
+        missing = set(wanted) - recorded_modes
+        if missing:
+            raise ValueError(f"录制文件中没有这些 stream_mode: {sorted(missing)}")
+
+        multi = isinstance(stream_mode, (list, tuple))
+        return [
+            (t, (mode, chunk) if multi else chunk)
+            for t, mode, chunk in self.items
+            if mode in wanted
+        ]
+
+    def _scale(self, t: float) -> float:
+        if not self.speed or math.isinf(self.speed):
+            return 0.0
+        return t / self.speed
+
+    def stream(
+        self,
+        inputs: Any = None,
+        config: Any = None,
+        *,
+        stream_mode: StreamMode = None,
+        **kw,
+    ) -> Iterator[Any]:
+        items = self._select(stream_mode)
+        start = time.perf_counter()
+        for t, item in items:
+            # 按绝对时间表等待，不累积误差
+            delay = start + self._scale(t) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield item
+
+    async def astream(
+        self,
+        inputs: Any = None,
+        config: Any = None,
+        *,
+        stream_mode: StreamMode = None,
+        **kw,
+    ) -> AsyncIterator[Any]:
+        items = self._select(stream_mode)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for t, item in items:
+            delay = start + self._scale(t) - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield item
+
+
+def main() -> None:
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="录制和回放 agent 的流式输出")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="运行 agent 并录制")
+    record.add_argument("path")
+    record.add_argument("--message", default="What's the weather in Beijing?")
+    record.add_argument("--fake", action="store_true", help="使用本地假模型")
+
+    replay = commands.add_parser("replay", help="回放并输出 token")
+    replay.add_argument("path")
+    replay.add_argument("--speed", type=float, default=1.0, help="0 为最快速度")
+
+    info = commands.add_parser("info", help="显示录制文件的信息")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    from stream_broadcaster import (
+        STREAM_MODES,
+        AgentStreamBroadcaster,
+        DecisionEvent,
+        TokenEvent,
+    )
+
+    if args.command == "record":
+        if args.fake:
+            from fake_chat_model import create_fake_agent
+
+            agent_executor = create_fake_agent(delay=0.02)
+        else:
+            from agent_streaming_demo import agent_executor
+        agent = RecordingAgent(agent_executor, args.path)
+        config = {"configurable": {"thread_id": "recording"}}
+        for _ in agent.stream(
+            {"messages": [{"role": "user", "content": args.message}]},
+            config,
+            stream_mode=STREAM_MODES,
+        ):
+            pass
+        print(f"已录制到 {args.path}")
+
+    elif args.command == "replay":
+        from token_sink import TokenSink
+
+        broadcaster = AgentStreamBroadcaster(ReplayAgent(args.path, args.speed))
+        subscription = broadcaster.subscribe()
+        broadcaster.start({})
+        with TokenSink() as sink:
+            for event in subscription:
+                if isinstance(event, TokenEvent):
+                    sink.write(event.text)
+                elif isinstance(event, DecisionEvent):
+                    sink.boundary()
+                    print(f"\n[{event.kind}]")
+        print()
+
+    else:
+        agent = ReplayAgent(args.path)
+        modes: Dict[str, int] = {}
+        for _, mode, _ in agent.items:
+            modes[mode] = modes.get(mode, 0) + 1
+        print(f"stream_mode: {agent.stream_mode}")
+        print(f"输出数: {len(agent.items)} {modes}")
+        print(f"时长: {agent.duration:.3f}s")
+        print(f"文件大小: {os.path.getsize(args.path)} 字节")
+
+
+if __name__ == "__main__":
+    main()
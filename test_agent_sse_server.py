@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from agent_sse_server import create_app
+from fake_chat_model import create_fake_agent
+
+
+def call(app, method, path, body=b"", disconnect_after=None):
+    """直接调用 ASGI 应用，返回 (状态码, 响应头, 响应体)"""
+    sent = []
+
+    async def main():
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            chunks = [m for m in sent if m["type"] == "http.response.body"]
+            if disconnect_after is not None and len(chunks) >= disconnect_after:
+                disconnect.set()
+
+        scope = {"type": "http", "method": method, "path": path}
+        await app(scope, receive, send)
+
+    asyncio.run(main())
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+def parse_sse(body: bytes):
+    events = []
+    for block in body.decode().strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def chat(app, message, thread_id=None):
+    payload = {"message": message}
+    if thread_id:
+        payload["thread_id"] = thread_id
+    return call(app, "POST", "/chat", json.dumps(payload).encode())
+
+
+def test_chat_streams_decisions_and_tokens():
+    app = create_app(create_fake_agent(checkpointer=MemorySaver()))
+    status, headers, body = chat(app, "weather?", "t1")
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert headers[b"x-thread-id"] == b"t1"
+
+    events = parse_sse(body)
+    kinds = [name for name, _ in events if name != "token"]
+    assert kinds == ["tool_call", "tool_result", "message", "end"]
+    assert events[0][0] == "token"
+    tool_call = next(data for name, data in events if name == "tool_call")
+    assert tool_call["name"] == "fake_search"
+    answer = "".join(data["text"] for name, data in events if name == "token")
+    assert answer.endswith("This is a fake answer from the local model.")
+    assert events[-1] == ("end", {"error": None})
+
+
+def test_thread_id_maps_to_checkpointer():
+    executor = create_fake_agent(checkpointer=MemorySaver())
+    app = create_app(executor)
+    chat(app, "first", "t1")
+    chat(app, "second", "t1")
+    _, headers, _ = chat(app, "other")
+
+    state = executor.get_state({"configurable": {"thread_id": "t1"}})
+    humans = [m.content for m in state.values["messages"] if m.type == "human"]
+    assert humans == ["first", "second"]
+    assert headers[b"x-thread-id"] not in (b"", b"t1")
+
+
+def test_bad_requests():
+    app = create_app(create_fake_agent(checkpointer=MemorySaver()))
+    assert call(app, "POST", "/chat", b"not json")[0] == 400
+    assert call(app, "POST", "/chat", b'{"thread_id": "x"}')[0] == 400
+    assert call(app, "GET", "/nope")[0] == 404
+    status, _, body = call(app, "GET", "/health")
+    assert status == 200 and json.loads(body)["active_sessions"] == 0
+
+
+def test_disconnect_cancels_session():
+    app = create_app(create_fake_agent(delay=0.01, checkpointer=MemorySaver()))
+    payload = json.dumps({"message": "hi", "thread_id": "t1"}).encode()
+    status, _, body = call(app, "POST", "/chat", payload, disconnect_after=2)
+    assert status == 200
+    assert "end" not in [name for name, _ in parse_sse(body)]
+    assert app.agent.active_sessions == 0
+
+
+def test_load_test_against_local_server():
+    pytest.importorskip("uvicorn")
+    from benchmarks.sse_load_test import run_load_test, serve_in_thread
+
+    app = create_app(create_fake_agent(checkpointer=MemorySaver()))
+    url, server, thread = serve_in_thread(app)
+    try:
+        stats = asyncio.run(run_load_test(url, concurrency=20))
+    finally:
+        server.should_exit = True
+        thread.join()
+    assert stats["streams"] == 20
+    assert stats["dropped"] == 0
+    assert stats["ttfb_p50"] > 0
+    assert stats["total_tokens_per_second"] > 0
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from async_streaming_agent import AsyncStreamingAgent
+from stream_broadcaster import DecisionEvent, EndEvent, TokenEvent
+from stream_metrics import MetricsRegistry
+
+
+class FakeAgent:
+    """只实现 astream 的假 agent：输出若干 token，最后给出完整回复"""
+
+    def __init__(self, tokens=5, fail=False):
+        self.tokens = tokens
+        self.fail = fail
+        self.started = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    async def astream(self, inputs, config, stream_mode):
+        self.started += 1
+        messages = [HumanMessage(inputs["messages"][0]["content"])]
+        try:
+            yield "values", {"messages": messages}
+            for i in range(self.tokens):
+                await asyncio.sleep(0)
+                yield "messages", (AIMessageChunk(content=f"t{i}"), {})
+            if self.fail:
+                raise RuntimeError("模型出错")
+            answer = AIMessage(content="".join(f"t{i}" for i in range(self.tokens)))
+            yield "values", {"messages": messages + [answer]}
+            self.finished += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+async def collect(agent, thread_id):
+    return [event async for event in agent.stream(user("hi"), thread_id)]
+
+
+def test_many_sessions_on_one_loop():
+    fake = FakeAgent()
+    agent = AsyncStreamingAgent(fake, buffer_size=2)
+
+    async def main():
+        return await asyncio.gather(*(collect(agent, f"s{i}") for i in range(500)))
+
+    results = asyncio.run(main())
+    assert fake.finished == 500
+    assert agent.active_sessions == 0
+    for events in results:
+        assert [type(event) for event in events] == [TokenEvent] * 5 + [
+            DecisionEvent,
+            EndEvent,
+        ]
+        assert events[-1].error is None
+
+
+def test_client_disconnect_cancels_run():
+    fake = FakeAgent(tokens=1000)
+    agent = AsyncStreamingAgent(fake, buffer_size=4)
+
+    async def main():
+        stream = agent.stream(user("hi"), "s")
+        async for event in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert fake.cancelled == 1
+    assert agent.active_sessions == 0
+
+
+def test_cancel_and_errors_end_the_stream():
+    fake = FakeAgent(tokens=1000)
+    agent = AsyncStreamingAgent(fake, buffer_size=4)
+
+    async def main():
+        events = []
+        async for event in agent.stream(user("hi"), "s"):
+            events.append(event)
+            if len(events) == 2:
+                assert agent.cancel("s")
+        return events
+
+    events = asyncio.run(main())
+    assert isinstance(events[-1].error, asyncio.CancelledError)
+
+    failing = AsyncStreamingAgent(FakeAgent(fail=True))
+    events = asyncio.run(collect(failing, "s"))
+    assert isinstance(events[-1], EndEvent)
+    assert isinstance(events[-1].error, RuntimeError)
+
+
+def test_same_thread_cannot_run_twice():
+    agent = AsyncStreamingAgent(FakeAgent(tokens=100))
+
+    async def main():
+        first = agent.stream(user("hi"), "s")
+        await first.__anext__()
+        with pytest.raises(ValueError):
+            await collect(agent, "s")
+        await first.aclose()
+
+    asyncio.run(main())
+
+
+def test_busy_thread_rejected_while_waiting_for_a_slot():
+    agent = AsyncStreamingAgent(FakeAgent(tokens=100), max_sessions=1)
+
+    async def main():
+        first = agent.stream(user("hi"), "a")
+        await first.__anext__()
+        # 名额已满，排队中的 b 占住了会话
+        waiting = asyncio.ensure_future(collect(agent, "b"))
+        await asyncio.sleep(0)
+        assert agent.active_sessions == 1
+        # 同一会话的第二个请求不排队，立即被拒绝
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(collect(agent, "b"), timeout=1)
+        # 排队时被取消会释放占住的会话
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert "b" not in agent._sessions
+        await first.aclose()
+        events = await collect(agent, "b")
+        assert events[-1].error is None
+
+    asyncio.run(main())
+
+
+def test_metrics_errors_do_not_block_end_event():
+    class BrokenRegistry(MetricsRegistry):
+        def record(self, metrics):
+            raise RuntimeError("metrics backend down")
+
+    agent = AsyncStreamingAgent(FakeAgent(), metrics=BrokenRegistry())
+    events = asyncio.run(collect(agent, "s"))
+    assert isinstance(events[-1], EndEvent)
+    assert events[-1].error is None
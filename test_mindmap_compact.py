@@ -0,0 +1,62 @@
+from mindmap_compact import CompactMindMap
+from mindmap_converter import MindMapConverter
+
+SIMPLE = {
+    "title": "根",
+    "children": [
+        {"title": "a", "children": [{"title": "a1", "children": []}]},
+        {"title": "b", "children": []},
+        {"title": "a", "children": []},
+    ],
+}
+
+
+def test_from_simple_structure():
+    tree = CompactMindMap.from_simple(SIMPLE)
+    assert len(tree) == 5
+    assert tree.children(0) == [1, 3, 4]
+    assert list(tree.parent) == [-1, 0, 1, 0, 0]
+    # 相同标题只存一份
+    assert tree.titles == ["根", "a", "a1", "b"]
+    assert tree.title(4) == "a"
+
+
+def test_round_trip_matches_converter():
+    tree = CompactMindMap.from_simple(SIMPLE)
+    frontend = MindMapConverter.simple_to_frontend(SIMPLE)
+    assert tree.to_frontend() == frontend
+    assert tree.to_simple() == SIMPLE
+
+    from_frontend = CompactMindMap.from_frontend(frontend)
+    assert from_frontend.to_simple() == MindMapConverter.frontend_to_simple(frontend)
+    assert from_frontend.to_frontend() == frontend
+
+
+def test_validate_and_extract_on_compact_form():
+    tree = CompactMindMap.from_simple(SIMPLE)
+    assert tree.validate_simple_format()
+    assert tree.extract_text_content() == MindMapConverter.extract_text_content(SIMPLE)
+
+    for invalid in (
+        {"title": "根", "children": [{"title": "a"}]},
+        {"children": []},
+        {"title": "根", "children": ["x"]},
+    ):
+        assert not CompactMindMap.from_simple(invalid).validate_simple_format()
+
+
+def test_deep_chain():
+    depth = 5000
+    root = node = {"title": "n", "children": []}
+    for _ in range(depth - 1):
+        child = {"title": "n", "children": []}
+        node["children"].append(child)
+        node = child
+
+    tree = CompactMindMap.from_simple(root)
+    assert len(tree) == depth
+    assert len(tree.titles) == 1
+    # 嵌套太深，不能直接比较字典
+    back = CompactMindMap.from_frontend(tree.to_frontend())
+    assert list(back.parent) == list(tree.parent)
+    assert back.extract_text_content() == MindMapConverter.extract_text_content(root)
@@ -0,0 +1,149 @@
+import json
+
+from mindmap_converter import MindMapConverter
+
+
+def make_chain(depth: int) -> dict:
+    """生成一条深度为 depth 的单链"""
+    root = {"title": "节点0", "children": []}
+    node = root
+    for i in range(1, depth):
+        child = {"title": f"节点{i}", "children": []}
+        node["children"].append(child)
+        node = child
+    return root
+
+
+def test_sample_mindmap_matches_saved_frontend():
+    with open("mindmap.json", "r") as f:
+        mindmap_data = json.load(f)
+    with open("mindmap_frontend.json", "r") as f:
+        expected = f.read()
+
+    frontend_data = MindMapConverter.simple_to_frontend(mindmap_data)
+    assert json.dumps(frontend_data, indent=4) == expected
+
+
+def test_round_trip():
+    simple = {
+        "title": "根",
+        "children": [
+            {"title": "a", "children": [{"title": "a1", "children": []}]},
+            {"title": "b", "children": []},
+        ],
+    }
+    frontend = MindMapConverter.simple_to_frontend(simple)
+    assert frontend["smmVersion"] == "0.14.0-fix.1"
+    assert frontend["data"]["generalization"] == []
+    # 非叶子节点不带根节点属性，空 children 的叶子节点带
+    assert "generalization" not in frontend["children"][0]["data"]
+    assert "generalization" in frontend["children"][1]["data"]
+    assert MindMapConverter.frontend_to_simple(frontend) == simple
+
+
+def test_invalid_child_returns_error():
+    result = MindMapConverter.simple_to_frontend({"title": "根", "children": ["x"]})
+    assert result == {"error": "转换失败: 'str' object has no attribute 'get'"}
+
+
+def test_validate_simple_format():
+    assert MindMapConverter.validate_simple_format(make_chain(3))
+    assert not MindMapConverter.validate_simple_format(
+        {"title": "根", "children": [{"title": "a"}]}
+    )
+    assert not MindMapConverter.validate_simple_format(
+        {"title": "根", "children": [{"title": "a", "children": {}}]}
+    )
+    assert not MindMapConverter.validate_simple_format([])
+
+
+def test_extract_text_content():
+    simple = {
+        "title": "根",
+        "children": [
+            {"title": "a", "children": [{"title": "a1", "children": []}]},
+            {"title": "b", "children": []},
+        ],
+    }
+    expected = "根\n  a\n    a1\n  b\n"
+    assert MindMapConverter.extract_text_content(simple) == expected
+    frontend = MindMapConverter.simple_to_frontend(simple)
+    assert MindMapConverter.extract_text_content(frontend) == expected
+    assert MindMapConverter.extract_text_content({}) == ""
+
+
+def test_deep_chain_does_not_recurse():
+    depth = 5000
+    simple = make_chain(depth)
+
+    assert MindMapConverter.validate_simple_format(simple)
+
+    frontend = MindMapConverter.simple_to_frontend(simple)
+    assert "error" not in frontend
+    back = MindMapConverter.frontend_to_simple(frontend)
+
+    node = back
+    for i in range(depth):
+        assert node["title"] == f"节点{i}"
+        node = node["children"][0] if node["children"] else None
+    assert node is None
+
+    text = MindMapConverter.extract_text_content(frontend)
+    lines = text.splitlines()
+    assert len(lines) == depth
+    assert lines[-1] == "  " * (depth - 1) + f"节点{depth - 1}"
+
+
+def test_wide_fan():
+    simple = {
+        "title": "根",
+        "children": [{"title": str(i), "children": []} for i in range(50000)],
+    }
+    frontend = MindMapConverter.simple_to_frontend(simple)
+    assert [c["data"]["text"] for c in frontend["children"][:3]] == [
+        "<p>0</p>",
+        "<p>1</p>",
+        "<p>2</p>",
+    ]
+    assert MindMapConverter.frontend_to_simple(frontend) == simple
+
+
+def test_convert_many():
+    simple = make_chain(5)
+    mindmaps = [simple, "not json", {"title": "根", "children": ["x"]}, simple]
+
+    results = MindMapConverter.convert_many(mindmaps, chunksize=2, max_workers=2)
+    assert results[0] == results[3] == MindMapConverter.simple_to_frontend(simple)
+    assert results[1] == {"error": "输入数据格式错误"}
+    assert results[2] == {"error": "转换失败: 'str' object has no attribute 'get'"}
+
+    back = MindMapConverter.convert_many(
+        [results[0], {"data": {"text": 1}}], direction="to-simple", max_workers=1
+    )
+    assert back[0] == simple
+    assert back[1]["error"].startswith("转换失败")
+
+
+def test_validate_and_convert():
+    simple = make_chain(4)
+    frontend, errors = MindMapConverter.validate_and_convert(simple)
+    assert errors == []
+    assert frontend == MindMapConverter.simple_to_frontend(simple)
+
+    invalid = {
+        "title": "根",
+        "children": [
+            {"title": "a", "children": [{"children": "x"}]},
+            "b",
+        ],
+    }
+    frontend, errors = MindMapConverter.validate_and_convert(invalid)
+    assert frontend is None
+    assert errors == [{"path": "$.children[0].children[0]", "message": "缺少 title"}]
+
+    _, errors = MindMapConverter.validate_and_convert(invalid, collect_all=True)
+    assert errors == [
+        {"path": "$.children[0].children[0]", "message": "缺少 title"},
+        {"path": "$.children[0].children[0].children", "message": "children 不是列表"},
+        {"path": "$.children[1]", "message": "节点不是对象: str"},
+    ]
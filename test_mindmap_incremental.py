@@ -0,0 +1,70 @@
+import copy
+import json
+from collections import Counter
+
+from mindmap_converter import MindMapConverter
+from mindmap_incremental import IncrementalMindMapConverter, apply_patch
+
+
+def make_map(branches: int = 20, leaves: int = 10) -> dict:
+    return {
+        "title": "根",
+        "children": [
+            {
+                "title": f"分支{i}",
+                "children": [
+                    {"title": f"叶子{i}-{j}", "children": []} for j in range(leaves)
+                ],
+            }
+            for i in range(branches)
+        ],
+    }
+
+
+def test_first_convert_replaces_document():
+    simple = make_map()
+    document, patch = IncrementalMindMapConverter().convert(simple)
+    assert document == MindMapConverter.simple_to_frontend(simple)
+    assert patch == [{"op": "replace", "path": [], "node": document}]
+
+
+def test_one_branch_edit_produces_small_patch():
+    converter = IncrementalMindMapConverter()
+    old = make_map()
+    old_document, _ = converter.convert(old)
+    snapshot = json.dumps(old_document)
+
+    new = copy.deepcopy(old)
+    new["children"][3]["children"][2]["title"] = "改过的叶子"
+    new["children"][5]["children"].pop(0)
+    new["children"][7]["children"].append({"title": "新叶子", "children": []})
+    del new["children"][9]["children"]
+
+    document, patch = converter.convert(new)
+    assert document == MindMapConverter.simple_to_frontend(new)
+    assert Counter((op["op"], tuple(op["path"])) for op in patch) == Counter(
+        [
+            ("update", (3, 2)),
+            ("remove", (5, 0)),
+            ("insert", (7, 10)),
+        ]
+        + [("remove", (9, 0))] * 10
+    )
+    # 未变化的分支复用同一个对象，旧文档不被修改
+    assert document["children"][0] is old_document["children"][0]
+    assert json.dumps(old_document) == snapshot
+    assert apply_patch(old_document, patch) == document
+
+
+def test_unchanged_map_has_empty_patch():
+    converter = IncrementalMindMapConverter()
+    simple = make_map()
+    converter.convert(simple)
+    assert converter.convert(copy.deepcopy(simple))[1] == []
+
+
+def test_invalid_input_keeps_cache():
+    converter = IncrementalMindMapConverter()
+    converter.convert(make_map())
+    assert converter.convert({"title": "根", "children": ["x"]})[1] == []
+    assert converter.convert(make_map())[1] == []
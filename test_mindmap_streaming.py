@@ -0,0 +1,130 @@
+import io
+import json
+
+import pytest
+
+from mindmap_converter import MindMapConverter
+from mindmap_streaming import JsonEventParser, convert_stream
+
+
+def stream(direction: str, data, indent=4, chunk_size=1 << 16) -> str:
+    out = io.StringIO()
+    convert_stream(direction, io.StringIO(json.dumps(data)), out, indent, chunk_size)
+    return out.getvalue()
+
+
+SIMPLE = {
+    "title": "根",
+    "children": [
+        {"title": "a<b>", "children": [{"title": 1, "children": []}]},
+        {"title": 'b "引号" \\', "children": []},
+        {"title": "c"},
+    ],
+}
+
+
+def test_sample_mindmap_matches_saved_frontend():
+    out = io.StringIO()
+    with open("mindmap.json", "r") as f:
+        convert_stream("to-frontend", f, out)
+    with open("mindmap_frontend.json", "r") as f:
+        assert out.getvalue() == f.read()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+@pytest.mark.parametrize("indent", [4, None])
+def test_same_output_as_converter(chunk_size, indent):
+    frontend = MindMapConverter.simple_to_frontend(SIMPLE)
+    assert stream("to-frontend", SIMPLE, indent, chunk_size) == json.dumps(
+        frontend, indent=indent
+    )
+    assert stream("to-simple", frontend, indent, chunk_size) == json.dumps(
+        MindMapConverter.frontend_to_simple(frontend), indent=indent
+    )
+
+
+def test_children_before_title():
+    # 键顺序不同，但 JSON 语义与整体转换一致
+    data = {"children": [{"title": "a", "children": []}], "title": "根"}
+    assert json.loads(stream("to-frontend", data)) == (
+        MindMapConverter.simple_to_frontend(data)
+    )
+
+
+def test_deep_chain():
+    depth = 5000
+    text = '{"title": "n", "children": [' * depth + "]}" * depth
+    out = io.StringIO()
+    convert_stream("to-frontend", io.StringIO(text), out, indent=None)
+    assert out.getvalue().count('"<p>n</p>"') == depth
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        stream("to-frontend", {"title": "根", "children": ["x"]})
+    with pytest.raises(ValueError):
+        convert_stream("to-frontend", io.StringIO('{"title": "根"'), io.StringIO())
+
+
+def test_event_parser_incremental():
+    parser = JsonEventParser()
+    events = []
+    for ch in '{"a": [1.5, -2, "x\\"y", true, null]}':
+        events.extend(parser.feed(ch))
+    events.extend(parser.close())
+    assert events == [
+        ("start_map", None),
+        ("map_key", "a"),
+        ("start_array", None),
+        ("number", 1.5),
+        ("number", -2),
+        ("string", 'x"y'),
+        ("boolean", True),
+        ("null", None),
+        ("end_array", None),
+        ("end_map", None),
+    ]
+
+
+def test_llm_stream_emits_nodes_as_titles_complete():
+    from mindmap_incremental import apply_patch
+    from mindmap_llm_stream import MindMapStreamBuilder
+
+    builder = MindMapStreamBuilder()
+    assert builder.feed("好的，思维导图如下：\n```json\n") == []
+    events = builder.feed('{"title": "根", "children": [{"title": "a", "chi')
+    assert [(event["op"], event["path"]) for event in events] == [
+        ("replace", []),
+        ("insert", [0]),
+    ]
+    # 空的 children 列表关闭后补上根节点属性
+    events += builder.feed('ldren": []}, {"children": [], "title": "b"}]}\n```')
+    events += builder.close()
+    assert [(event["op"], event["path"]) for event in events[2:]] == [
+        ("update", [0]),
+        ("insert", [1]),
+    ]
+
+    expected = MindMapConverter.simple_to_frontend(
+        {
+            "title": "根",
+            "children": [
+                {"title": "a", "children": []},
+                {"title": "b", "children": []},
+            ],
+        }
+    )
+    assert builder.document == expected
+    assert apply_patch({}, events) == expected
+
+
+def test_llm_stream_waits_for_parent_title():
+    from mindmap_llm_stream import stream_mindmap
+
+    text = '{"children": [{"title": "a", "children": []}], "title": "根"}'
+    events = list(stream_mindmap(text[i : i + 4] for i in range(0, len(text), 4)))
+    assert [(event["op"], event["path"]) for event in events] == [
+        ("replace", []),
+        ("insert", [0]),
+        ("update", [0]),
+    ]
@@ -0,0 +1,83 @@
+import asyncio
+
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+from typing_extensions import TypedDict
+
+from fake_chat_model import create_fake_agent
+from sqlite_checkpointer import SQLiteSaver
+
+
+class ReviewState(TypedDict):
+    draft: str
+    decision: str
+
+
+def draft(state):
+    return {"draft": state["draft"] + "!"}
+
+
+def review(state):
+    return {"decision": interrupt({"draft": state["draft"]})}
+
+
+def review_graph(checkpointer):
+    graph = StateGraph(ReviewState)
+    graph.add_node("draft", draft)
+    graph.add_node("review", review)
+    graph.add_edge(START, "draft")
+    graph.add_edge("draft", "review")
+    graph.add_edge("review", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def test_interrupt_survives_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "email-1"}}
+    with SQLiteSaver(path) as saver:
+        result = review_graph(saver).invoke({"draft": "hello"}, config)
+        assert result["__interrupt__"][0].value == {"draft": "hello!"}
+        # 每个超步一次提交，interrupt 单独一次
+        assert saver.commits <= 4
+
+    with SQLiteSaver(path) as saver:
+        app = review_graph(saver)
+        assert app.get_state(config).next == ("review",)
+        result = app.invoke(Command(resume="approved"), config)
+        assert result == {"draft": "hello!", "decision": "approved"}
+
+
+def test_agent_history_and_compaction(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "chat"}}
+    saver = SQLiteSaver(path, keep_last=4)
+    agent = create_fake_agent(checkpointer=saver)
+
+    async def chat():
+        for i in range(5):
+            await agent.ainvoke(
+                {"messages": [{"role": "user", "content": f"{i}"}]}, config
+            )
+
+    asyncio.run(chat())
+    messages = agent.get_state(config).values["messages"]
+    assert [m.content for m in messages if m.type == "human"] == list("01234")
+
+    history = list(saver.list(config))
+    assert 4 <= len(history) < 8
+    ids = [item.config["configurable"]["checkpoint_id"] for item in history]
+    assert ids == sorted(ids, reverse=True)
+    assert len(list(saver.list(config, limit=2))) == 2
+    assert list(saver.list(config, filter={"step": -100})) == []
+
+    saver.compact(vacuum=True)
+    assert len(list(saver.list(config))) == 4
+    saver.close()
+
+    with SQLiteSaver(path) as reopened:
+        state = create_fake_agent(checkpointer=reopened).get_state(config)
+        assert [m.content for m in state.values["messages"]] == [
+            m.content for m in messages
+        ]
+        reopened.delete_thread("chat")
+        assert reopened.get_tuple(config) is None
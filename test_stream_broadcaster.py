@@ -0,0 +1,150 @@
+from typing import Any, Iterator, List
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import tool
+from langgraph.prebuilt import create_react_agent
+
+from stream_broadcaster import (
+    AgentStreamBroadcaster,
+    DecisionEvent,
+    EndEvent,
+    TokenEvent,
+)
+from stream_metrics import MetricsRegistry
+
+
+class FakeToolModel(GenericFakeChatModel):
+    """按词流式输出的假模型，最后一块带上工具调用"""
+
+    calls: List[int] = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator:
+        self.calls.append(1)
+        message = next(self.messages)
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            tool_call_chunks: List[Any] = []
+            if i == len(words) - 1:
+                tool_call_chunks = [
+                    {
+                        "name": call["name"],
+                        "args": str(call["args"]).replace("'", '"'),
+                        "id": call["id"],
+                        "index": n,
+                    }
+                    for n, call in enumerate(message.tool_calls)
+                ]
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=text, tool_call_chunks=tool_call_chunks)
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+@tool
+def add(a: int, b: int) -> int:
+    """两个数相加"""
+    return a + b
+
+
+def make_agent(model: FakeToolModel):
+    return create_react_agent(model, [add])
+
+
+def make_model() -> FakeToolModel:
+    return FakeToolModel(
+        messages=iter(
+            [
+                AIMessage(
+                    content="let me add",
+                    tool_calls=[{"name": "add", "args": {"a": 1, "b": 2}, "id": "c1"}],
+                ),
+                AIMessage(content="the answer is 3"),
+            ]
+        ),
+        calls=[],
+    )
+
+
+def describe(event) -> str:
+    if isinstance(event, TokenEvent):
+        return f"token:{event.text}"
+    return f"{event.kind}"
+
+
+def test_agent_runs_once_and_events_keep_order():
+    model = make_model()
+    broadcaster = AgentStreamBroadcaster(make_agent(model), maxsize=2)
+    everything = broadcaster.subscribe()
+    # 运行中不会被消费，队列要放得下全部决策
+    decisions = broadcaster.subscribe(kinds=[DecisionEvent], maxsize=8)
+    thread = broadcaster.start({"messages": [{"role": "user", "content": "1+2"}]})
+
+    events = [describe(event) for event in everything]
+    thread.join()
+
+    assert len(model.calls) == 2
+    assert events == [
+        "token:let ",
+        "token:me ",
+        "token:add",
+        "tool_call",
+        "tool_result",
+        "token:the ",
+        "token:answer ",
+        "token:is ",
+        "token:3",
+        "ai_message",
+    ]
+    assert [describe(event) for event in decisions] == [
+        "tool_call",
+        "tool_result",
+        "ai_message",
+    ]
+    assert everything.error is None
+
+
+def test_error_is_delivered_to_subscribers():
+    model = FakeToolModel(messages=iter([]), calls=[])
+    broadcaster = AgentStreamBroadcaster(make_agent(model))
+    subscription = broadcaster.subscribe()
+    broadcaster.run({"messages": [{"role": "user", "content": "hi"}]})
+    assert list(subscription) == []
+    assert subscription.error is not None
+
+
+def test_closed_subscribers_stop_the_agent():
+    model = make_model()
+    broadcaster = AgentStreamBroadcaster(make_agent(model), maxsize=1)
+    subscription = broadcaster.subscribe()
+    thread = broadcaster.start({"messages": [{"role": "user", "content": "1+2"}]})
+    assert isinstance(subscription.get(timeout=5), TokenEvent)
+    subscription.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert len(model.calls) == 1
+    assert not isinstance(subscription.get(timeout=1), EndEvent)
+
+
+class BrokenRegistry(MetricsRegistry):
+    def record(self, metrics):
+        raise RuntimeError("metrics backend down")
+
+
+def test_metrics_errors_do_not_block_end_event():
+    broadcaster = AgentStreamBroadcaster(
+        make_agent(make_model()), metrics=BrokenRegistry()
+    )
+    subscription = broadcaster.subscribe()
+    thread = broadcaster.start({"messages": [{"role": "user", "content": "1+2"}]})
+    # 统计出错时订阅者仍然收到 EndEvent，迭代能结束
+    assert describe(list(subscription)[-1]) == "ai_message"
+    thread.join(timeout=5)
+    assert subscription.error is None
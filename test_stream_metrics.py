@@ -0,0 +1,82 @@
+import io
+import json
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from fake_chat_model import create_fake_agent
+from stream_broadcaster import AgentStreamBroadcaster, StreamEventConverter
+from stream_metrics import MetricsRegistry, RequestMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_request_metrics_from_stream():
+    clock = FakeClock()
+    metrics = RequestMetrics("r1", clock=clock)
+    converter = StreamEventConverter(metrics)
+    human = HumanMessage("hi")
+    call = AIMessage(
+        content="",
+        tool_calls=[{"name": "search", "args": {}, "id": "c1"}],
+        usage_metadata={"input_tokens": 5, "output_tokens": 7, "total_tokens": 12},
+    )
+    result = ToolMessage("sunny", tool_call_id="c1")
+    agent = {"langgraph_node": "agent"}
+
+    steps = [
+        (0.0, "values", {"messages": [human]}),
+        (0.5, "messages", (AIMessageChunk(content="a"), agent)),
+        (0.52, "messages", (AIMessageChunk(content="b"), agent)),
+        (0.6, "values", {"messages": [human, call]}),
+        (1.6, "messages", (result, {"langgraph_node": "tools"})),
+        (1.6, "values", {"messages": [human, call, result]}),
+        (2.0, "messages", (AIMessageChunk(content="c"), agent)),
+    ]
+    for now, mode, chunk in steps:
+        clock.now = now
+        converter.convert(mode, chunk)
+    clock.now = 2.5
+    metrics.finish()
+
+    data = metrics.to_dict()
+    assert data["ttft_seconds"] == 0.5
+    assert data["tokens"] == 3
+    assert data["output_tokens"] == 7
+    assert data["total_seconds"] == 2.5
+    assert data["inter_token_seconds"]["count"] == 2
+    assert abs(data["node_seconds"]["agent"] - 1.0) < 1e-9
+    assert abs(data["node_seconds"]["tools"] - 1.0) < 1e-9
+    assert data["tool_calls"] == [{"name": "search", "seconds": 1.0}]
+
+
+def test_registry_exports_jsonl_and_prometheus():
+    out = io.StringIO()
+    registry = MetricsRegistry(jsonl=out)
+    broadcaster = AgentStreamBroadcaster(
+        create_fake_agent(checkpointer=MemorySaver()), metrics=registry
+    )
+    subscription = broadcaster.subscribe()
+    broadcaster.run(
+        {"messages": [{"role": "user", "content": "hi"}]},
+        {"configurable": {"thread_id": "t"}},
+    )
+    list(subscription)
+
+    line = json.loads(out.getvalue())
+    assert line["error"] is None
+    assert line["tokens"] > 0
+    assert [call["name"] for call in line["tool_calls"]] == ["fake_search"]
+    assert set(line["node_seconds"]) >= {"agent", "tools"}
+
+    text = registry.prometheus_text()
+    assert 'agent_stream_requests_total{status="ok"} 1' in text
+    assert 'agent_stream_ttft_seconds_bucket{le="+Inf"} 1' in text
+    assert 'agent_stream_tool_seconds_count{tool="fake_search"} 1' in text
+    assert 'agent_stream_node_seconds_total{node="agent"}' in text
@@ -0,0 +1,69 @@
+import asyncio
+import gzip
+import time
+
+import pytest
+
+from fake_chat_model import create_fake_agent
+from stream_broadcaster import STREAM_MODES, StreamEventConverter
+from stream_recorder import RecordingAgent, ReplayAgent
+
+
+def events_of(items):
+    converter = StreamEventConverter()
+    return [
+        repr(event) for mode, chunk in items for event in converter.convert(mode, chunk)
+    ]
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    agent = RecordingAgent(create_fake_agent(delay=0.01), path)
+    inputs = {"messages": [{"role": "user", "content": "hi"}]}
+    original = list(agent.stream(inputs, stream_mode=STREAM_MODES))
+    return path, original
+
+
+def test_replay_reproduces_events(recording):
+    path, original = recording
+    replay = ReplayAgent(path, speed=0)
+    replayed = list(replay.stream({}, stream_mode=STREAM_MODES))
+    assert [mode for mode, _ in replayed] == [mode for mode, _ in original]
+    assert events_of(replayed) == events_of(original)
+    # 单个模式时与 agent_executor.stream 一样只产出 chunk
+    tokens = list(replay.stream(stream_mode="messages"))
+    assert len(tokens) == sum(mode == "messages" for mode, _ in original)
+    with pytest.raises(ValueError):
+        list(replay.stream(stream_mode="updates"))
+
+
+def test_values_messages_are_stored_once(recording):
+    path, original = recording
+    values = [chunk for mode, chunk in original if mode == "values"]
+    assert len(values) > 1
+    with gzip.open(path, "rt") as f:
+        stored = sum(line.startswith('{"m":') for line in f)
+    assert stored == len(values[-1]["messages"])
+
+    final = [chunk for _, mode, chunk in ReplayAgent(path).items if mode == "values"]
+    assert [m.content for m in final[-1]["messages"]] == [
+        m.content for m in values[-1]["messages"]
+    ]
+
+
+def test_replay_speed(recording):
+    path, _ = recording
+    duration = ReplayAgent(path).duration
+    assert duration > 0.1
+
+    start = time.perf_counter()
+    list(ReplayAgent(path, speed=4).stream())
+    assert time.perf_counter() - start >= duration / 4 * 0.9
+
+    async def consume():
+        return [item async for item in ReplayAgent(path, speed=0).astream({}, None)]
+
+    start = time.perf_counter()
+    assert len(asyncio.run(consume())) == len(ReplayAgent(path).items)
+    assert time.perf_counter() - start < duration
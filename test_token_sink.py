@@ -0,0 +1,73 @@
+import asyncio
+import io
+import time
+
+from token_sink import AsyncTokenSink, TokenSink
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_coalesces_by_size_and_boundary():
+    stream = CountingStream()
+    sink = TokenSink(stream, max_chars=8, max_delay=None)
+    for token in ["ab", "cd", "ef", "gh", "ij"]:
+        sink.write(token)
+    assert stream.getvalue() == "abcdefgh"
+    assert stream.flushes == 1
+
+    sink.boundary()
+    assert stream.getvalue() == "abcdefghij"
+    sink.write("k")
+    sink.close()
+    assert stream.getvalue() == "abcdefghijk"
+    assert (sink.tokens, sink.writes) == (6, 3)
+
+
+def test_flushes_within_max_delay():
+    stream = CountingStream()
+    with TokenSink(stream, max_delay=0.02) as sink:
+        sink.write("hello")
+        assert stream.getvalue() == ""
+        deadline = time.monotonic() + 2
+        while not stream.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert stream.getvalue() == "hello"
+        sink.write(" world")
+    assert stream.getvalue() == "hello world"
+
+
+def test_file_path(tmp_path):
+    path = tmp_path / "out.txt"
+    with TokenSink(str(path)) as sink:
+        for token in "流式输出":
+            sink.write(token)
+    assert path.read_text(encoding="utf-8") == "流式输出"
+
+
+def test_async_sink():
+    written = []
+
+    async def writer(text):
+        written.append(text)
+
+    async def main():
+        sink = AsyncTokenSink(writer, max_chars=100, max_delay=0.01)
+        await sink.write("a")
+        await sink.write("b")
+        assert written == []
+        await asyncio.sleep(0.05)
+        assert written == ["ab"]
+        await sink.write("c")
+        await sink.boundary()
+        await sink.write("d")
+        await sink.close()
+
+    asyncio.run(main())
+    assert written == ["ab", "c", "d"]
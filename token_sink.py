@@ -0,0 +1,217 @@
+# 2026/10/18
+# zhangzhong
+# 合并流式 token 的输出，避免每个 token 一次系统调用
+
+"""
+print(token, end="", flush=True) 每个 token 都会触发一次 write 系统调用，
+输出到管道或日志收集器时，高负载下写操作会占掉大部分 CPU。
+
+TokenSink 把 token 先放进缓冲区，满足以下任一条件时才真正写出:
+    - 缓冲区达到 max_chars 个字符
+    - 缓冲区里最早的 token 已经等了 max_delay 秒（默认 20 ms，即最多增加 20 ms 延迟）
+    - 调用 boundary()（如工具调用前后）、flush() 或 close()
+
+用法:
+    with TokenSink() as sink:                 # 默认输出到 sys.stdout
+        for event in subscription:
+            if isinstance(event, TokenEvent):
+                sink.write(event.text)
+            else:
+                sink.boundary()
+                print(...)
+
+AsyncTokenSink 是异步版本，输出到 asyncio.StreamWriter 或任意 async 函数。
+"""
+
+from typing import Any, Awaitable, Callable, List, Optional, TextIO, Union
+import asyncio
+import sys
+import threading
+import time
+
+
+class TokenSink:
+    """
+    合并 token 的同步输出
+
+    Args:
+        stream: 可写的文本流或文件路径（以追加方式打开），默认为 sys.stdout
+        max_chars: 缓冲区字符数上限
+        max_delay: 最长缓冲时间（秒）；None 表示不启用定时刷新，只按大小和边界刷新
+    """
+
+    def __init__(
+        self,
+        stream: Union[TextIO, str, None] = None,
+        max_chars: int = 4096,
+        max_delay: Optional[float] = 0.02,
+    ) -> None:
+        self._owns_stream = isinstance(stream, str)
+        if isinstance(stream, str):
+            stream = open(stream, "a", encoding="utf-8")
+        self.stream = stream if stream is not None else sys.stdout
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+
+        self._buffer: List[str] = []
+        self._size = 0
+        self._deadline: Optional[float] = None
+        self._cond = threading.Condition()
+        self._timer: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.tokens = 0  # 写入的 token 数
+        self.writes = 0  # 实际写出的次数
+
+    def write(self, text: str) -> None:
+        """写入一个 token"""
+        if not text:
+            return
+        with self._cond:
+            if self._closed:
+                raise ValueError("TokenSink 已关闭")
+            self._buffer.append(text)
+            self._size += len(text)
+            self.tokens += 1
+            if self._size >= self.max_chars:
+                self._flush_locked()
+            elif self._deadline is None and self.max_delay is not None:
+                self._deadline = time.monotonic() + self.max_delay
+                if self._timer is None:
+                    self._timer = threading.Thread(target=self._run_timer, daemon=True)
+                    self._timer.start()
+                else:
+                    self._cond.notify()
+
+    def flush(self) -> None:
+        """立即写出缓冲区"""
+        with self._cond:
+            self._flush_locked()
+
+    # 工具调用等边界处要让已经生成的文本先显示出来
+    boundary = flush
+
+    def close(self) -> None:
+        """写出剩余内容并停止定时刷新"""
+        with self._cond:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._cond.notify()
+        if self._timer is not None:
+            self._timer.join()
+        if self._owns_stream:
+            self.stream.close()
+
+    def __enter__(self) -> "TokenSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _flush_locked(self) -> None:
+        self._deadline = None
+        if not self._buffer:
+            return
+        data = "".join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        self.stream.write(data)
+        self.stream.flush()
+        self.writes += 1
+
+    def _run_timer(self) -> None:
+        """后台线程：缓冲区里的内容到期后写出"""
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                else:
+                    self._flush_locked()
+
+
+class AsyncTokenSink:
+    """
+    合并 token 的异步输出
+
+    Args:
+        writer: asyncio.StreamWriter（写入编码后的字节并 drain），
+                或者接收字符串的 async 函数（如 SSE 的发送函数）
+        max_chars: 缓冲区字符数上限
+        max_delay: 最长缓冲时间（秒）
+    """
+
+    def __init__(
+        self,
+        writer: Union[asyncio.StreamWriter, Callable[[str], Awaitable[Any]]],
+        max_chars: int = 4096,
+        max_delay: float = 0.02,
+        encoding: str = "utf-8",
+    ) -> None:
+        self.writer = writer
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.encoding = encoding
+
+        self._buffer: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.tokens = 0
+        self.writes = 0
+
+    async def write(self, text: str) -> None:
+        """写入一个 token；缓冲区满时等待写出（背压）"""
+        if not text:
+            return
+        self._buffer.append(text)
+        self._size += len(text)
+        self.tokens += 1
+        if self._size >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_delay, self._on_timer)
+
+    async def flush(self) -> None:
+        """立即写出缓冲区"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            data = "".join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            if hasattr(self.writer, "drain"):
+                self.writer.write(data.encode(self.encoding))
+                await self.writer.drain()
+            else:
+                await self.writer(data)
+            self.writes += 1
+
+    boundary = flush
+
+    async def close(self) -> None:
+        """写出剩余内容"""
+        await self.flush()
+        if self._pending is not None:
+            await self._pending
+
+    async def __aenter__(self) -> "AsyncTokenSink":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._pending = asyncio.ensure_future(self.flush())
@@ -32,7 +32,6 @@ from langchain_deepseek import ChatDeepSeek
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 
-
 if not os.getenv("DEEPSEEK_API_KEY"):
     os.environ["DEEPSEEK_API_KEY"] = getpass.getpass("Enter your DeepSeek API key: ")
 
@@ -56,8 +55,12 @@ print(response)
 
 
 # stream
-for token in model.stream(messages):
-    print(token.content, end="|", flush=True)
+# token 合并后输出，每 20ms 最多写一次
+from token_sink import TokenSink
+
+with TokenSink() as sink:
+    for token in model.stream(messages):
+        sink.write(token.content + "|")
 
 
 # prompt template